@@ -1,18 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, status, Header
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, status, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database import get_db, init_db, Member, Transaction, Expense, SessionLocal, MemberClass, ClassDueDate
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, select, update, delete
+from database import get_db, get_async_db, async_engine, init_db, Member, Transaction, Expense, SessionLocal, MemberClass, ClassDueDate, PaymentLink, SquareReconciliationRun, member_columns, member_projection, member_status_expression, to_naive_utc
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-from config import SLACK_WEBHOOK_URL, SQUARE_APPLICATION_ID, SQUARE_LOCATION_ID
+from config import SLACK_WEBHOOK_URL, SQUARE_APPLICATION_ID, SQUARE_LOCATION_ID, SQUARE_WEBHOOK_SIGNATURE_KEY, SQUARE_WEBHOOK_NOTIFICATION_URL, SQUARE_RECONCILE_MAX_PAGES, PAYMENT_DEADLINE
 import os
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from slack_service import SlackMessagingService
 from square_service import SquarePaymentService
+from square_gateway import SquareGateway, SQUARE_ERROR_STATUS, OUTCOME_UNKNOWN_STATUS
+from payment_links import PaymentLinkCache, forget_payment_link
+from unpaid_members import UNPAID_STATUSES, summarize_unpaid_members
+from leader_election import LeaderElector
+from square_webhooks import WebhookIngestor, verify_signature, SIGNATURE_HEADER
+from idempotency import MAX_KEY_LENGTH, request_fingerprint, provider_key, claim_key, complete_key, hold_key, release_key
+import json
 from reminder_scheduler import ReminderScheduler, setup_default_reminders
+from stats_service import StatsService
+from pagination import parse_sort, apply_keyset, split_page
+from export_service import EXPORT_FORMATS, iter_export_rows, gzip_stream
+from member_import import import_members_csv
+from money import to_cents, from_cents
+from square_reconciliation import run_report, latest_run
+from ledger import record_member_transaction, reverse_member_transaction, forget_member_ledger, reset_ledger
+import io
+import tempfile
+import uuid
 import logging
 
 # Set up logging
@@ -44,8 +66,11 @@ def ensure_initial_admin():
                 password_hash=pwd_context.hash("abcd")
             )
             db.add(admin)
-            db.commit()
-            db.refresh(admin)
+            try:
+                db.commit()
+            except IntegrityError:
+                # another worker seeded it first
+                db.rollback()
     finally:
         db.close()
 
@@ -56,6 +81,7 @@ app = FastAPI(title="TAMID Dues Tracker API")
 # ============ Status Computation Helper ============
 def compute_member_status(member, now=None):
     """Derive payment status based on amount paid vs dues and due date timing.
+    Mirrored in SQL by database.member_status_expression; keep the two in sync.
     Rules:
       - Paid: amount_paid >= dues_amount
       - Overdue: not paid AND due_date exists AND now > due_date
@@ -64,7 +90,7 @@ def compute_member_status(member, now=None):
     if now is None:
         now = datetime.utcnow()
     try:
-        if member.amount_paid >= (member.dues_amount or 0):
+        if (member.amount_paid_cents or 0) >= (member.dues_cents or 0):
             return "Paid"
         if member.due_date and now > member.due_date:
             return "Overdue"
@@ -72,14 +98,62 @@ def compute_member_status(member, now=None):
     except Exception:
         return member.payment_status or "Pending"
 
+def set_class_due_date(db: Session, class_names: List[str], due_date: Optional[datetime], only_if_due_date=None) -> int:
+    """Set (or clear) due_date for every member of `class_names` and re-derive status, in one UPDATE.
+    With `only_if_due_date`, only members whose current due_date equals it are touched.
+    """
+    now = datetime.utcnow()
+    stmt = (
+        update(Member)
+        .where(Member.member_class.in_(class_names))
+        .values(
+            due_date=due_date,
+            payment_status=member_status_expression(now, due_date=due_date),
+            version_id=Member.version_id + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if only_if_due_date is not None:
+        stmt = stmt.where(Member.due_date == only_if_due_date)
+    return db.execute(stmt).rowcount
+
 # Initialize services
 slack_service = SlackMessagingService(webhook_url=SLACK_WEBHOOK_URL)
 square_service = SquarePaymentService()
+square_gateway = SquareGateway(square_service)
+stats_service = StatsService(db_session_factory=lambda: SessionLocal())
+payment_link_cache = PaymentLinkCache(square_gateway, db_session_factory=lambda: SessionLocal())
+webhook_ingestor = WebhookIngestor(db_session_factory=lambda: SessionLocal(), on_batch=stats_service.invalidate)
 
 # Initialize reminder scheduler
 reminder_scheduler = ReminderScheduler(
     db_session_factory=lambda: SessionLocal(),
-    slack_service=slack_service
+    slack_service=slack_service,
+    stats_service=stats_service,
+    square_service=square_service
+)
+
+def on_scheduler_elected():
+    """This worker now owns the scheduler: catch up on passed due dates, then run jobs."""
+    reminder_scheduler.sweep_overdue()
+    reminder_scheduler.schedule_overdue_sweep()
+    reminder_scheduler.sync_class_deadlines()
+    reminder_scheduler.resume()
+
+def on_scheduler_heartbeat():
+    """Pick up due-date writes and job changes made through other workers."""
+    reminder_scheduler.schedule_overdue_sweep()
+    reminder_scheduler.sync_class_deadlines()
+    reminder_scheduler.wakeup()
+
+# Only the lease holder runs scheduled jobs; every worker keeps them registered but paused.
+# The leader re-arms the overdue sweep and re-reads the shared job store each heartbeat,
+# since due dates and reminder jobs may be written by any worker.
+scheduler_elector = LeaderElector(
+    db_session_factory=lambda: SessionLocal(),
+    on_elected=on_scheduler_elected,
+    on_demoted=reminder_scheduler.pause,
+    on_heartbeat=on_scheduler_heartbeat,
 )
 
 # CORS configuration
@@ -118,15 +192,22 @@ class MemberResponse(BaseModel):
     phone: Optional[str] = None
     created_at: datetime
     due_date: Optional[datetime] = None
+    version_id: Optional[int] = None
     
     class Config:
         from_attributes = True
 
+class MemberPage(BaseModel):
+    items: List[Dict[str, Any]]  # sparse rows: only the requested `fields` (+ id)
+    next_cursor: Optional[str] = None
+    limit: int
+
 class MemberUpdate(BaseModel):
     payment_status: Optional[str] = None
     amount_paid: Optional[float] = None
     dues_amount: Optional[float] = None
     due_date: Optional[datetime] = None
+    version_id: Optional[int] = None  # if given, reject the update when the member changed since it was read
 
 class ReminderRequest(BaseModel):
     member_ids: Optional[List[int]] = None
@@ -142,6 +223,7 @@ class PaymentRequest(BaseModel):
     member_id: int
     source_id: str
     amount: float
+    idempotency_key: Optional[str] = None  # or the Idempotency-Key header
 
 class PaymentLinkRequest(BaseModel):
     member_id: int
@@ -176,6 +258,21 @@ class MemberAddRequest(BaseModel):
     dues_amount: Optional[float] = None  # if None and class supplied, derive from class
     due_date: Optional[datetime] = None
 
+class MemberImportRowError(BaseModel):
+    row: int
+    email: Optional[str] = None
+    errors: List[str]
+
+class MemberImportSkipped(BaseModel):
+    row: int
+    email: str
+
+class MemberImportResponse(BaseModel):
+    total_rows: int
+    inserted: int
+    skipped_existing: List[MemberImportSkipped]
+    errors: List[MemberImportRowError]
+
 class UpgradeAdminRequest(BaseModel):
     email: EmailStr
 
@@ -296,15 +393,46 @@ async def add_member(new_member: MemberAddRequest, authorization: Optional[str]
         phone=new_member.phone,
         dues_amount=dues_amount,
         amount_paid=0.0,
-        payment_status="Pending",
         role="Member",
-        due_date=new_member.due_date
+        due_date=to_naive_utc(new_member.due_date)
     )
+    # a due date already in the past makes the new member Overdue straight away
+    member.payment_status = compute_member_status(member)
     db.add(member)
     db.commit()
     db.refresh(member)
+    stats_service.invalidate()
+    if member.due_date:
+        reminder_scheduler.schedule_overdue_sweep()
     return member
 
+IMPORT_SPOOL_BYTES = 1024 * 1024
+
+@app.post("/api/members/import", response_model=MemberImportResponse)
+async def import_members(request: Request, authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Bulk-add members from a CSV request body (Content-Type: text/csv).
+    Columns: name, email and optionally member_class, phone, dues_amount, due_date.
+    Rows are validated like /api/auth/add-member; bad or existing rows are reported per line.
+    """
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    # Stream the upload to a spooled file (memory, then disk) and parse it incrementally
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text_stream = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+        try:
+            result = await run_in_threadpool(import_members_csv, db, text_stream, MemberAddRequest)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            text_stream.detach()
+    if result["inserted"]:
+        stats_service.invalidate()
+        reminder_scheduler.schedule_overdue_sweep()
+    return result
+
 @app.post("/api/auth/upgrade-admin", response_model=MemberResponse)
 async def upgrade_admin(req: UpgradeAdminRequest, authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
     token = get_authorization_token(authorization)
@@ -345,12 +473,22 @@ async def delete_member(member_id: int, authorization: Optional[str] = Header(No
     if member.role == "Admin":
         raise HTTPException(status_code=400, detail="Cannot delete admin accounts")
     # Decouple existing transactions: preserve history by nulling member_id and keeping snapshot fields
-    existing_txs = db.query(Transaction).filter(Transaction.member_id == member_id).all()
-    for tx in existing_txs:
-        tx.member_id = None  # detach
-    db.delete(member)
+    detached = db.execute(
+        update(Transaction)
+        .where(Transaction.member_id == member_id)
+        .values(member_id=None, payer_name=func.coalesce(Transaction.payer_name, member.name))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.execute(
+        update(Expense).where(Expense.created_by == member_id).values(created_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    forget_member_ledger(db, member_id)
+    forget_payment_link(db, member_id)
+    db.execute(delete(Member).where(Member.id == member_id).execution_options(synchronize_session=False))
     db.commit()
-    return {"success": True, "message": "Member deleted; detached transactions", "detached_transactions": len(existing_txs)}
+    stats_service.invalidate()
+    return {"success": True, "message": "Member deleted; detached transactions", "detached_transactions": detached}
 
 # ============ Member Class Endpoints ============
 @app.get("/api/classes", response_model=List[MemberClassResponse])
@@ -411,29 +549,38 @@ async def set_due_date_for_classes(req: ClassDueDateRequest, authorization: Opti
     active_names = [c.name for c in db.query(MemberClass).filter(MemberClass.name.in_(req.class_names), MemberClass.active == True)]
     if not active_names:
         return {"updated": 0, "due_date": req.due_date, "class_names": req.class_names, "skipped": req.class_names}
-    members = db.query(Member).filter(Member.member_class.in_(active_names)).all()
-    for m in members:
-        m.due_date = req.due_date
+    updated = set_class_due_date(db, active_names, to_naive_utc(req.due_date))
     db.commit()
-    return {"updated": len(members), "due_date": req.due_date, "class_names": active_names}
+    stats_service.invalidate()
+    reminder_scheduler.schedule_overdue_sweep()
+    return {"updated": updated, "due_date": req.due_date, "class_names": active_names}
 
 # ============ Startup/Shutdown Events ============
 @app.on_event("startup")
 async def startup_event():
     """Start the reminder scheduler on application startup"""
-    reminder_scheduler.start()
-    
-    # Set up default reminders (can be customized via API later)
-    # Example: Set deadline for end of semester
-    semester_end = datetime.now() + timedelta(days=90)
+    reminder_scheduler.start(paused=True)
+    webhook_ingestor.start()
+
+    # Default reminders are only installed into an empty job store; later starts keep the stored
+    # jobs (and their deadline) as they were configured
+    semester_end = datetime.fromisoformat(PAYMENT_DEADLINE) if PAYMENT_DEADLINE else datetime.now() + timedelta(days=90)
     setup_default_reminders(reminder_scheduler, payment_deadline=semester_end)
+
+    # Runs the first election inline; the winner catches up on passed due dates and starts the jobs
+    scheduler_elector.start()
     
     logger.info("Application started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Shutdown the reminder scheduler"""
+    scheduler_elector.stop()
     reminder_scheduler.shutdown()
+    square_gateway.shutdown()
+    webhook_ingestor.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
     logger.info("Application shutdown complete")
 
 # ============ Basic API Endpoints ============
@@ -449,23 +596,79 @@ async def api_status():
         "slack_configured": bool(SLACK_WEBHOOK_URL),
         "square_configured": bool(SQUARE_APPLICATION_ID),
         "scheduler_running": reminder_scheduler.is_running,
-        "scheduled_jobs": len(scheduler_jobs)
+        "scheduler_leader": scheduler_elector.status(),
+        "scheduled_jobs": len(scheduler_jobs),
+        "square_gateway": square_gateway.metrics(),
+        "square_webhooks": webhook_ingestor.metrics()
     }
 
-@app.get("/api/members", response_model=List[MemberResponse])
-async def list_members(db: Session = Depends(get_db)):
-    """Get all members with dynamically updated payment statuses."""
-    members = db.query(Member).all()
+MEMBER_SORT_KEYS = {"id", "name", "email", "created_at"}
+MEMBER_PAGE_MAX = 500
+
+def parse_member_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    allowed = member_columns(datetime.utcnow()).keys()
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+def filter_members(query, payment_status: Optional[List[str]] = None, member_class: Optional[List[str]] = None,
+                   due_after: Optional[datetime] = None, due_before: Optional[datetime] = None,
+                   has_balance: Optional[bool] = None, search: Optional[str] = None,
+                   now: Optional[datetime] = None):
+    """Apply the shared member list filters; payment_status matches the status derived at `now`."""
+    if payment_status:
+        wanted = {s.capitalize() for s in payment_status}
+        # The stored status narrows the scan through the index. It can only lag the derived one
+        # for a Pending member whose due date passed since the last sweep, so Overdue also
+        # reads stored Pending rows; the derived expression decides.
+        stored = wanted | ({"Pending"} if "Overdue" in wanted else set())
+        query = query.filter(Member.payment_status.in_(stored),
+                             member_status_expression(now or datetime.utcnow()).in_(wanted))
+    if member_class:
+        query = query.filter(Member.member_class.in_(member_class))
+    if due_after:
+        query = query.filter(Member.due_date >= due_after)
+    if due_before:
+        query = query.filter(Member.due_date <= due_before)
+    if has_balance is not None:
+        balance_open = func.coalesce(Member.amount_paid_cents, 0) < func.coalesce(Member.dues_cents, 0)
+        query = query.filter(balance_open if has_balance else ~balance_open)
+    if search:
+        query = query.filter(Member.name.ilike(f"%{search}%"))
+    return query
+
+@app.get("/api/members", response_model=MemberPage)
+async def list_members(limit: int = Query(100, ge=1, le=MEMBER_PAGE_MAX),
+                       cursor: Optional[str] = None,
+                       sort: str = "name",
+                       payment_status: Optional[List[str]] = Query(None),
+                       member_class: Optional[List[str]] = Query(None),
+                       due_after: Optional[datetime] = None,
+                       due_before: Optional[datetime] = None,
+                       has_balance: Optional[bool] = None,
+                       search: Optional[str] = None,
+                       fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    """Keyset-paginated member list with server-side filters, sort keys and sparse fieldsets.
+    payment_status is derived in SQL so the read never writes; pass `next_cursor` back as `cursor`.
+    """
     now = datetime.utcnow()
-    dirty = False
-    for m in members:
-        derived = compute_member_status(m, now)
-        if derived != m.payment_status:
-            m.payment_status = derived
-            dirty = True
-    if dirty:
-        db.commit()
-    return members
+    sort_key, descending = parse_sort(sort, MEMBER_SORT_KEYS)
+    requested = parse_member_fields(fields)
+    selected = list(dict.fromkeys((requested or list(member_columns(now))) + ["id", sort_key]))
+
+    query = filter_members(select(*member_projection(now, selected)),
+                           payment_status, member_class, due_after, due_before, has_balance, search, now=now)
+    sort_col = getattr(Member, sort_key)
+    result = await db.execute(apply_keyset(query, sort_col, Member.id, descending, cursor, limit))
+    rows, next_cursor = split_page(result.all(), limit, sort_key)
+    keep = list(dict.fromkeys((requested or selected) + ["id"]))
+    items = [{f: row._mapping[f] for f in keep} for row in rows]
+    return MemberPage(items=items, next_cursor=next_cursor, limit=limit)
 
 @app.post("/api/members", response_model=MemberResponse)
 async def create_member(member: MemberCreate, db: Session = Depends(get_db)):
@@ -474,19 +677,16 @@ async def create_member(member: MemberCreate, db: Session = Depends(get_db)):
     db.add(db_member)
     db.commit()
     db.refresh(db_member)
+    stats_service.invalidate()
     return db_member
 
 @app.get("/api/members/{member_id}", response_model=MemberResponse)
-async def get_member(member_id: int, db: Session = Depends(get_db)):
-    """Get a specific member by ID and ensure status is current."""
-    member = db.query(Member).filter(Member.id == member_id).first()
+async def get_member(member_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Get a specific member by ID with its payment status derived at read time."""
+    result = await db.execute(select(*member_projection(datetime.utcnow())).where(Member.id == member_id))
+    member = result.first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
-    derived = compute_member_status(member)
-    if derived != member.payment_status:
-        member.payment_status = derived
-        db.commit()
-        db.refresh(member)
     return member
 
 @app.patch("/api/members/{member_id}", response_model=MemberResponse)
@@ -497,18 +697,41 @@ async def update_member(member_id: int, update: MemberUpdate,
     member = db.query(Member).filter(Member.id == member_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
+    if update.version_id is not None and update.version_id != member.version_id:
+        raise HTTPException(status_code=409, detail="Member was modified by another request; reload and retry")
     old_status = member.payment_status
     # Ignore direct payment_status overrides; rely on computation
-    if update.amount_paid is not None:
-        member.amount_paid = update.amount_paid
     if update.dues_amount is not None:
         member.dues_amount = update.dues_amount
     if update.due_date is not None:
         member.due_date = update.due_date
     # Recompute
     member.payment_status = compute_member_status(member)
-    db.commit()
+    try:
+        db.flush()
+        # amount_paid is derived from transactions: an override is booked as an adjustment
+        if update.amount_paid is not None:
+            delta = to_cents(update.amount_paid) - (member.amount_paid_cents or 0)
+            if delta:
+                record_member_transaction(db, Transaction(
+                    member_id=member.id,
+                    amount_cents=delta,
+                    payment_method="Adjustment",
+                    transaction_id=f"adjust-{member.id}-{int(datetime.utcnow().timestamp())}-{uuid.uuid4().hex[:8]}",
+                    status="Completed",
+                    payer_name=member.name,
+                    dues_due_date=member.due_date,
+                    display_label=f"{member.name} balance adjustment",
+                    transaction_date=datetime.utcnow(),
+                ))
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Member was modified by another request; reload and retry")
     db.refresh(member)
+    stats_service.invalidate()
+    if update.due_date is not None:
+        reminder_scheduler.schedule_overdue_sweep()
     derived = member.payment_status
     if derived != old_status:
         background_tasks.add_task(
@@ -538,7 +761,7 @@ async def send_individual_reminder(member_id: int,
         slack_service.send_individual_reminder,
         member_name=member.name,
         member_email=member.email,
-        amount_due=member.dues_amount - member.amount_paid,
+        amount_due=from_cents(member.dues_cents - member.amount_paid_cents),
         status=member.payment_status
     )
     
@@ -551,48 +774,33 @@ async def send_individual_reminder(member_id: int,
 async def send_bulk_reminders(request: ReminderRequest, 
                               background_tasks: BackgroundTasks,
                               db: Session = Depends(get_db)):
-    """Send reminders to multiple unpaid members via Slack"""
+    """Send reminders to multiple unpaid members via Slack (members that still owe; see unpaid_members)"""
     if request.send_to_all_unpaid:
-        unpaid_members = db.query(Member).filter(
-            Member.payment_status.in_(["Pending", "Overdue", "pending", "overdue"])
-        ).all()
+        member_ids = None
     elif request.member_ids:
-        unpaid_members = db.query(Member).filter(
-            Member.id.in_(request.member_ids)
-        ).all()
+        member_ids = request.member_ids
     else:
         raise HTTPException(status_code=400, detail="Must specify member_ids or send_to_all_unpaid")
-    
-    if not unpaid_members:
+
+    # Same streamed selection as the scheduled Slack reminders
+    summary = await run_in_threadpool(summarize_unpaid_members, db, UNPAID_STATUSES, member_ids, True)
+
+    if not summary.count:
         return BulkReminderResponse(
             total_sent=0,
             successful=0,
             failed=0,
             members_notified=[]
         )
-    
-    # Prepare data for bulk summary
-    unpaid_data = [
-        {
-            "name": m.name,
-            "class": m.role,
-            "amount_due": m.dues_amount - m.amount_paid,
-            "status": m.payment_status
-        }
-        for m in unpaid_members
-    ]
-    
+
     # Send bulk summary in background
-    background_tasks.add_task(
-        slack_service.send_bulk_reminder_summary,
-        unpaid_data=unpaid_data
-    )
-    
+    background_tasks.add_task(slack_service.send_bulk_reminder_summary, **summary.slack_args())
+
     return BulkReminderResponse(
-        total_sent=len(unpaid_members),
-        successful=len(unpaid_members),
+        total_sent=summary.count,
+        successful=summary.count,
         failed=0,
-        members_notified=[m.name for m in unpaid_members]
+        members_notified=summary.names
     )
 
 @app.post("/api/slack/test")
@@ -602,25 +810,99 @@ async def test_slack_connection():
     return result
 
 # ============ Square Payment Integration Endpoints ============
+PAYMENT_IDEMPOTENCY_SCOPE = "payments.process"
+
 @app.post("/api/payments/process")
 async def process_payment(payment: PaymentRequest,
                           background_tasks: BackgroundTasks,
+                          idempotency_key: Optional[str] = Header(None),
                           db: Session = Depends(get_db)):
-    """Process a payment through Square and update database"""
+    """Process a payment through Square and update database.
+
+    With an Idempotency-Key (header or body), a retry of the same member/amount
+    replays the stored response instead of charging again.
+    """
     member = db.query(Member).filter(Member.id == payment.member_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
 
-    result = square_service.create_payment(
+    key = idempotency_key or payment.idempotency_key
+    if key:
+        if len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency key longer than {MAX_KEY_LENGTH} characters")
+        # source_id is a single-use card nonce, so a retry may carry a fresh one
+        fingerprint = request_fingerprint({"member_id": payment.member_id, "amount_cents": to_cents(payment.amount)})
+        existing = claim_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key, fingerprint)
+        if existing is not None:
+            if existing.request_hash != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency key was already used for a different payment")
+            if existing.status != "completed":
+                raise HTTPException(status_code=409, detail="A payment with this idempotency key is still being processed")
+            return JSONResponse(status_code=existing.response_code, content=json.loads(existing.response_body),
+                                headers={"Idempotent-Replayed": "true"})
+
+    result = await square_gateway.call(
+        "create_payment",
         amount=payment.amount,
         source_id=payment.source_id,
         member_email=member.email,
-        member_name=member.name
+        member_name=member.name,
+        idempotency_key=provider_key(PAYMENT_IDEMPOTENCY_SCOPE, key) if key else None,
+        on_late_result=book_late_square_payment(member.id, payment, key)
     )
-
     if not result.get("success"):
-        raise HTTPException(status_code=400, detail=result.get("message", "Payment failed"))
+        if result.get("outcome_unknown"):
+            # Square may have charged: keep the key so a retry cannot charge again; the late
+            # result, or the reconciliation report, settles it
+            if key:
+                hold_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key)
+            raise HTTPException(status_code=OUTCOME_UNKNOWN_STATUS, detail=result.get("message", "Payment outcome unknown"))
+        # Square did not charge, so the client may retry (with a new card token and key)
+        if key:
+            release_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key)
+        raise HTTPException(status_code=SQUARE_ERROR_STATUS.get(result.get("error"), 400),
+                            detail=result.get("message", "Payment failed"))
+    try:
+        response = record_square_payment(db, member, payment, result, key)
+    except Exception:
+        # Charged but not booked: hold the key and leave the payment to the reconciliation report
+        logger.exception("Could not book Square payment %s", result["transaction_id"])
+        if key:
+            hold_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key)
+        raise
 
+    background_tasks.add_task(
+        slack_service.send_payment_confirmation,
+        member_name=member.name,
+        amount=payment.amount,
+        payment_method="Square",
+        transaction_id=result["transaction_id"]
+    )
+    return response
+
+def book_late_square_payment(member_id: int, payment: PaymentRequest, key: Optional[str]):
+    """on_late_result for a charge that outlived the gateway deadline: book it once Square answers."""
+    def book(result: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            if not result.get("success"):
+                # a definite failure frees the held key; an unknown one waits for reconciliation
+                if key and not result.get("outcome_unknown"):
+                    release_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key)
+                return
+            member = db.query(Member).filter(Member.id == member_id).first()
+            if member is None:
+                logger.warning("Square payment %s finished late for deleted member %s", result["transaction_id"], member_id)
+                return
+            record_square_payment(db, member, payment, result, key)
+            logger.info("Booked Square payment %s that finished after the deadline", result["transaction_id"])
+        finally:
+            db.close()
+    return book
+
+def record_square_payment(db: Session, member: Member, payment: PaymentRequest,
+                          result: Dict[str, Any], key: Optional[str]) -> Dict[str, Any]:
+    """Book a successful Square charge and, with an idempotency key, store the response in the same commit."""
     transaction = Transaction(
         member_id=member.id,
         amount=payment.amount,
@@ -632,30 +914,21 @@ async def process_payment(payment: PaymentRequest,
         display_label=f"{member.name} dues {member.due_date.date() if member.due_date else ''}",
         transaction_date=datetime.utcnow()
     )
-    db.add(transaction)
-
-    # Update member payment info
-    member.amount_paid += payment.amount
-    member.payment_status = compute_member_status(member)
-    db.commit()
-    db.refresh(member)
-
-    background_tasks.add_task(
-        slack_service.send_payment_confirmation,
-        member_name=member.name,
-        amount=payment.amount,
-        payment_method="Square",
-        transaction_id=result["transaction_id"]
-    )
-
-    return {
+    # Insert the transaction and apply it to the balance atomically (a manual entry may land concurrently)
+    new_paid_cents, new_status = record_member_transaction(db, transaction)
+    response = {
         "success": True,
         "message": "Payment processed successfully",
         "transaction_id": result["transaction_id"],
         "receipt_url": result.get("receipt_url"),
-        "new_balance": member.amount_paid,
-        "payment_status": member.payment_status
+        "new_balance": from_cents(new_paid_cents),
+        "payment_status": new_status
     }
+    if key:
+        complete_key(db, PAYMENT_IDEMPOTENCY_SCOPE, key, 200, response)
+    db.commit()
+    stats_service.invalidate()
+    return response
 
 class ManualTransactionRequest(BaseModel):
     payer_name: str
@@ -666,6 +939,30 @@ class ManualTransactionRequest(BaseModel):
     status: Optional[str] = "Completed"
     member_id: Optional[int] = None  # optional association if member still exists
 
+class TransactionSummary(BaseModel):
+    id: int
+    member_id: Optional[int] = None
+    amount: float
+    payment_method: Optional[str] = None
+    status: Optional[str] = None
+    payer_name: Optional[str] = None
+    display_label: Optional[str] = None
+    dues_due_date: Optional[datetime] = None
+    transaction_date: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+class TransactionDetail(TransactionSummary):
+    transaction_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class TransactionPage(BaseModel):
+    items: List[TransactionSummary]
+    next_cursor: Optional[str] = None
+    limit: int
+    total_estimate: int
+    total_is_exact: bool
+
 class ManualTransactionResponse(BaseModel):
     id: int
     payer_name: str
@@ -691,56 +988,91 @@ async def record_manual_transaction(req: ManualTransactionRequest, authorization
         member_id=assoc_member.id if assoc_member else None,
         amount=req.amount,
         payment_method=req.payment_method or "Manual",
-        transaction_id=f"manual-{int(datetime.utcnow().timestamp())}-{req.payer_name[:8]}",
+        transaction_id=f"manual-{int(datetime.utcnow().timestamp())}-{req.payer_name[:8]}-{uuid.uuid4().hex[:8]}",
         status=req.status or "Completed",
         payer_name=req.payer_name,
         dues_due_date=req.dues_due_date,
         display_label=display_label,
         transaction_date=req.transaction_date or datetime.utcnow()
     )
-    db.add(tx)
-    # Optionally adjust member amount_paid if still associated
-    if assoc_member:
-        assoc_member.amount_paid += req.amount
-        assoc_member.payment_status = compute_member_status(assoc_member)
+    # Adjusts the member's amount_paid as well when still associated
+    record_member_transaction(db, tx)
     db.commit()
     db.refresh(tx)
+    stats_service.invalidate()
     return tx
 
 @app.post("/api/payments/create-link")
 async def create_payment_link(request: PaymentLinkRequest, db: Session = Depends(get_db)):
-    """Create a Square payment link for a member"""
+    """Square payment link for a member's outstanding balance (reused until the balance or due date changes)"""
     member = db.query(Member).filter(Member.id == request.member_id).first()
     if not member:
         raise HTTPException(status_code=404, detail="Member not found")
     
-    amount_due = member.dues_amount - member.amount_paid
+    amount_due = from_cents(member.dues_cents - member.amount_paid_cents)
     
     if amount_due <= 0:
         raise HTTPException(status_code=400, detail="Member has no outstanding balance")
     
-    result = square_service.create_payment_link(
-        amount=amount_due,
-        member_name=member.name,
-        member_id=member.id,
-        member_email=member.email
-    )
+    result = await payment_link_cache.get_or_create(db, member)
     
     if result["success"]:
         return result
     else:
-        raise HTTPException(status_code=400, detail=result.get("message", "Failed to create payment link"))
+        raise HTTPException(status_code=SQUARE_ERROR_STATUS.get(result.get("error"), 400),
+                            detail=result.get("message", "Failed to create payment link"))
+
+@app.post("/api/payments/links/pregenerate", status_code=202)
+async def pregenerate_payment_links(background_tasks: BackgroundTasks, concurrency: Optional[int] = Query(None, ge=1),
+                                    authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Create payment links for all unpaid members in the background, a few Square calls at a time."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    if payment_link_cache.pregenerating:
+        raise HTTPException(status_code=409, detail="Payment links are already being generated")
+    background_tasks.add_task(payment_link_cache.pregenerate, concurrency)
+    return {"success": True, "message": "Payment link generation started"}
+
+@app.get("/api/payments/links/pregenerate")
+async def payment_link_pregeneration_status(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Whether a pre-generation is running, and the report of the last one."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    return {
+        "running": payment_link_cache.pregenerating,
+        "last_run": payment_link_cache.last_pregeneration,
+    }
 
 @app.get("/api/payments/{payment_id}")
 async def get_payment_details(payment_id: str):
     """Get details of a Square payment"""
-    result = square_service.get_payment(payment_id)
+    result = await square_gateway.call("get_payment", payment_id)
     
     if result["success"]:
         return result
+    elif result.get("error") in SQUARE_ERROR_STATUS:
+        raise HTTPException(status_code=SQUARE_ERROR_STATUS[result["error"]], detail=result["message"])
     else:
         raise HTTPException(status_code=404, detail="Payment not found")
 
+@app.post("/api/webhooks/square")
+async def square_webhook(request: Request):
+    """Verify a Square webhook and queue it for the ingestion worker; acknowledges immediately."""
+    if not SQUARE_WEBHOOK_SIGNATURE_KEY:
+        raise HTTPException(status_code=503, detail="Square webhooks are not configured")
+    body = await request.body()
+    notification_url = SQUARE_WEBHOOK_NOTIFICATION_URL or str(request.url)
+    if not verify_signature(SQUARE_WEBHOOK_SIGNATURE_KEY, notification_url, body, request.headers.get(SIGNATURE_HEADER)):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Webhook body is not valid JSON")
+    if not webhook_ingestor.submit(event):
+        # non-2xx makes Square redeliver later
+        raise HTTPException(status_code=503, detail="Webhook queue is full; retry later")
+    return {"received": True}
+
 @app.get("/api/payments/config")
 async def get_square_config():
     """Get Square configuration for frontend"""
@@ -751,15 +1083,71 @@ async def get_square_config():
 
 # ============ Scheduler Endpoints ============
 @app.get("/api/scheduler/jobs")
-async def list_scheduled_jobs():
-    """List all scheduled reminder jobs"""
+async def list_scheduled_jobs(history: int = Query(20, ge=0, le=500), job_id: Optional[str] = None,
+                              db: Session = Depends(get_db)):
+    """List all scheduled reminder jobs, with run metrics and the latest `history` runs (optionally of one job)"""
     jobs = reminder_scheduler.list_jobs()
     return {
         "scheduler_running": reminder_scheduler.is_running,
+        "scheduler_leader": scheduler_elector.status(),
+        "class_deadline_reminders": reminder_scheduler.class_deadline_status(),
         "jobs": jobs,
-        "total_jobs": len(jobs)
+        "total_jobs": len(jobs),
+        "job_history": reminder_scheduler.job_history.status(),
+        "recent_runs": reminder_scheduler.job_history.recent_runs(db, limit=history, job_id=job_id) if history else []
     }
 
+@app.post("/api/ledger/reconcile")
+async def reconcile_ledger(repair: bool = False, full: bool = False,
+                           authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Check member balances against their transactions; `repair` resets drifted balances to the ledger."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    return await run_in_threadpool(reminder_scheduler.reconcile_ledger, repair, full)
+
+@app.get("/api/ledger/reconcile")
+async def last_ledger_reconciliation():
+    """Report from the most recent reconciliation run (scheduled or manual)."""
+    return {"last_reconciliation": reminder_scheduler.last_reconciliation}
+
+@app.post("/api/square/reconcile")
+async def reconcile_square_payments(begin: Optional[datetime] = None, end: Optional[datetime] = None,
+                                    max_pages: int = Query(SQUARE_RECONCILE_MAX_PAGES, ge=1),
+                                    authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """
+    Diff Square's payments against local transactions. Without `begin`/`end` this
+    resumes the open run (or starts one over the default window).
+    """
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    if (begin is None) != (end is None):
+        raise HTTPException(status_code=400, detail="Pass both begin and end, or neither")
+    if begin is not None and begin >= end:
+        raise HTTPException(status_code=400, detail="begin must be before end")
+    report = await run_in_threadpool(reminder_scheduler.reconcile_square, begin, end, max_pages)
+    if report is None:
+        raise HTTPException(status_code=409, detail="A Square reconciliation is already running")
+    return report
+
+@app.get("/api/square/reconcile")
+async def latest_square_reconciliation(authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Summary and first discrepancies of the most recent Square reconciliation run."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    run = latest_run(db)
+    return {"last_run": run_report(db, run) if run else None}
+
+@app.get("/api/square/reconcile/{run_id}")
+async def square_reconciliation_run(run_id: int, limit: int = Query(100, ge=1, le=1000), offset: int = Query(0, ge=0),
+                                    authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    """Page through a run's missing / extra / mismatch items."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    run = db.get(SquareReconciliationRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Reconciliation run not found")
+    return run_report(db, run, limit=limit, offset=offset)
+
 @app.post("/api/scheduler/configure")
 async def configure_reminder(request: ScheduleReminderRequest):
     """Configure a scheduled reminder"""
@@ -837,11 +1225,63 @@ async def delete_job(job_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============ Transaction & Statistics Endpoints ============
-@app.get("/api/transactions")
-async def get_all_transactions(db: Session = Depends(get_db)):
-    """Get all transactions"""
-    transactions = db.query(Transaction).all()
-    return transactions
+TRANSACTION_SORT_KEYS = {"transaction_date", "id"}
+TRANSACTION_PAGE_MAX = 500
+TRANSACTION_COUNT_CAP = 10000
+
+def transaction_summary_columns():
+    return [getattr(Transaction, name) for name in TransactionSummary.model_fields]
+
+def filter_transactions(query, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                        member_id: Optional[int] = None, payment_method: Optional[List[str]] = None,
+                        tx_status: Optional[List[str]] = None, search: Optional[str] = None):
+    """Apply the shared transaction list filters; returns (query, any_filter_applied)."""
+    conditions = []
+    if start:
+        conditions.append(Transaction.transaction_date >= start)
+    if end:
+        conditions.append(Transaction.transaction_date < end)
+    if member_id is not None:
+        conditions.append(Transaction.member_id == member_id)
+    if payment_method:
+        conditions.append(func.lower(Transaction.payment_method).in_([m.lower() for m in payment_method]))
+    if tx_status:
+        conditions.append(func.lower(Transaction.status).in_([s.lower() for s in tx_status]))
+    if search:
+        conditions.append(Transaction.payer_name.ilike(f"%{search}%") | Transaction.display_label.ilike(f"%{search}%"))
+    return query.filter(*conditions), bool(conditions)
+
+async def estimate_transaction_total(db: AsyncSession, filtered_query, filtered: bool):
+    """Bounded-cost total: MAX(id) when unfiltered, otherwise a count capped at TRANSACTION_COUNT_CAP."""
+    if not filtered:
+        return await db.scalar(select(func.max(Transaction.id))) or 0, False
+    capped = filtered_query.with_only_columns(Transaction.id).limit(TRANSACTION_COUNT_CAP + 1).subquery()
+    count = await db.scalar(select(func.count()).select_from(capped))
+    return min(count, TRANSACTION_COUNT_CAP), count <= TRANSACTION_COUNT_CAP
+
+@app.get("/api/transactions", response_model=TransactionPage)
+async def get_all_transactions(limit: int = Query(100, ge=1, le=TRANSACTION_PAGE_MAX),
+                               cursor: Optional[str] = None,
+                               sort: str = "-transaction_date",
+                               start: Optional[datetime] = None,
+                               end: Optional[datetime] = None,
+                               member_id: Optional[int] = None,
+                               payment_method: Optional[List[str]] = Query(None),
+                               tx_status: Optional[List[str]] = Query(None, alias="status"),
+                               search: Optional[str] = None,
+                               db: AsyncSession = Depends(get_async_db)):
+    """Keyset-paginated transactions on (transaction_date, id), newest first by default.
+    Pass `next_cursor` back as `cursor`; `end` is exclusive.
+    """
+    sort_key, descending = parse_sort(sort, TRANSACTION_SORT_KEYS)
+    query, filtered = filter_transactions(select(*transaction_summary_columns()), start, end,
+                                          member_id, payment_method, tx_status, search)
+    total, exact = await estimate_transaction_total(db, query, filtered)
+    sort_col = getattr(Transaction, sort_key)
+    result = await db.execute(apply_keyset(query, sort_col, Transaction.id, descending, cursor, limit))
+    rows, next_cursor = split_page(result.all(), limit, sort_key)
+    return TransactionPage(items=rows, next_cursor=next_cursor, limit=limit,
+                           total_estimate=total, total_is_exact=exact)
 
 @app.delete("/api/transactions/{transaction_id}")
 async def delete_transaction(transaction_id: int, authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
@@ -850,56 +1290,110 @@ async def delete_transaction(transaction_id: int, authorization: Optional[str] =
     tx = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    db.delete(tx)
+    reverse_member_transaction(db, tx)
     db.commit()
+    stats_service.invalidate()
     return {"success": True, "deleted_transaction": transaction_id}
 
-@app.get("/api/transactions/member/{member_id}")
+@app.get("/api/transactions/member/{member_id}", response_model=List[TransactionDetail])
 async def get_member_transactions(member_id: int, db: Session = Depends(get_db)):
     """Get all transactions for a specific member"""
     transactions = db.query(Transaction).filter(Transaction.member_id == member_id).all()
     return transactions
 
 @app.get("/api/stats")
-async def get_statistics(db: Session = Depends(get_db)):
-    """Get overall payment statistics including dynamic overdue based on due_date."""
+async def get_statistics(db: AsyncSession = Depends(get_async_db)):
+    """Get overall payment statistics (cached; invalidated by writes to money or status)."""
+    return await stats_service.get_stats_async(db)
+
+# ============ Streaming Exports (Admin/Treasurer) ============
+EXPORT_TRANSACTION_COLUMNS = ["id", "member_id", "amount", "payment_method", "transaction_id", "status",
+                              "payer_name", "display_label", "dues_due_date", "transaction_date", "created_at"]
+EXPORT_EXPENSE_COLUMNS = ["id", "category", "amount", "description", "event_name", "created_by", "created_at"]
+
+def export_response(name: str, fmt: str, gzip: bool, build_query, columns: List[str]) -> StreamingResponse:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'. Use csv or ndjson")
+    media_type, ext = EXPORT_FORMATS[fmt]
+    body = iter_export_rows(SessionLocal, build_query, columns, fmt)
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d')}.{ext}"
+    if gzip:
+        body = gzip_stream(body)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/api/export/transactions")
+async def export_transactions(format: str = "csv",
+                              gzip: bool = False,
+                              start: Optional[datetime] = None,
+                              end: Optional[datetime] = None,
+                              member_id: Optional[int] = None,
+                              payment_method: Optional[List[str]] = Query(None),
+                              tx_status: Optional[List[str]] = Query(None, alias="status"),
+                              search: Optional[str] = None,
+                              authorization: Optional[str] = Header(None),
+                              db: Session = Depends(get_db)):
+    """Stream the ledger as CSV/NDJSON (optionally gzipped); same filters as GET /api/transactions."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    columns = [getattr(Transaction, c) for c in EXPORT_TRANSACTION_COLUMNS]
+
+    def build_query(session):
+        query, _ = filter_transactions(session.query(*columns), start, end, member_id, payment_method, tx_status, search)
+        return query.order_by(Transaction.transaction_date.asc(), Transaction.id.asc())
+
+    return export_response("transactions", format, gzip, build_query, EXPORT_TRANSACTION_COLUMNS)
+
+@app.get("/api/export/members")
+async def export_members(format: str = "csv",
+                         gzip: bool = False,
+                         payment_status: Optional[List[str]] = Query(None),
+                         member_class: Optional[List[str]] = Query(None),
+                         due_after: Optional[datetime] = None,
+                         due_before: Optional[datetime] = None,
+                         has_balance: Optional[bool] = None,
+                         search: Optional[str] = None,
+                         authorization: Optional[str] = Header(None),
+                         db: Session = Depends(get_db)):
+    """Stream the roster as CSV/NDJSON (optionally gzipped); same filters as GET /api/members."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
     now = datetime.utcnow()
-    total_members = db.query(Member).count()
-    paid_members = db.query(Member).filter(Member.payment_status == "Paid").count()
-    pending_members = db.query(Member).filter(Member.payment_status == "Pending").count()
-    overdue_members = db.query(Member).filter(
-        Member.payment_status != "Paid",
-        Member.due_date != None,
-        Member.due_date < now
-    ).count()
-
-    # Use SQLAlchemy func for aggregate sums
-    total_expected = db.query(func.sum(Member.dues_amount)).scalar() or 0
-    total_collected = db.query(func.sum(Member.amount_paid)).scalar() or 0
-    outstanding = total_expected - total_collected
-
-    # Expenses & financial KPIs
-    total_expenses = db.query(func.sum(Expense.amount)).scalar() or 0
-    net_income = total_collected - total_expenses
-    BUDGET_TARGET = float(os.getenv("ANNUAL_BUDGET", 12000))
-    budget_remaining = BUDGET_TARGET - total_expenses
-
-    collection_rate = (total_collected / total_expected * 100) if total_expected > 0 else 0
+    columns = list(member_columns(now))
+
+    def build_query(session):
+        query = filter_members(session.query(*member_projection(now)),
+                               payment_status, member_class, due_after, due_before, has_balance, search, now=now)
+        return query.order_by(Member.id.asc())
+
+    return export_response("members", format, gzip, build_query, columns)
+
+@app.get("/api/export/expenses")
+async def export_expenses(format: str = "csv",
+                          gzip: bool = False,
+                          start: Optional[datetime] = None,
+                          end: Optional[datetime] = None,
+                          category: Optional[List[str]] = Query(None),
+                          authorization: Optional[str] = Header(None),
+                          db: Session = Depends(get_db)):
+    """Stream expenses as CSV/NDJSON (optionally gzipped), filtered by created_at range and category."""
+    token = get_authorization_token(authorization)
+    require_admin_or_treasurer(db, token)
+    columns = [getattr(Expense, c) for c in EXPORT_EXPENSE_COLUMNS]
 
-    return {
-        "total_members": total_members,
-        "paid_members": paid_members,
-        "pending_members": pending_members,
-        "overdue_members": overdue_members,
-        "total_expected": float(total_expected),
-        "total_collected": float(total_collected),
-        "outstanding_balance": float(outstanding),
-        "collection_rate": round(collection_rate, 2),
-        "total_expenses": round(float(total_expenses), 2),
-        "net_income": round(float(net_income), 2),
-        "budget_target": round(BUDGET_TARGET, 2),
-        "budget_remaining": round(float(budget_remaining), 2)
-    }
+    def build_query(session):
+        query = session.query(*columns)
+        if start:
+            query = query.filter(Expense.created_at >= start)
+        if end:
+            query = query.filter(Expense.created_at < end)
+        if category:
+            query = query.filter(Expense.category.in_(category))
+        return query.order_by(Expense.created_at.asc(), Expense.id.asc())
+
+    return export_response("expenses", format, gzip, build_query, EXPORT_EXPENSE_COLUMNS)
 
 class SampleSeedResponse(BaseModel):
     classes_created: int
@@ -978,22 +1472,28 @@ async def seed_sample_data(authorization: Optional[str] = Header(None), db: Sess
     transactions_created = 0
     for idx, m in enumerate(members):
         # Create 1-3 payments per member
-        for t in range((idx % 3) + 1):
+        installments = (idx % 3) + 1
+        for t in range(installments):
             created_at = now - timedelta(days=30 * (t + 1))
-            amount = min(m.dues_amount / ((idx % 3) + 1), m.dues_amount - m.amount_paid)
-            if amount <= 0:
+            # the last installment takes the remainder so split dues still add up exactly
+            if t == installments - 1:
+                amount_cents = m.dues_cents - m.amount_paid_cents
+            else:
+                amount_cents = min(m.dues_cents // installments, m.dues_cents - m.amount_paid_cents)
+            if amount_cents <= 0:
                 continue
             tx = Transaction(
                 member_id=m.id,
-                amount=amount,
+                amount_cents=amount_cents,
                 payment_method="Square",
                 transaction_id=f"demo-{m.id}-{t}-{int(created_at.timestamp())}",
                 status="Completed",
-                created_at=created_at
+                created_at=created_at,
+                transaction_date=created_at
             )
             db.add(tx)
-            m.amount_paid += amount
-            if m.amount_paid >= m.dues_amount:
+            m.amount_paid_cents += amount_cents
+            if m.amount_paid_cents >= m.dues_cents:
                 m.payment_status = "Paid"
             transactions_created += 1
     db.commit()
@@ -1021,6 +1521,7 @@ async def seed_sample_data(authorization: Optional[str] = Header(None), db: Sess
             db.add(exp)
             expenses_created += 1
     db.commit()
+    stats_service.invalidate()
 
     return SampleSeedResponse(
         classes_created=classes_created,
@@ -1041,22 +1542,28 @@ async def reset_sample_data(authorization: Optional[str] = Header(None), db: Ses
         raise HTTPException(status_code=400, detail="Preserved admin account missing; aborting reset")
 
     transactions_removed = db.query(Transaction).delete()
+    reset_ledger(db)
+    db.query(PaymentLink).delete()
     expenses_removed = db.query(Expense).delete()
     due_dates_removed = db.query(ClassDueDate).delete()
     db.commit()
 
-    removable_members = db.query(Member).filter(Member.email != preserve_email).all()
-    members_removed = len(removable_members)
-    for m in removable_members:
-        db.delete(m)
+    members_removed = db.execute(
+        delete(Member).where(Member.email != preserve_email).execution_options(synchronize_session=False)
+    ).rowcount
     db.commit()
 
     classes_removed = db.query(MemberClass).delete()
     db.commit()
 
     admin_member.role = "Admin"
+    # Its payments were removed with the other transactions
+    admin_member.amount_paid_cents = 0
+    admin_member.payment_status = compute_member_status(admin_member)
     db.commit()
     db.refresh(admin_member)
+    stats_service.invalidate()
+    reminder_scheduler.sync_class_deadlines()
 
     return SampleResetResponse(
         members_removed=members_removed,
@@ -1096,15 +1603,16 @@ async def create_due_date(data: CreateClassDueDate, authorization: Optional[str]
     if not active_classes:
         raise HTTPException(status_code=400, detail="No valid active classes provided")
     # Apply due_date to members of these classes
-    members = db.query(Member).filter(Member.member_class.in_(active_classes)).all()
-    for m in members:
-        m.due_date = data.due_date
-        m.payment_status = compute_member_status(m)
-    record = ClassDueDate(due_date=data.due_date, classes_text=','.join(active_classes))
+    due_date = to_naive_utc(data.due_date)
+    members_updated = set_class_due_date(db, active_classes, due_date)
+    record = ClassDueDate(due_date=due_date, classes_text=','.join(active_classes))
     db.add(record)
     db.commit()
     db.refresh(record)
-    return ClassDueDateResponse(id=record.id, due_date=record.due_date, class_names=active_classes, created_at=record.created_at, members_updated=len(members))
+    stats_service.invalidate()
+    reminder_scheduler.schedule_overdue_sweep()
+    reminder_scheduler.sync_class_deadlines()
+    return ClassDueDateResponse(id=record.id, due_date=record.due_date, class_names=active_classes, created_at=record.created_at, members_updated=members_updated)
 
 @app.delete("/api/due-dates/{record_id}")
 async def delete_due_date(record_id: int, authorization: Optional[str] = Header(None), db: Session = Depends(get_db)):
@@ -1115,13 +1623,12 @@ async def delete_due_date(record_id: int, authorization: Optional[str] = Header(
         raise HTTPException(status_code=404, detail="Due date record not found")
     classes = [c for c in record.classes_text.split(',') if c]
     # Clear due_date only if matches this record's due_date (avoid nuking manually edited dates)
-    affected = db.query(Member).filter(Member.member_class.in_(classes), Member.due_date == record.due_date).all()
-    for m in affected:
-        m.due_date = None
-        m.payment_status = compute_member_status(m)
+    cleared = set_class_due_date(db, classes, None, only_if_due_date=record.due_date)
     db.delete(record)
     db.commit()
-    return {"removed": record_id, "classes": classes, "cleared_members": len(affected)}
+    stats_service.invalidate()
+    reminder_scheduler.sync_class_deadlines()
+    return {"removed": record_id, "classes": classes, "cleared_members": cleared}
 
 @app.get("/api/stats/monthly")
 async def monthly_stats(db: Session = Depends(get_db)):
@@ -1135,15 +1642,15 @@ async def monthly_stats(db: Session = Depends(get_db)):
         months.append(label)
 
     from sqlalchemy import func
-    tx_rows = db.query(func.strftime('%Y-%m', Transaction.created_at).label('m'), func.sum(Transaction.amount))\
+    tx_rows = db.query(func.strftime('%Y-%m', Transaction.created_at).label('m'), func.sum(Transaction.amount_cents))\
         .filter(Transaction.created_at >= now - timedelta(days=180))\
         .group_by('m').all()
-    tx_map = {row[0]: float(row[1] or 0) for row in tx_rows}
+    tx_map = {row[0]: from_cents(row[1] or 0) for row in tx_rows}
 
-    exp_rows = db.query(func.strftime('%Y-%m', Expense.created_at).label('m'), func.sum(Expense.amount))\
+    exp_rows = db.query(func.strftime('%Y-%m', Expense.created_at).label('m'), func.sum(Expense.amount_cents))\
         .filter(Expense.created_at >= now - timedelta(days=180))\
         .group_by('m').all()
-    exp_map = {row[0]: float(row[1] or 0) for row in exp_rows}
+    exp_map = {row[0]: from_cents(row[1] or 0) for row in exp_rows}
 
     data = []
     for m in months:
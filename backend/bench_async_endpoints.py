@@ -0,0 +1,194 @@
+"""
+Benchmark request latency under mixed load: sync sessions vs the async engine.
+
+Serves the same routes from a uvicorn worker process, once doing blocking
+SQLAlchemy I/O inside `async def` handlers (how every endpoint used to work)
+and once awaiting an AsyncSession. Concurrent clients in this process mix a
+trivial /ping with a member page and the uncached stats aggregate; the p99 of
+/ping shows how long the event loop was held up by database calls.
+
+    python bench_async_endpoints.py --members 20000 --transactions 60000 --clients 32 --seconds 5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import Member, Transaction, member_projection
+from stats_service import stats_query
+
+MIX = [("/ping", 0.4), ("/members", 0.3), ("/stats", 0.3)]
+
+
+def seed(engine, members, transactions):
+    database.Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(
+            Member.__table__.insert(),
+            [
+                {
+                    "name": f"Member {i:06d}",
+                    "email": f"member{i}@example.com",
+                    "dues_cents": 18000,
+                    "amount_paid_cents": (i * 37) % 18001,
+                    "payment_status": "Pending",
+                    "role": "Member",
+                    "due_date": now + timedelta(days=(i % 60) - 30),
+                    "version_id": 1,
+                }
+                for i in range(members)
+            ],
+        )
+        conn.execute(
+            Transaction.__table__.insert(),
+            [
+                {
+                    "member_id": (i % members) + 1,
+                    "amount_cents": 1000 + i % 5000,
+                    "payment_method": "Square",
+                    "status": "Completed",
+                    "created_at": now - timedelta(minutes=i),
+                    "transaction_date": now - timedelta(minutes=i),
+                }
+                for i in range(transactions)
+            ],
+        )
+
+
+def members_page():
+    return select(*member_projection(datetime.utcnow())).order_by(Member.name, Member.id).limit(100)
+
+
+def build_app(sync_engine, async_engine):
+    app = FastAPI()
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/sync/members")
+    async def sync_members():
+        with SyncSession() as db:
+            return {"rows": len(db.execute(members_page()).all())}
+
+    @app.get("/sync/stats")
+    async def sync_stats():
+        with SyncSession() as db:
+            return dict(db.execute(stats_query()).one()._mapping)
+
+    @app.get("/async/members")
+    async def async_members():
+        async with AsyncSession() as db:
+            return {"rows": len((await db.execute(members_page())).all())}
+
+    @app.get("/async/stats")
+    async def async_stats():
+        async with AsyncSession() as db:
+            return dict((await db.execute(stats_query())).one()._mapping)
+
+    return app
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def serve(url, port):
+    sync_engine = database.build_engine(url)
+    async_engine = database.build_async_engine(database.async_database_url(url))
+    uvicorn.run(build_app(sync_engine, async_engine), host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(base_url + "/ping", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError("benchmark server did not start")
+
+
+async def run(base_url, prefix, clients, seconds):
+    latencies = {path: [] for path, _ in MIX}
+    paths = [p for p, _ in MIX]
+    weights = [w for _, w in MIX]
+    deadline = time.perf_counter() + seconds
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        async def worker(seed_value):
+            rng = random.Random(seed_value)
+            while time.perf_counter() < deadline:
+                path = rng.choices(paths, weights)[0]
+                url = path if path == "/ping" else prefix + path
+                started = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies[path].append((time.perf_counter() - started) * 1000)
+
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--transactions", type=int, default=60000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        sync_engine = database.build_engine(url)
+        seed(sync_engine, args.members, args.transactions)
+        sync_engine.dispose()
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = multiprocessing.Process(target=serve, args=(url, port), daemon=True)
+        server.start()
+        try:
+            wait_until_up(base_url)
+            print(f"{args.members} members, {args.transactions} transactions, {args.clients} clients, {args.seconds}s per mode")
+            print("=" * 72)
+            for label in ("sync", "async"):
+                latencies = asyncio.run(run(base_url, f"/{label}", args.clients, args.seconds))
+                total = sum(len(v) for v in latencies.values())
+                print(f"{label:>5}: {total / args.seconds:8.1f} req/s")
+                for path, values in latencies.items():
+                    print(f"       {path:<9} n={len(values):<6} p50={percentile(values, 50):7.1f}ms  p99={percentile(values, 99):7.1f}ms")
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark concurrent dashboard reads against a payment writer.
+
+Compares the legacy engine (rollback journal, no busy_timeout, default pool)
+with the tuned SQLite profile from database.build_engine. Each profile gets its
+own temporary database file because journal_mode=WAL persists in the file.
+
+    python bench_read_concurrency.py --members 20000 --readers 8 --seconds 5
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import database
+
+STATS_SQL = text(
+    "SELECT COUNT(*), SUM(dues_cents), SUM(amount_paid_cents), "
+    "SUM(CASE WHEN payment_status = 'Paid' THEN 1 ELSE 0 END) FROM members"
+)
+WRITE_SQL = text("UPDATE members SET amount_paid_cents = amount_paid_cents + 100 WHERE id = :id")
+
+
+def seed(engine, members):
+    database.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            database.Member.__table__.insert(),
+            [
+                {
+                    "name": f"Member {i}",
+                    "email": f"member{i}@example.com",
+                    "dues_cents": 18000,
+                    "amount_paid_cents": 0,
+                    "payment_status": "Pending",
+                    "role": "Member",
+                }
+                for i in range(members)
+            ],
+        )
+
+
+def run(engine, members, readers, seconds):
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    conn.execute(STATS_SQL).fetchall()
+                with lock:
+                    counts["reads"] += 1
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    conn.execute(WRITE_SQL, {"id": (i % members) + 1})
+                with lock:
+                    counts["writes"] += 1
+            except OperationalError:
+                with lock:
+                    counts["locked"] += 1
+            i += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=20000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = {
+            "legacy": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+            "tuned": database.build_engine,
+        }
+        print(f"{args.members} members, {args.readers} readers + 1 writer, {args.seconds}s per profile")
+        print("=" * 60)
+        for label, factory in profiles.items():
+            url = f"sqlite:///{os.path.join(tmp, label + '.db')}"
+            engine = factory(url)
+            seed(engine, args.members)
+            counts = run(engine, args.members, args.readers, args.seconds)
+            engine.dispose()
+            print(
+                f"{label:>7}: {counts['reads'] / args.seconds:8.1f} reads/s  "
+                f"{counts['writes'] / args.seconds:8.1f} writes/s  "
+                f"{counts['locked']} 'database is locked' errors"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Exercise the Square reconciliation against a local fake of the list-payments API.
+
+Seeds a scratch database with local transactions for N synthetic Square payments,
+minus some (missing), with altered amounts (mismatch) and with local-only rows
+(extra). It then reconciles in page-budgeted slices, with one injected Square
+failure, so the run has to resume from its saved cursor. Reports throughput and
+checks that the three sets come out exactly as seeded.
+
+    python bench_square_reconcile.py --payments 100000 --pages-per-run 300
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeSquare:
+    """Serves GET /v2/payments over an in-memory list, paged by an offset cursor."""
+
+    def __init__(self, payments, fail_on_page=None):
+        self.payments = sorted(payments, key=lambda p: p["created_at"])
+        self.fail_on_page = fail_on_page
+        self.pages_served = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/v2/payments":
+                    return self._send(404, {"errors": [{"code": "NOT_FOUND"}]})
+                fake.pages_served += 1
+                # the SDK retries a 5xx twice, so fail three requests in a row
+                if fake.fail_on_page and 0 <= fake.pages_served - fake.fail_on_page < 3:
+                    return self._send(500, {"errors": [{"category": "API_ERROR", "code": "INTERNAL_SERVER_ERROR"}]})
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                begin, end = query.get("begin_time", ""), query.get("end_time", "￿")
+                start = int(query.get("cursor") or 0)
+                limit = int(query.get("limit") or 100)
+                page, position = [], start
+                while position < len(fake.payments) and len(page) < limit:
+                    created = fake.payments[position]["created_at"]
+                    if begin <= created <= end:
+                        page.append(fake.payments[position])
+                    position += 1
+                body = {"payments": page}
+                if position < len(fake.payments) and fake.payments[position]["created_at"] <= end:
+                    body["cursor"] = str(position)
+                self._send(200, body)
+
+            def _send(self, code, body):
+                data = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+def synthesize(count, missing_ratio, mismatch_ratio, extra_count, end):
+    """Square payments plus the local transaction rows, and the ids expected in each set."""
+    rng = random.Random(7)
+    spacing = timedelta(hours=24) / count
+    payments, local, expected = [], [], {"missing": set(), "mismatch": set(), "extra": set()}
+    for i in range(count):
+        created = end - timedelta(hours=24) + spacing * i
+        payment_id = f"sq{i:08d}"
+        cents = 1000 + rng.randrange(17000)
+        payments.append({
+            "id": payment_id,
+            "status": "COMPLETED",
+            "amount_money": {"amount": cents, "currency": "USD"},
+            "note": f"member:{1 + i % 500}",
+            "created_at": created.isoformat() + "Z",
+        })
+        roll = rng.random()
+        if roll < missing_ratio:
+            expected["missing"].add(payment_id)
+            continue
+        if roll < missing_ratio + mismatch_ratio:
+            expected["mismatch"].add(payment_id)
+            cents += 100
+        local.append({"transaction_id": payment_id, "amount_cents": cents,
+                      "transaction_date": created + timedelta(seconds=2)})
+    for i in range(extra_count):
+        payment_id = f"local{i:06d}"
+        expected["extra"].add(payment_id)
+        local.append({"transaction_id": payment_id, "amount_cents": 5000,
+                      "transaction_date": end - timedelta(hours=rng.random() * 23)})
+    return payments, local, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=100000)
+    parser.add_argument("--missing", type=float, default=0.01)
+    parser.add_argument("--mismatch", type=float, default=0.005)
+    parser.add_argument("--extra", type=int, default=250)
+    parser.add_argument("--pages-per-run", type=int, default=300, help="page budget per reconcile call")
+    parser.add_argument("--fail-on-page", type=int, default=50, help="answer this page request with a 500 (0 = never)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp.name, 'reconcile.db')}"
+    now = datetime.utcnow()
+    end = now - timedelta(hours=1)
+    payments, local, expected = synthesize(args.payments, args.missing, args.mismatch, args.extra, end)
+    fake = FakeSquare(payments, fail_on_page=args.fail_on_page or None)
+    fake.start()
+    os.environ["SQUARE_BASE_URL"] = fake.base_url
+    os.environ.setdefault("SQUARE_ACCESS_TOKEN", "fake-token")
+
+    # config is read at import time, so these come after the environment is set
+    import database
+    from database import SessionLocal, Transaction
+    from square_reconciliation import reconcile_square_payments, run_report
+    from square_service import SquarePaymentService
+
+    database.init_db()
+    with database.engine.begin() as conn:
+        conn.execute(Transaction.__table__.insert(), [
+            dict(row, payment_method="Square Link", status="COMPLETED", created_at=row["transaction_date"])
+            for row in local
+        ])
+    print(f"{len(payments)} Square payments, {len(local)} local transactions; "
+          f"seeded {len(expected['missing'])} missing, {len(expected['mismatch'])} mismatch, {len(expected['extra'])} extra")
+
+    service = SquarePaymentService()
+    db = SessionLocal()
+    started = time.perf_counter()
+    calls = 0
+    try:
+        report = reconcile_square_payments(db, service, begin=end - timedelta(hours=24), end=end,
+                                           max_pages=args.pages_per_run)
+        calls += 1
+        while not report["complete"]:
+            print(f"  call {calls}: {report['status']:<9} pages={report['pages']:<5} scanned={report['payments_scanned']}"
+                  + (f"  ({report['error'][:60]})" if report["error"] else ""))
+            report = reconcile_square_payments(db, service, max_pages=args.pages_per_run)
+            calls += 1
+        elapsed = time.perf_counter() - started
+
+        print(f"  call {calls}: {report['status']:<9} pages={report['pages']:<5} scanned={report['payments_scanned']}")
+        print(f"reconciled {report['payments_scanned']} payments in {elapsed:.2f}s "
+              f"({report['payments_scanned'] / elapsed:.0f}/s) over {calls} call(s)")
+        print(f"missing={report['missing_count']} extra={report['extra_count']} mismatch={report['mismatch_count']}")
+
+        full = run_report(db, db.get(database.SquareReconciliationRun, report["run_id"]), limit=args.payments)
+        ok = all({item["payment_id"] for item in full[kind]} == ids for kind, ids in expected.items())
+        print("sets match what was seeded" if ok else "MISMATCH against the seeded sets")
+    finally:
+        db.close()
+        fake.stop()
+        database.engine.dispose()
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
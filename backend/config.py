@@ -13,4 +13,103 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tamid_dues.db")
 SQUARE_APPLICATION_ID = os.getenv("SQUARE_APPLICATION_ID", "")
 SQUARE_ACCESS_TOKEN = os.getenv("SQUARE_ACCESS_TOKEN", "")
 SQUARE_LOCATION_ID = os.getenv("SQUARE_LOCATION_ID", "")
-SQUARE_ENVIRONMENT = os.getenv("SQUARE_ENVIRONMENT", "sandbox")
\ No newline at end of file
+SQUARE_ENVIRONMENT = os.getenv("SQUARE_ENVIRONMENT", "sandbox")
+SQUARE_BASE_URL = os.getenv("SQUARE_BASE_URL") or None  # override the API host, e.g. a local stub server
+# Square calls run on a dedicated thread pool: at most SQUARE_MAX_CONCURRENCY at once,
+# SQUARE_MAX_QUEUE waiting, each answered within SQUARE_CALL_TIMEOUT_SECONDS
+SQUARE_MAX_CONCURRENCY = int(os.getenv("SQUARE_MAX_CONCURRENCY", "4"))
+SQUARE_MAX_QUEUE = int(os.getenv("SQUARE_MAX_QUEUE", "32"))
+SQUARE_CALL_TIMEOUT_SECONDS = float(os.getenv("SQUARE_CALL_TIMEOUT_SECONDS", "15"))
+SQUARE_HTTP_TIMEOUT_SECONDS = float(os.getenv("SQUARE_HTTP_TIMEOUT_SECONDS", "10"))
+# Square calls the bulk payment-link pre-generation keeps in flight (the rest of the pool stays free for users)
+PAYMENT_LINK_PREGENERATE_CONCURRENCY = int(os.getenv("PAYMENT_LINK_PREGENERATE_CONCURRENCY", "2"))
+# Webhook subscription signature key and the notification URL exactly as registered with Square
+SQUARE_WEBHOOK_SIGNATURE_KEY = os.getenv("SQUARE_WEBHOOK_SIGNATURE_KEY", "")
+SQUARE_WEBHOOK_NOTIFICATION_URL = os.getenv("SQUARE_WEBHOOK_NOTIFICATION_URL", "")
+# In-process webhook queue: events are applied in batches of up to WEBHOOK_BATCH_SIZE,
+# flushed at least every WEBHOOK_BATCH_WAIT_MS
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "200"))
+WEBHOOK_BATCH_WAIT_MS = int(os.getenv("WEBHOOK_BATCH_WAIT_MS", "250"))
+# A batch that fails to apply is retried WEBHOOK_RETRY_ATTEMPTS times in all, backing off from
+# WEBHOOK_RETRY_BASE_MS (doubling, capped at WEBHOOK_RETRY_MAX_MS); events that still fail are
+# stored as dead letters and replayed when the worker next starts
+WEBHOOK_RETRY_ATTEMPTS = int(os.getenv("WEBHOOK_RETRY_ATTEMPTS", "5"))
+WEBHOOK_RETRY_BASE_MS = int(os.getenv("WEBHOOK_RETRY_BASE_MS", "500"))
+WEBHOOK_RETRY_MAX_MS = int(os.getenv("WEBHOOK_RETRY_MAX_MS", "30000"))
+
+# Database tuning (SQLite profile applied to every pooled connection)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # negative = KiB, so 64 MiB
+SQLITE_FOREIGN_KEYS = os.getenv("SQLITE_FOREIGN_KEYS", "true").lower() == "true"
+
+# Async driver URL for the asyncio engine; derived from DATABASE_URL (sqlite -> sqlite+aiosqlite) when unset
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Connection pool sizing
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+
+# Async SQLite connections each run on their own aiosqlite thread; a small pool keeps
+# CPU-bound queries from starving the event loop (extra requests await a free connection)
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "2"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "0"))
+
+# Seconds a cached /api/stats result may be served before recomputing
+STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "30"))
+
+# Rows fetched (and flushed to the client) per batch by the streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Rows streamed per batch when selecting unpaid members for Slack reminders
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "1000"))
+
+# Rows validated and bulk-inserted per batch by the member CSV import
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+
+# Idempotency keys for POST /api/payments/process: replayable for the TTL, and an
+# in-progress claim older than the stale timeout may be taken over by a retry
+IDEMPOTENCY_KEY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+IDEMPOTENCY_STALE_SECONDS = float(os.getenv("IDEMPOTENCY_STALE_SECONDS", "120"))
+IDEMPOTENCY_CLEANUP_INTERVAL_MINUTES = int(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_MINUTES", "30"))
+
+# Scheduler leader election: with several workers only the holder of the lease runs jobs.
+# Holders renew every SCHEDULER_LEASE_RENEW_SECONDS; an unrenewed lease can be taken over
+# after SCHEDULER_LEASE_SECONDS
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "30"))
+SCHEDULER_LEASE_RENEW_SECONDS = float(os.getenv("SCHEDULER_LEASE_RENEW_SECONDS", "10"))
+
+# Scheduler job run history: rows older than SCHEDULER_HISTORY_RETENTION_DAYS, and the oldest
+# beyond SCHEDULER_HISTORY_MAX_ROWS, are pruned every SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES
+SCHEDULER_HISTORY_RETENTION_DAYS = float(os.getenv("SCHEDULER_HISTORY_RETENTION_DAYS", "30"))
+SCHEDULER_HISTORY_MAX_ROWS = int(os.getenv("SCHEDULER_HISTORY_MAX_ROWS", "10000"))
+SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES = int(os.getenv("SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES", "60"))
+
+# Days before each class due date (from /api/due-dates) that a per-class Slack reminder goes out
+CLASS_DEADLINE_REMINDER_DAYS = [int(d) for d in os.getenv("CLASS_DEADLINE_REMINDER_DAYS", "7,3,1").split(",") if d.strip()]
+# A reminder whose Slack post failed is tried again this many minutes later, until its due date
+CLASS_DEADLINE_RETRY_MINUTES = float(os.getenv("CLASS_DEADLINE_RETRY_MINUTES", "15"))
+
+# Reminder jobs are stored in the app database and survive restarts. Runs missed while no
+# worker was up are coalesced into one, and only if the latest was due within the last
+# SCHEDULER_MISFIRE_GRACE_SECONDS
+SCHEDULER_MISFIRE_GRACE_SECONDS = int(os.getenv("SCHEDULER_MISFIRE_GRACE_SECONDS", "3600"))
+# Deadline (ISO date) for the default deadline reminders; used only when the job store is
+# first populated. Defaults to 90 days after that first start
+PAYMENT_DEADLINE = os.getenv("PAYMENT_DEADLINE")
+
+# Member balance vs transaction ledger reconciliation
+LEDGER_RECONCILE_INTERVAL_MINUTES = int(os.getenv("LEDGER_RECONCILE_INTERVAL_MINUTES", "60"))
+LEDGER_AUTO_REPAIR = os.getenv("LEDGER_AUTO_REPAIR", "false").lower() == "true"
+
+# Square payments vs local transactions: each run covers the last SQUARE_RECONCILE_WINDOW_HOURS
+# and fetches at most SQUARE_RECONCILE_MAX_PAGES pages (100 payments each); an
+# unfinished run resumes from its saved cursor next time
+SQUARE_RECONCILE_INTERVAL_MINUTES = int(os.getenv("SQUARE_RECONCILE_INTERVAL_MINUTES", "360"))
+SQUARE_RECONCILE_WINDOW_HOURS = int(os.getenv("SQUARE_RECONCILE_WINDOW_HOURS", "48"))
+SQUARE_RECONCILE_MAX_PAGES = int(os.getenv("SQUARE_RECONCILE_MAX_PAGES", "500"))
@@ -1,49 +1,282 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, inspect, text, UniqueConstraint
+from sqlalchemy import create_engine, event, case, and_, func, Column, Integer, Float, String, Text, Boolean, DateTime, ForeignKey, Index, inspect, text, UniqueConstraint
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.pool import QueuePool, StaticPool
+from datetime import datetime, timezone
 
+from money import to_cents, from_cents
 #sqlite db
 # gets the slack API from .env
-from config import DATABASE_URL
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+from config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_FOREIGN_KEYS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    ASYNC_DB_POOL_SIZE,
+    ASYNC_DB_MAX_OVERFLOW,
+)
+
+
+def is_sqlite_url(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_sqlite_memory_url(url) -> bool:
+    return is_sqlite_url(url) and make_url(url).database in (None, "", ":memory:")
+
+
+def apply_sqlite_profile(dbapi_connection):
+    """Apply the configured SQLite pragmas to a freshly opened DBAPI connection.
+
+    WAL lets dashboard readers run alongside a payment writer, busy_timeout makes
+    writers wait for the lock instead of failing with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size = {int(SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA foreign_keys = {'ON' if SQLITE_FOREIGN_KEYS else 'OFF'}")
+    finally:
+        cursor.close()
+
+
+def build_engine(url=DATABASE_URL):
+    """Create the sync engine; SQLite file databases get a sized QueuePool and the pragma profile."""
+    if not is_sqlite_url(url):
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    if is_sqlite_memory_url(url):
+        # A single shared connection, otherwise every checkout would see an empty database
+        new_engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        new_engine = create_engine(
+            url,
+            connect_args=connect_args,
+            poolclass=QueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    @event.listens_for(new_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection)
+
+    return new_engine
+
+
+def async_database_url(url=DATABASE_URL) -> str:
+    """Async driver URL for `url`: plain SQLite URLs are switched to aiosqlite."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.get_driver_name() != "aiosqlite":
+        parsed = parsed.set(drivername="sqlite+aiosqlite")
+    return parsed.render_as_string(hide_password=False)
+
+
+def build_async_engine(url=None):
+    """Create the asyncio engine used by the hot read endpoints, with the same SQLite profile.
+
+    It must point at the same database as the sync engine, so an in-memory SQLite
+    URL (private to one connection) is rejected.
+    """
+    url = url or ASYNC_DATABASE_URL or async_database_url(DATABASE_URL)
+    if is_sqlite_memory_url(url):
+        raise ValueError("The async engine needs a file-backed SQLite database; in-memory ones can't be shared")
+    if not is_sqlite_url(url):
+        return create_async_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    new_engine = create_async_engine(
+        url,
+        connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=ASYNC_DB_POOL_SIZE,
+        max_overflow=ASYNC_DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection)
+
+    return new_engine
+
+
+engine = build_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# No async engine for in-memory SQLite; get_async_db() reports that when used
+async_engine = None if is_sqlite_memory_url(ASYNC_DATABASE_URL or DATABASE_URL) else build_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
 Base = declarative_base()
 
+
+def dollars(cents_attr: str, name: str) -> hybrid_property:
+    """Dollar-valued view over an integer-cents column.
+
+    Python access returns/accepts dollars; in SQL it is cents / 100.0 labelled
+    `name`, so projections keep their API field names. Aggregate on the cents
+    column itself to keep sums exact.
+    """
+    def fget(self):
+        return from_cents(getattr(self, cents_attr))
+
+    def fset(self, value):
+        setattr(self, cents_attr, to_cents(value))
+
+    def expr(cls):
+        return (getattr(cls, cents_attr) / 100.0).label(name)
+
+    return hybrid_property(fget, fset, expr=expr)
+
+
 class Member(Base):
     __tablename__ = "members"
+    __table_args__ = (
+        # stats counts, overdue detection and reminder selection filter on status then due_date
+        Index('ix_members_status_due_date', 'payment_status', 'due_date'),
+        # covers the /api/stats aggregate, so it reads the index instead of whole member rows
+        Index('ix_members_status_balance', 'payment_status', 'dues_cents', 'amount_paid_cents'),
+        # class due-date endpoints match member_class IN (...) AND due_date = ?
+        Index('ix_members_class_due_date', 'member_class', 'due_date'),
+        # keyset pagination sort keys for GET /api/members
+        Index('ix_members_name_id', 'name', 'id'),
+        Index('ix_members_created_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     email = Column(String, unique=True, nullable=False)
     phone = Column(String)
     member_class = Column(String)  # cohort / class year
-    dues_amount = Column(Float, default=0.0)
-    amount_paid = Column(Float, default=0.0)
+    dues_cents = Column(Integer, default=0)
+    amount_paid_cents = Column(Integer, default=0)
     payment_status = Column(String, default="Pending")  # Paid/Pending/Overdue
     role = Column(String, default="Member")  # Member/Admin
     password_hash = Column(String)  # bcrypt hash when password set
     created_at = Column(DateTime, default=datetime.utcnow)
     due_date = Column(DateTime)  # optional date by which dues should be paid
+    version_id = Column(Integer, nullable=False, default=1)  # optimistic concurrency token
 
     transactions = relationship("Transaction", back_populates="member")
 
+    # ORM flushes update WHERE version_id = <loaded>; set-based UPDATEs bump it explicitly
+    __mapper_args__ = {"version_id_col": version_id}
+
+    dues_amount = dollars("dues_cents", "dues_amount")
+    amount_paid = dollars("amount_paid_cents", "amount_paid")
+
+
+def to_naive_utc(dt):
+    """Due dates are stored as naive UTC; normalize offset-aware input before comparing or writing."""
+    if dt is None or dt.tzinfo is None:
+        return dt
+    return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+_UNSET = object()
+
+
+def member_status_expression(now, amount_paid=None, due_date=_UNSET):
+    """SQL twin of app.compute_member_status, evaluated at `now`.
+
+    Paid when amount_paid >= dues_amount, Overdue when unpaid and past due_date,
+    otherwise Pending. `amount_paid` (in cents) may be overridden with another expression and
+    `due_date` with a literal value (None clears it), so an UPDATE can derive the
+    status from the values it is about to write.
+    """
+    if amount_paid is None:
+        amount_paid = Member.amount_paid_cents
+    paid = func.coalesce(amount_paid, 0) >= func.coalesce(Member.dues_cents, 0)
+    if due_date is _UNSET:
+        return case(
+            (paid, "Paid"),
+            (and_(Member.due_date.isnot(None), Member.due_date < now), "Overdue"),
+            else_="Pending",
+        )
+    return case((paid, "Paid"), else_="Overdue" if due_date is not None and due_date < now else "Pending")
+
+
+def member_columns(now):
+    """Selectable member columns by API field name; payment_status is derived at `now`."""
+    return {
+        "id": Member.id,
+        "name": Member.name,
+        "email": Member.email,
+        "phone": Member.phone,
+        "member_class": Member.member_class,
+        "dues_amount": Member.dues_amount,  # cents / 100.0, see dollars()
+        "amount_paid": Member.amount_paid,
+        "payment_status": member_status_expression(now).label("payment_status"),
+        "role": Member.role,
+        "created_at": Member.created_at,
+        "due_date": Member.due_date,
+        "version_id": Member.version_id,
+    }
+
+
+def member_projection(now, fields=None):
+    """Member columns (optionally only `fields`) with payment_status derived at read time."""
+    columns = member_columns(now)
+    if fields is None:
+        return list(columns.values())
+    return [columns[f] for f in fields]
+
+
 class MemberClass(Base):
     __tablename__ = "member_classes"
     __table_args__ = (UniqueConstraint('name', name='uq_member_class_name'),)
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    dues_amount = Column(Float, default=180.0)
+    dues_cents = Column(Integer, default=18000)
     active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    dues_amount = dollars("dues_cents", "dues_amount")
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index('ix_transactions_member_created', 'member_id', 'created_at'),
+        # covers the monthly income rollup without touching the table
+        Index('ix_transactions_created_amount', 'created_at', 'amount_cents'),
+        # keyset pagination for GET /api/transactions
+        Index('ix_transactions_txdate_id', 'transaction_date', 'id'),
+        # one row per external payment id: booking inserts ON CONFLICT DO NOTHING against it
+        Index('ix_transactions_transaction_id', 'transaction_id', unique=True,
+              sqlite_where=text("transaction_id IS NOT NULL"), postgresql_where=text("transaction_id IS NOT NULL")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     member_id = Column(Integer, ForeignKey("members.id"))
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(Integer, nullable=False)
     payment_method = Column(String)  # venmo/payPal/stripe/square (we're just doing square?)
     transaction_id = Column(String)  # external payment ID
     status = Column(String, default="Completed")
@@ -52,22 +285,29 @@ class Transaction(Base):
     payer_name = Column(String)  # snapshot of member name at time of transaction
     dues_due_date = Column(DateTime)  # snapshot of the dues deadline relevant to this payment
     display_label = Column(String)  # e.g. "Alice Alpha dues 2025-11-30"
-    transaction_date = Column(DateTime)  # explicit date supplied (may equal created_at)
+    transaction_date = Column(DateTime, default=datetime.utcnow)  # explicit date supplied (may equal created_at)
     
     member = relationship("Member", back_populates="transactions")
 
+    amount = dollars("amount_cents", "amount")
+
 
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index('ix_expenses_created_amount', 'created_at', 'amount_cents'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     category = Column(String, nullable=False)
-    amount = Column(Float, nullable=False)
+    amount_cents = Column(Integer, nullable=False)
     description = Column(String)
     event_name = Column(String)
     created_by = Column(Integer, ForeignKey("members.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    amount = dollars("amount_cents", "amount")
+
 class ClassDueDate(Base):
     __tablename__ = 'class_due_dates'
 
@@ -77,23 +317,178 @@ class ClassDueDate(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
-def init_db():
-    """Create tables and perform lightweight, idempotent schema adjustments."""
-    Base.metadata.create_all(bind=engine)
+class ClassDeadlineReminderLog(Base):
+    """One row per per-class deadline reminder sent, so a reminder goes out once across workers and restarts."""
+    __tablename__ = "class_deadline_reminder_log"
 
-    # Ensure new column member_class exists (SQLite lacks ALTER via ORM)
-    inspector = inspect(engine)
-    columns = [col['name'] for col in inspector.get_columns('members')]
+    due_date_id = Column(Integer, primary_key=True)  # ClassDueDate.id
+    due_date = Column(DateTime, primary_key=True)
+    days_before = Column(Integer, primary_key=True)
+    sent_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SquareWebhookDeadLetter(Base):
+    """A Square webhook event that still failed to apply after every retry; replayed on worker start."""
+    __tablename__ = "square_webhook_dead_letters"
+
+    id = Column(Integer, primary_key=True)
+    event = Column(Text, nullable=False)  # raw event JSON
+    error = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    failed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SchedulerJobRun(Base):
+    """One scheduler job run (or missed/skipped run); pruned by job_history.JobRunRecorder."""
+    __tablename__ = "scheduler_job_runs"
+    __table_args__ = (
+        # retention deletes by age; the newest-first history reads per job
+        Index('ix_scheduler_job_runs_finished_at', 'finished_at'),
+        Index('ix_scheduler_job_runs_job_id', 'job_id', 'id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, nullable=False)
+    outcome = Column(String, nullable=False)  # success/error/missed/skipped
+    scheduled_run_time = Column(DateTime)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime, nullable=False)
+    duration_ms = Column(Float)
+    rows_scanned = Column(Integer)
+    rows_changed = Column(Integer)
+    messages_sent = Column(Integer)
+    db_ms = Column(Float)  # time spent on database queries
+    slack_ms = Column(Float)  # time spent posting to Slack
+    error = Column(String)
+
+
+class MemberLedgerBalance(Base):
+    """Per-member sum of transaction amounts up to the reconciliation checkpoint."""
+    __tablename__ = "member_ledger_balances"
+
+    member_id = Column(Integer, primary_key=True)
+    settled_cents = Column(Integer, nullable=False, default=0)
+
+
+class LedgerCheckpoint(Base):
+    """High-water mark (last transaction id folded into member_ledger_balances)."""
+    __tablename__ = "ledger_checkpoints"
+
+    name = Column(String, primary_key=True)
+    last_transaction_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKey(Base):
+    """Client idempotency key for a mutating endpoint, holding the response to replay."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # expiry sweep deletes WHERE expires_at < now
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    scope = Column(String, primary_key=True)  # endpoint the key belongs to
+    key = Column(String, primary_key=True)
+    request_hash = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="in_progress")  # in_progress/held/completed
+    response_code = Column(Integer)
+    response_body = Column(Text)  # JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class PaymentLink(Base):
+    """Square payment link last generated for a member; reusable while its amount and due date still match."""
+    __tablename__ = "payment_links"
+
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    amount_cents = Column(Integer, nullable=False)  # outstanding balance the link charges
+    due_date = Column(DateTime)  # member's due date when the link was made
+    url = Column(String, nullable=False)
+    payment_link_id = Column(String)
+    order_id = Column(String)
+    # bumped for every new link of the member; part of the Square idempotency key
+    generation = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SquareReconciliationRun(Base):
+    """One diff of Square's payment list against local transactions over a created_at window."""
+    __tablename__ = "square_reconciliation_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    begin_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False, default="running")  # running/completed/failed
+    cursor = Column(String)  # Square list-payments cursor for the next page
+    pages = Column(Integer, nullable=False, default=0)
+    payments_scanned = Column(Integer, nullable=False, default=0)
+    missing_count = Column(Integer, nullable=False, default=0)
+    extra_count = Column(Integer, nullable=False, default=0)
+    mismatch_count = Column(Integer, nullable=False, default=0)
+    error = Column(Text)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+
+class SquareReconciliationItem(Base):
+    """A payment a run has dealt with: a discrepancy, or 'matched' progress kept until the run completes."""
+    __tablename__ = "square_reconciliation_items"
+    __table_args__ = (
+        Index('ix_square_reconciliation_items_run_kind', 'run_id', 'kind'),
+    )
+
+    run_id = Column(Integer, ForeignKey("square_reconciliation_runs.id", ondelete="CASCADE"), primary_key=True)
+    payment_id = Column(String, primary_key=True)  # Square payment id / local transaction_id
+    kind = Column(String, nullable=False)  # missing/extra/mismatch/matched
+    square_amount_cents = Column(Integer)
+    local_amount_cents = Column(Integer)
+    member_id = Column(Integer)
+    square_created_at = Column(DateTime)
+
+
+class LeaderLease(Base):
+    """Lease naming the one process that runs a singleton duty (e.g. the reminder scheduler)."""
+    __tablename__ = "leader_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)  # host:pid:nonce of the lease owner
+    term = Column(Integer, nullable=False, default=1)  # bumped on every change of holder
+    acquired_at = Column(DateTime, nullable=False)
+    renewed_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+# ============ Schema Migrations ============
+# Each migration runs once, in version order, and is recorded in schema_version.
+# Migrations must stay idempotent so databases created before the version table
+# existed (version 0) can replay them safely.
+
+def _column_names(conn, table):
+    return {col['name'] for col in inspect(conn).get_columns(table)}
+
+
+def _migrate_member_columns(conn):
+    """Add member_class / due_date to members tables created before they existed."""
+    columns = _column_names(conn, 'members')
     if 'member_class' not in columns:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE members ADD COLUMN member_class VARCHAR"))
-            conn.commit()
+        conn.execute(text("ALTER TABLE members ADD COLUMN member_class VARCHAR"))
     if 'due_date' not in columns:
-        with engine.connect() as conn:
-            conn.execute(text("ALTER TABLE members ADD COLUMN due_date DATETIME"))
-            conn.commit()
-    # Ensure new transaction columns exist
-    t_columns = [col['name'] for col in inspector.get_columns('transactions')]
+        conn.execute(text("ALTER TABLE members ADD COLUMN due_date DATETIME"))
+
+
+def _migrate_transaction_snapshot_columns(conn):
+    """Add the decoupled snapshot columns to transactions."""
+    columns = _column_names(conn, 'transactions')
     new_tx_cols = {
         'payer_name': 'ALTER TABLE transactions ADD COLUMN payer_name VARCHAR',
         'dues_due_date': 'ALTER TABLE transactions ADD COLUMN dues_due_date DATETIME',
@@ -101,21 +496,172 @@ def init_db():
         'transaction_date': 'ALTER TABLE transactions ADD COLUMN transaction_date DATETIME'
     }
     for col_name, ddl in new_tx_cols.items():
-        if col_name not in t_columns:
-            with engine.connect() as conn:
-                conn.execute(text(ddl))
-                conn.commit()
-    # Backfill display_label & payer_name for existing rows missing them
+        if col_name not in columns:
+            conn.execute(text(ddl))
+
+
+def _migrate_backfill_transaction_snapshots(conn):
+    """Backfill payer_name & display_label for rows written before the snapshot columns."""
+    conn.execute(text("""
+        UPDATE transactions SET
+          payer_name = COALESCE(payer_name, (SELECT name FROM members WHERE members.id = transactions.member_id)),
+          display_label = COALESCE(display_label,
+            (SELECT name || ' dues ' || COALESCE(strftime('%Y-%m-%d', members.due_date), '') FROM members WHERE members.id = transactions.member_id)
+          )
+        WHERE payer_name IS NULL OR display_label IS NULL
+    """))
+
+
+def _create_index(conn, name, table, columns):
+    # Explicit DDL rather than the model's Index objects: a migration must keep
+    # creating the index as it was defined at that version.
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def _migrate_hot_path_indexes(conn):
+    _create_index(conn, 'ix_members_status_due_date', 'members', ['payment_status', 'due_date'])
+    _create_index(conn, 'ix_members_class_due_date', 'members', ['member_class', 'due_date'])
+    _create_index(conn, 'ix_transactions_member_created', 'transactions', ['member_id', 'created_at'])
+    _create_index(conn, 'ix_transactions_created_amount', 'transactions', ['created_at', 'amount'])
+    _create_index(conn, 'ix_expenses_created_amount', 'expenses', ['created_at', 'amount'])
+
+
+def _migrate_member_keyset_indexes(conn):
+    _create_index(conn, 'ix_members_name_id', 'members', ['name', 'id'])
+    _create_index(conn, 'ix_members_created_id', 'members', ['created_at', 'id'])
+
+
+def _migrate_transaction_date_keyset(conn):
+    """Every transaction gets a transaction_date so (transaction_date, id) pages are total."""
+    conn.execute(text("UPDATE transactions SET transaction_date = created_at WHERE transaction_date IS NULL"))
+    _create_index(conn, 'ix_transactions_txdate_id', 'transactions', ['transaction_date', 'id'])
+
+
+# (table, float dollars column, integer cents column, column DDL)
+MONEY_COLUMNS = [
+    ('members', 'dues_amount', 'dues_cents', 'INTEGER DEFAULT 0'),
+    ('members', 'amount_paid', 'amount_paid_cents', 'INTEGER DEFAULT 0'),
+    ('member_classes', 'dues_amount', 'dues_cents', 'INTEGER DEFAULT 18000'),
+    ('transactions', 'amount', 'amount_cents', 'INTEGER NOT NULL DEFAULT 0'),
+    ('expenses', 'amount', 'amount_cents', 'INTEGER NOT NULL DEFAULT 0'),
+]
+
+
+def _migrate_money_to_cents(conn):
+    """Convert Float dollar columns to integer cents (needs SQLite >= 3.35 for DROP COLUMN)."""
+    # Indexes covering the old amount columns must go before the columns can be dropped
+    if 'amount' in _column_names(conn, 'transactions'):
+        conn.execute(text("DROP INDEX IF EXISTS ix_transactions_created_amount"))
+    if 'amount' in _column_names(conn, 'expenses'):
+        conn.execute(text("DROP INDEX IF EXISTS ix_expenses_created_amount"))
+    for table, old, new, ddl in MONEY_COLUMNS:
+        columns = _column_names(conn, table)
+        if old not in columns:
+            continue
+        if new not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {new} {ddl}"))
+        conn.execute(text(f"UPDATE {table} SET {new} = CAST(ROUND(COALESCE({old}, 0) * 100) AS INTEGER)"))
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {old}"))
+    _create_index(conn, 'ix_transactions_created_amount', 'transactions', ['created_at', 'amount_cents'])
+    _create_index(conn, 'ix_expenses_created_amount', 'expenses', ['created_at', 'amount_cents'])
+
+
+def _migrate_transaction_external_id_index(conn):
+    _create_index(conn, 'ix_transactions_transaction_id', 'transactions', ['transaction_id'])
+
+
+def _migrate_canonical_payment_status(conn):
+    """Store statuses as Paid/Pending/Overdue so status filters match the indexed column directly."""
+    for status in ('Paid', 'Pending', 'Overdue'):
+        conn.execute(
+            text("UPDATE members SET payment_status = :status "
+                 "WHERE lower(payment_status) = lower(:status) AND payment_status != :status"),
+            {"status": status},
+        )
+
+
+def _migrate_stats_covering_index(conn):
+    _create_index(conn, 'ix_members_status_balance', 'members', ['payment_status', 'dues_cents', 'amount_paid_cents'])
+
+
+def _migrate_unique_transaction_external_id(conn):
+    """
+    Make ix_transactions_transaction_id a partial UNIQUE index. Rows that already
+    share an external id (booked twice) keep it on the oldest row; the others get
+    '#<row id>' appended, so they stay visible and reconciliation reports them.
+    """
+    conn.execute(text("""
+        UPDATE transactions SET transaction_id = transaction_id || '#' || id
+        WHERE transaction_id IS NOT NULL
+          AND id > (SELECT MIN(t.id) FROM transactions t WHERE t.transaction_id = transactions.transaction_id)
+    """))
+    conn.execute(text("DROP INDEX IF EXISTS ix_transactions_transaction_id"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX ix_transactions_transaction_id ON transactions (transaction_id) "
+        "WHERE transaction_id IS NOT NULL"
+    ))
+
+
+def _migrate_payment_link_generation(conn):
+    if 'generation' not in _column_names(conn, 'payment_links'):
+        conn.execute(text("ALTER TABLE payment_links ADD COLUMN generation INTEGER NOT NULL DEFAULT 0"))
+
+
+def _migrate_scheduler_run_metrics(conn):
+    columns = _column_names(conn, 'scheduler_job_runs')
+    for name, type_ in (('rows_changed', 'INTEGER'), ('db_ms', 'FLOAT'), ('slack_ms', 'FLOAT')):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE scheduler_job_runs ADD COLUMN {name} {type_}"))
+
+
+def _migrate_member_version(conn):
+    if 'version_id' not in _column_names(conn, 'members'):
+        conn.execute(text("ALTER TABLE members ADD COLUMN version_id INTEGER NOT NULL DEFAULT 1"))
+
+
+MIGRATIONS = [
+    (1, "member_class_and_due_date", _migrate_member_columns),
+    (2, "transaction_snapshot_columns", _migrate_transaction_snapshot_columns),
+    (3, "backfill_transaction_snapshots", _migrate_backfill_transaction_snapshots),
+    (4, "hot_path_indexes", _migrate_hot_path_indexes),
+    (5, "member_keyset_indexes", _migrate_member_keyset_indexes),
+    (6, "transaction_date_keyset", _migrate_transaction_date_keyset),
+    (7, "money_to_integer_cents", _migrate_money_to_cents),
+    (8, "member_version_id", _migrate_member_version),
+    (9, "transaction_external_id_index", _migrate_transaction_external_id_index),
+    (10, "canonical_payment_status", _migrate_canonical_payment_status),
+    (11, "stats_covering_index", _migrate_stats_covering_index),
+    (12, "unique_transaction_external_id", _migrate_unique_transaction_external_id),
+    (13, "payment_link_generation", _migrate_payment_link_generation),
+    (14, "scheduler_run_metrics", _migrate_scheduler_run_metrics),
+]
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def init_db():
+    """Create tables and apply pending schema migrations.
+
+    A warm start costs one CREATE-if-missing check per table plus a single
+    MAX(version) lookup; migrations only run when they have not been recorded yet.
+    On SQLite it all happens under the database write lock, so workers starting
+    together don't interleave: the first creates and migrates, the rest wait and
+    find nothing to do.
+    """
     with engine.connect() as conn:
-        # Only run if at least one of the new columns existed prior (simple heuristic)
-        conn.execute(text("""
-            UPDATE transactions SET
-              payer_name = COALESCE(payer_name, (SELECT name FROM members WHERE members.id = transactions.member_id)),
-              display_label = COALESCE(display_label, 
-                (SELECT name || ' dues ' || COALESCE(strftime('%Y-%m-%d', members.due_date), '') FROM members WHERE members.id = transactions.member_id)
-              )
-            WHERE 1=1
-        """))
+        if is_sqlite_url(engine.url):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        Base.metadata.create_all(bind=conn)
+        current = get_schema_version(conn)
+        for version, name, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            migrate(conn)
+            conn.execute(
+                SchemaVersion.__table__.insert().values(version=version, name=name, applied_at=datetime.utcnow())
+            )
         conn.commit()
 
 
@@ -124,4 +670,12 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    """Async session dependency; awaiting queries keeps the event loop free while SQLite works."""
+    if async_engine is None:
+        raise RuntimeError("No async engine: DATABASE_URL is an in-memory SQLite database")
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -0,0 +1,124 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import CLASS_DEADLINE_REMINDER_DAYS, CLASS_DEADLINE_RETRY_MINUTES, SCHEDULER_MISFIRE_GRACE_SECONDS
+from database import ClassDueDate, ClassDeadlineReminderLog
+
+
+class DeadlineReminder(NamedTuple):
+    fire_at: datetime  # naive UTC, like the due dates
+    record_id: int
+    days_before: int
+    due_date: datetime
+    class_names: Tuple[str, ...]
+
+
+def class_due_date_rows(db):
+    return db.execute(select(ClassDueDate.id, ClassDueDate.due_date, ClassDueDate.classes_text)).all()
+
+
+def claim_reminder(db, reminder: DeadlineReminder) -> bool:
+    """Record the reminder as sent; False if it already was (another worker, or before a restart)."""
+    result = db.execute(
+        sqlite_insert(ClassDeadlineReminderLog)
+        .values(due_date_id=reminder.record_id, due_date=reminder.due_date,
+                days_before=reminder.days_before, sent_at=datetime.utcnow())
+        .on_conflict_do_nothing()
+    )
+    return result.rowcount == 1
+
+
+def release_reminder(db, reminder: DeadlineReminder):
+    """Undo claim_reminder() after the post failed, so a retry (here or on another worker) can claim it."""
+    db.execute(delete(ClassDeadlineReminderLog).where(
+        ClassDeadlineReminderLog.due_date_id == reminder.record_id,
+        ClassDeadlineReminderLog.due_date == reminder.due_date,
+        ClassDeadlineReminderLog.days_before == reminder.days_before,
+    ))
+
+
+def purge_reminder_log(db):
+    """Drop log rows of due dates that no longer exist. The caller owns the commit."""
+    db.execute(delete(ClassDeadlineReminderLog).where(ClassDeadlineReminderLog.due_date_id.not_in(select(ClassDueDate.id))))
+
+
+class ClassDeadlineQueue:
+    """
+    Upcoming per-class deadline reminders in a min-heap ordered by fire time,
+    one entry per ClassDueDate record and reminder offset. Only the head needs
+    a timer, however many classes and deadlines there are.
+
+    sync() diffs the ClassDueDate rows against the records the heap was built
+    from and pushes entries for new ones. Entries of deleted records stay in the
+    heap and are skipped when they reach the head. Reminders that came due
+    more than `grace_seconds` ago (e.g. while no worker was running) are dropped.
+    Not thread-safe; the owner serializes access.
+    """
+
+    def __init__(self, days_before: Iterable[int] = CLASS_DEADLINE_REMINDER_DAYS,
+                 grace_seconds: float = SCHEDULER_MISFIRE_GRACE_SECONDS,
+                 retry_minutes: float = CLASS_DEADLINE_RETRY_MINUTES):
+        self.days_before = sorted(set(days_before), reverse=True)
+        self.grace = timedelta(seconds=grace_seconds)
+        self.retry_delay = timedelta(minutes=retry_minutes)
+        self._heap: List[DeadlineReminder] = []
+        self._records: Dict[int, Tuple[datetime, Tuple[str, ...]]] = {}
+
+    def sync(self, rows, now: datetime) -> Tuple[List[int], List[int]]:
+        """Apply (id, due_date, classes_text) rows; returns the (removed, added) record ids."""
+        current = {
+            row.id: (row.due_date, tuple(c for c in row.classes_text.split(",") if c))
+            for row in rows
+        }
+        removed = [rid for rid, record in self._records.items() if current.get(rid) != record]
+        added = [rid for rid, record in current.items() if self._records.get(rid) != record]
+        for rid in removed:
+            del self._records[rid]
+        for rid in added:
+            due_date, class_names = self._records[rid] = current[rid]
+            for days in self.days_before:
+                fire_at = due_date - timedelta(days=days)
+                if fire_at >= now - self.grace:
+                    heapq.heappush(self._heap, DeadlineReminder(fire_at, rid, days, due_date, class_names))
+        if removed and len(self._heap) > 2 * len(self._records) * len(self.days_before):
+            self._heap = [entry for entry in self._heap if self._live(entry)]
+            heapq.heapify(self._heap)
+        return removed, added
+
+    def _live(self, entry: DeadlineReminder) -> bool:
+        return self._records.get(entry.record_id) == (entry.due_date, entry.class_names)
+
+    def retry(self, entry: DeadlineReminder, now: datetime) -> bool:
+        """Queue a reminder whose post failed for another try `retry_delay` from now, while its due date is ahead."""
+        retry_at = now + self.retry_delay
+        if not self._live(entry) or retry_at >= entry.due_date:
+            return False
+        heapq.heappush(self._heap, entry._replace(fire_at=retry_at))
+        return True
+
+    def next_fire_at(self) -> Optional[datetime]:
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0].fire_at if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[DeadlineReminder]:
+        """Remove and return the live entries due at `now`, oldest first."""
+        due = []
+        while self._heap and self._heap[0].fire_at <= now:
+            entry = heapq.heappop(self._heap)
+            if self._live(entry) and entry.fire_at >= now - self.grace:
+                due.append(entry)
+        return due
+
+    def status(self) -> Dict[str, object]:
+        next_fire_at = self.next_fire_at()
+        return {
+            "due_dates": len(self._records),
+            "queued": sum(1 for entry in self._heap if self._live(entry)),
+            "days_before": self.days_before,
+            "next_fire_at": next_fire_at.isoformat() if next_fire_at else None,
+        }
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, or_, and_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import IDEMPOTENCY_KEY_TTL_HOURS, IDEMPOTENCY_STALE_SECONDS
+from database import IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+# Namespace for deriving the key sent to Square (at most 45 characters there)
+SQUARE_KEY_NAMESPACE = uuid.UUID("6f1c2a4e-3b8d-4c57-9a0e-5d2f7b1e8c93")
+
+
+def request_fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of the request fields a key is bound to."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def provider_key(scope: str, key: str) -> str:
+    """Deterministic idempotency key for the payment provider, so its own dedupe also covers retries."""
+    return str(uuid.uuid5(SQUARE_KEY_NAMESPACE, f"{scope}:{key}"))
+
+
+def claim_key(db, scope: str, key: str, request_hash: str, now: Optional[datetime] = None) -> Optional[IdempotencyKey]:
+    """
+    Reserve (scope, key) for this request and commit the claim.
+
+    Returns None when the caller now owns the key and should do the work, otherwise
+    the existing row: completed (replay it) or still in progress elsewhere. An
+    expired key, or an in-progress claim older than IDEMPOTENCY_STALE_SECONDS (a
+    worker died mid-request), is taken over.
+    """
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    claimed = db.execute(
+        sqlite_insert(IdempotencyKey)
+        .values(scope=scope, key=key, request_hash=request_hash, status="in_progress",
+                created_at=now, expires_at=expires_at)
+        .on_conflict_do_nothing()
+    ).rowcount
+    if not claimed:
+        stale = now - timedelta(seconds=IDEMPOTENCY_STALE_SECONDS)
+        claimed = db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.expires_at < now,
+                    and_(IdempotencyKey.status == "in_progress", IdempotencyKey.created_at < stale),
+                ),
+            )
+            .values(request_hash=request_hash, status="in_progress", response_code=None,
+                    response_body=None, created_at=now, expires_at=expires_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    db.commit()
+    if claimed:
+        return None
+    return db.execute(
+        select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+    ).scalar_one()
+
+
+def complete_key(db, scope: str, key: str, response_code: int, body: Dict[str, Any]):
+    """Store the final response; commit it together with the work it describes."""
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        .values(status="completed", response_code=response_code, response_body=json.dumps(body, default=str))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def hold_key(db, scope: str, key: str):
+    """
+    Keep an in-progress key after a call whose outcome is unknown (the provider may
+    have charged). A held key is not taken over once stale: retries get 409 until a
+    late result completes or releases it, or it expires. Commits.
+    """
+    db.rollback()
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.status == "in_progress")
+        .values(status="held")
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def release_key(db, scope: str, key: str):
+    """Give the key back after a failure so the client can retry with it."""
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key))
+    db.commit()
+
+
+def purge_expired(db, now: Optional[datetime] = None) -> int:
+    """Delete expired keys (range scan on ix_idempotency_keys_expires_at). Commits."""
+    now = now or datetime.utcnow()
+    removed = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now)).rowcount
+    db.commit()
+    return removed
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_EXECUTED,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
+from sqlalchemy import delete, select
+
+from config import SCHEDULER_HISTORY_RETENTION_DAYS, SCHEDULER_HISTORY_MAX_ROWS
+from database import SessionLocal, SchedulerJobRun
+
+logger = logging.getLogger(__name__)
+
+# Job functions may return a dict with these keys; they are summed into the run's metrics.
+# rows_changed counts rows a job updated or deleted; the *_ms keys are time spent per phase.
+TIMING_METRIC_KEYS = ("db_ms", "slack_ms")
+RUN_METRIC_KEYS = ("rows_scanned", "rows_changed", "messages_sent") + TIMING_METRIC_KEYS
+ERROR_MAX_LENGTH = 500
+
+OUTCOMES = {
+    EVENT_JOB_EXECUTED: "success",
+    EVENT_JOB_ERROR: "error",
+    EVENT_JOB_MISSED: "missed",
+    EVENT_JOB_MAX_INSTANCES: "skipped",  # previous run still going (max_instances)
+}
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _metric(key: str, value: Any):
+    if key in TIMING_METRIC_KEYS:
+        return round(float(value or 0), 1)
+    return int(value or 0)
+
+
+class PhaseTimer:
+    """Wall time a job run spends per phase, returned as "<phase>_ms" metrics (e.g. db_ms, slack_ms)."""
+
+    def __init__(self):
+        self.ms: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            key = f"{name}_ms"
+            self.ms[key] = round(self.ms.get(key, 0.0) + (time.monotonic() - started) * 1000, 1)
+
+    def metrics(self) -> Dict[str, float]:
+        return dict(self.ms)
+
+
+def _run_dict(run: SchedulerJobRun) -> Dict[str, Any]:
+    return {
+        "id": run.id,
+        "job_id": run.job_id,
+        "outcome": run.outcome,
+        "scheduled_run_time": run.scheduled_run_time.isoformat() if run.scheduled_run_time else None,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat(),
+        "duration_ms": run.duration_ms,
+        "rows_scanned": run.rows_scanned,
+        "rows_changed": run.rows_changed,
+        "messages_sent": run.messages_sent,
+        "db_ms": run.db_ms,
+        "slack_ms": run.slack_ms,
+        "error": run.error,
+    }
+
+
+class JobRunRecorder:
+    """
+    Records every scheduler job run from APScheduler events: one
+    scheduler_job_runs row per run (shared by all workers) plus per-job
+    counters for this process.
+
+    Duration runs from submission to the executor until the job returns. A job
+    reports rows scanned and changed, messages sent and per-phase timings
+    (see PhaseTimer) by returning a dict with RUN_METRIC_KEYS. History is cut
+    to `retention_days` and `max_rows` by prune().
+    """
+
+    def __init__(self, db_session_factory: Callable[[], SessionLocal],
+                 retention_days: float = SCHEDULER_HISTORY_RETENTION_DAYS,
+                 max_rows: int = SCHEDULER_HISTORY_MAX_ROWS):
+        self.db_session_factory = db_session_factory
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[str, Optional[datetime]], Tuple[float, datetime]] = {}
+        self._counters: Dict[str, Dict[str, Any]] = {}
+        self.write_errors = 0
+
+    def attach(self, scheduler):
+        scheduler.add_listener(
+            self._on_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES,
+        )
+
+    # ---------- Events ----------
+
+    def _on_event(self, event):
+        if event.code == EVENT_JOB_SUBMITTED:
+            with self._lock:
+                for run_time in event.scheduled_run_times:
+                    self._started[(event.job_id, run_time)] = (time.monotonic(), datetime.utcnow())
+            return
+
+        finished_at = datetime.utcnow()
+        run_times = getattr(event, "scheduled_run_times", None) or [getattr(event, "scheduled_run_time", None)]
+        for run_time in run_times:
+            with self._lock:
+                started = self._started.pop((event.job_id, run_time), None)
+            duration_ms = round((time.monotonic() - started[0]) * 1000, 1) if started else None
+            retval = getattr(event, "retval", None)
+            metrics = {key: _metric(key, retval.get(key)) for key in RUN_METRIC_KEYS} if isinstance(retval, dict) else {}
+            exception = getattr(event, "exception", None)
+            run = SchedulerJobRun(
+                job_id=event.job_id,
+                outcome=OUTCOMES[event.code],
+                scheduled_run_time=_naive_utc(run_time),
+                started_at=started[1] if started else None,
+                finished_at=finished_at,
+                duration_ms=duration_ms,
+                **{key: metrics.get(key) for key in RUN_METRIC_KEYS},
+                error=f"{type(exception).__name__}: {exception}"[:ERROR_MAX_LENGTH] if exception else None,
+            )
+            self._count(run)
+            self._save(run)
+
+    def _count(self, run: SchedulerJobRun):
+        with self._lock:
+            counters = self._counters.setdefault(run.job_id, {
+                "runs": 0, "succeeded": 0, "failed": 0, "missed": 0, "skipped": 0,
+                "rows_scanned": 0, "rows_changed": 0, "messages_sent": 0, "db_ms": 0.0, "slack_ms": 0.0,
+                "total_duration_ms": 0.0, "max_duration_ms": 0.0,
+                "last_outcome": None, "last_finished_at": None, "last_duration_ms": None, "last_error": None,
+            })
+            if run.outcome in ("success", "error"):
+                counters["runs"] += 1
+                counters["succeeded" if run.outcome == "success" else "failed"] += 1
+            else:
+                counters[run.outcome] += 1
+            for key in RUN_METRIC_KEYS:
+                counters[key] += getattr(run, key) or 0
+            for key in TIMING_METRIC_KEYS:
+                counters[key] = round(counters[key], 1)
+            if run.duration_ms is not None:
+                counters["total_duration_ms"] = round(counters["total_duration_ms"] + run.duration_ms, 1)
+                counters["max_duration_ms"] = max(counters["max_duration_ms"], run.duration_ms)
+                counters["last_duration_ms"] = run.duration_ms
+            counters["last_outcome"] = run.outcome
+            counters["last_finished_at"] = run.finished_at.isoformat()
+            if run.error:
+                counters["last_error"] = run.error
+
+    def _save(self, run: SchedulerJobRun):
+        db = self.db_session_factory()
+        try:
+            db.add(run)
+            db.commit()
+        except Exception:
+            # history is best effort; never fail the scheduler thread over it
+            self.write_errors += 1
+            logger.exception("Could not record run of job %r", run.job_id)
+        finally:
+            db.close()
+
+    # ---------- Reads ----------
+
+    def counters(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """This process's counters for `job_id` since start, with the mean duration."""
+        with self._lock:
+            counters = self._counters.get(job_id)
+            if counters is None:
+                return None
+            timed = counters["runs"]
+            return dict(counters, mean_duration_ms=round(counters["total_duration_ms"] / timed, 1) if timed else None)
+
+    def recent_runs(self, db, limit: int = 20, job_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest runs first, from every worker."""
+        query = select(SchedulerJobRun).order_by(SchedulerJobRun.id.desc()).limit(limit)
+        if job_id:
+            query = query.where(SchedulerJobRun.job_id == job_id)
+        return [_run_dict(run) for run in db.scalars(query)]
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "retention_days": self.retention_days,
+            "max_rows": self.max_rows,
+            "write_errors": self.write_errors,
+        }
+
+    # ---------- Retention ----------
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """Delete runs older than retention_days, then the oldest beyond max_rows. Returns rows removed."""
+        now = now or datetime.utcnow()
+        db = self.db_session_factory()
+        try:
+            removed = db.execute(
+                delete(SchedulerJobRun).where(SchedulerJobRun.finished_at < now - timedelta(days=self.retention_days))
+            ).rowcount
+            # id of the newest row that falls outside the cap
+            cutoff = db.execute(
+                select(SchedulerJobRun.id).order_by(SchedulerJobRun.id.desc()).offset(self.max_rows).limit(1)
+            ).scalar()
+            if cutoff is not None:
+                removed += db.execute(delete(SchedulerJobRun).where(SchedulerJobRun.id <= cutoff)).rowcount
+            db.commit()
+            return removed
+        finally:
+            db.close()
@@ -0,0 +1,187 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import SCHEDULER_LEASE_SECONDS, SCHEDULER_LEASE_RENEW_SECONDS
+from database import SessionLocal, LeaderLease
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_LEASE = "scheduler"
+
+
+def default_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderElector:
+    """
+    Elects one process as leader through a lease row in the database.
+
+    Every `renew_seconds` each process runs one conditional upsert on the lease:
+    it succeeds for the current holder (a renewal) or, once the lease has
+    expired, for whoever gets there first (a takeover, which bumps `term`).
+    A leader that cannot renew steps down as soon as the lease it last wrote
+    would have expired, so two processes never both believe they lead while the
+    database is reachable. Callbacks run on the elector's thread.
+    """
+
+    def __init__(self, db_session_factory: Callable[[], SessionLocal], name: str = SCHEDULER_LEASE,
+                 holder_id: Optional[str] = None,
+                 lease_seconds: float = SCHEDULER_LEASE_SECONDS, renew_seconds: float = SCHEDULER_LEASE_RENEW_SECONDS,
+                 on_elected: Optional[Callable[[], None]] = None, on_demoted: Optional[Callable[[], None]] = None,
+                 on_heartbeat: Optional[Callable[[], None]] = None):
+        self.db_session_factory = db_session_factory
+        self.name = name
+        self.holder_id = holder_id or default_holder_id()
+        self.lease_seconds = lease_seconds
+        self.renew_seconds = renew_seconds
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.on_heartbeat = on_heartbeat
+        self.is_leader = False
+        self.term: Optional[int] = None
+        self._valid_until = 0.0  # monotonic deadline of the lease we last wrote
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- Lease operations ----------
+
+    def try_acquire(self, now: Optional[datetime] = None) -> Optional[int]:
+        """Renew or take over the lease in one statement; the lease term if we hold it, else None."""
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        stmt = sqlite_insert(LeaderLease).values(
+            name=self.name, holder=self.holder_id, term=1, acquired_at=now, renewed_at=now, expires_at=expires_at,
+        )
+        takeover = LeaderLease.holder != stmt.excluded.holder
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LeaderLease.name],
+            set_={
+                "holder": stmt.excluded.holder,
+                "term": case((takeover, LeaderLease.term + 1), else_=LeaderLease.term),
+                "acquired_at": case((takeover, stmt.excluded.acquired_at), else_=LeaderLease.acquired_at),
+                "renewed_at": stmt.excluded.renewed_at,
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=(LeaderLease.holder == stmt.excluded.holder) | (LeaderLease.expires_at < now),
+        ).returning(LeaderLease.term)
+        db = self.db_session_factory()
+        try:
+            term = db.execute(stmt).scalar_one_or_none()
+            db.commit()
+            return term
+        finally:
+            db.close()
+
+    def release(self):
+        """Expire our lease now so another process can take over without waiting it out."""
+        db = self.db_session_factory()
+        try:
+            db.execute(
+                update(LeaderLease)
+                .where(LeaderLease.name == self.name, LeaderLease.holder == self.holder_id)
+                .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def current(self) -> Optional[Dict[str, Any]]:
+        """The lease row as stored (holder may have expired)."""
+        db = self.db_session_factory()
+        try:
+            lease = db.execute(select(LeaderLease).where(LeaderLease.name == self.name)).scalar_one_or_none()
+            if lease is None:
+                return None
+            return {
+                "holder": lease.holder,
+                "term": lease.term,
+                "acquired_at": lease.acquired_at.isoformat(),
+                "expires_at": lease.expires_at.isoformat(),
+                "expired": lease.expires_at < datetime.utcnow(),
+            }
+        finally:
+            db.close()
+
+    # ---------- Loop ----------
+
+    def heartbeat(self):
+        """One election round: renew/take over, then promote or demote this process."""
+        started = time.monotonic()
+        try:
+            term = self.try_acquire()
+        except Exception:
+            logger.exception("Leader lease %r: heartbeat failed", self.name)
+            if self.is_leader and time.monotonic() >= self._valid_until:
+                self._demote("lease could not be renewed before it expired")
+            return
+        if term is None:
+            if self.is_leader:
+                self._demote("lease was taken over")
+            return
+        self._valid_until = started + self.lease_seconds
+        if not self.is_leader:
+            self.is_leader = True
+            self.term = term
+            logger.info("Leader lease %r acquired by %s (term %d)", self.name, self.holder_id, term)
+            if self.on_elected:
+                self.on_elected()
+        elif self.on_heartbeat:
+            self.on_heartbeat()
+
+    def _demote(self, reason: str, level: int = logging.WARNING):
+        self.is_leader = False
+        logger.log(level, "Leader lease %r given up by %s: %s", self.name, self.holder_id, reason)
+        if self.on_demoted:
+            self.on_demoted()
+
+    def _run(self):
+        while not self._stop.wait(self.renew_seconds):
+            try:
+                self.heartbeat()
+            except Exception:
+                logger.exception("Leader lease %r: election callback failed", self.name)
+
+    def start(self):
+        """Run the first round inline (a lone process leads right away), then keep heartbeating."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        try:
+            self.heartbeat()
+        except Exception:
+            logger.exception("Leader lease %r: election callback failed", self.name)
+        self._thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, release: bool = True):
+        """Stop heartbeating; a leader steps down and (by default) hands the lease back."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.renew_seconds + 1)
+        if self.is_leader:
+            self._demote("shutting down", level=logging.INFO)
+            if release:
+                try:
+                    self.release()
+                except Exception:
+                    logger.exception("Leader lease %r: release failed", self.name)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "holder_id": self.holder_id,
+            "is_leader": self.is_leader,
+            "term": self.term if self.is_leader else None,
+            "lease_seconds": self.lease_seconds,
+            "renew_seconds": self.renew_seconds,
+        }
+
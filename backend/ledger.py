@@ -0,0 +1,181 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update, delete, select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import Member, Transaction, MemberLedgerBalance, LedgerCheckpoint, member_status_expression
+from money import from_cents
+
+LEDGER_CHECKPOINT = "member_balances"
+DRIFT_REPORT_LIMIT = 100
+
+
+def apply_member_payment(db, member_id: int, amount_cents: int, now: Optional[datetime] = None):
+    """
+    Add `amount_cents` to a member's balance in a single UPDATE.
+
+    The new amount_paid_cents, the derived payment_status and the version bump are
+    all computed by the database from the row's current values, so concurrent
+    payments to the same member serialize on the row instead of overwriting each
+    other. Returns the (amount_paid_cents, payment_status) row, or None if the
+    member does not exist. The caller owns the commit.
+    """
+    now = now or datetime.utcnow()
+    new_paid = func.coalesce(Member.amount_paid_cents, 0) + amount_cents
+    stmt = (
+        update(Member)
+        .where(Member.id == member_id)
+        .values(
+            amount_paid_cents=new_paid,
+            payment_status=member_status_expression(now, amount_paid=new_paid),
+            version_id=Member.version_id + 1,
+        )
+        .returning(Member.amount_paid_cents, Member.payment_status)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).one_or_none()
+
+
+def record_member_transaction(db, tx: Transaction, now: Optional[datetime] = None):
+    """
+    Add a transaction and apply its amount to the member's balance in the same
+    database transaction. Returns apply_member_payment()'s row, or None when the
+    transaction is not tied to a member.
+    """
+    db.add(tx)
+    if tx.member_id is None:
+        return None
+    db.flush()
+    return apply_member_payment(db, tx.member_id, tx.amount_cents, now)
+
+
+def reverse_member_transaction(db, tx: Transaction, now: Optional[datetime] = None):
+    """Delete a transaction and take its amount back off the member's balance."""
+    checkpoint = db.get(LedgerCheckpoint, LEDGER_CHECKPOINT)
+    settled = checkpoint is not None and tx.id <= checkpoint.last_transaction_id
+    row = None
+    if tx.member_id is not None:
+        row = apply_member_payment(db, tx.member_id, -tx.amount_cents, now)
+        if settled:
+            db.execute(
+                update(MemberLedgerBalance)
+                .where(MemberLedgerBalance.member_id == tx.member_id)
+                .values(settled_cents=MemberLedgerBalance.settled_cents - tx.amount_cents)
+            )
+    db.delete(tx)
+    db.flush()
+    if settled:
+        # SQLite hands out max(id) + 1, so after deleting the top rows new ids can fall
+        # at or below the mark; pull it down to the highest id that still exists.
+        remaining_max = db.scalar(select(func.max(Transaction.id))) or 0
+        checkpoint.last_transaction_id = min(checkpoint.last_transaction_id, remaining_max)
+    return row
+
+
+def forget_member_ledger(db, member_id: int):
+    """Drop a deleted member's settled total (their transactions are detached, not removed)."""
+    db.execute(delete(MemberLedgerBalance).where(MemberLedgerBalance.member_id == member_id))
+
+
+def reset_ledger(db):
+    """Clear settled totals and the checkpoint, e.g. after all transactions were removed."""
+    db.execute(delete(MemberLedgerBalance))
+    db.execute(delete(LedgerCheckpoint))
+
+
+def _ledger_cents():
+    settled = (
+        select(MemberLedgerBalance.settled_cents)
+        .where(MemberLedgerBalance.member_id == Member.id)
+        .scalar_subquery()
+    )
+    return func.coalesce(settled, 0)
+
+
+def reconcile_balances(db, repair: bool = False, full: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Compare every member's amount_paid_cents with the sum of their transactions.
+
+    Only transactions above the stored high-water mark are aggregated: one GROUP BY
+    over that id range is folded into member_ledger_balances, so a run costs
+    O(new transactions) plus one pass over members. `full` rebuilds the totals from
+    scratch. With `repair`, drifted members are reset to their ledger total (status
+    re-derived) in one UPDATE. Commits; returns a report.
+    """
+    now = now or datetime.utcnow()
+    # Touch the checkpoint first so this runs as a write transaction: no payment can
+    # commit between reading the ledger and moving the mark.
+    db.execute(
+        sqlite_insert(LedgerCheckpoint)
+        .values(name=LEDGER_CHECKPOINT, last_transaction_id=0, updated_at=now)
+        .on_conflict_do_update(index_elements=[LedgerCheckpoint.name], set_={"updated_at": now})
+    )
+    checkpoint = db.get(LedgerCheckpoint, LEDGER_CHECKPOINT, populate_existing=True)
+    if full:
+        db.execute(delete(MemberLedgerBalance))
+        checkpoint.last_transaction_id = 0
+    low = checkpoint.last_transaction_id
+    high = db.scalar(select(func.max(Transaction.id))) or 0
+
+    scanned = 0
+    if high > low:
+        window = (Transaction.id > low, Transaction.id <= high, Transaction.member_id.isnot(None))
+        scanned = db.scalar(select(func.count()).where(*window))
+        fold = sqlite_insert(MemberLedgerBalance).from_select(
+            ["member_id", "settled_cents"],
+            select(Transaction.member_id, func.sum(Transaction.amount_cents))
+            .where(*window)
+            .group_by(Transaction.member_id),
+        )
+        db.execute(fold.on_conflict_do_update(
+            index_elements=[MemberLedgerBalance.member_id],
+            set_={"settled_cents": MemberLedgerBalance.settled_cents + fold.excluded.settled_cents},
+        ))
+    checkpoint.last_transaction_id = high
+
+    ledger = _ledger_cents()
+    drifted = func.coalesce(Member.amount_paid_cents, 0) != ledger
+    drift_count, drift_cents = db.execute(
+        select(func.count(), func.coalesce(func.sum(func.coalesce(Member.amount_paid_cents, 0) - ledger), 0)).where(drifted)
+    ).one()
+    sample = db.execute(
+        select(Member.id, Member.name, Member.amount_paid_cents, ledger.label("ledger_cents"))
+        .where(drifted)
+        .order_by(Member.id)
+        .limit(DRIFT_REPORT_LIMIT)
+    ).all()
+
+    repaired = 0
+    if repair and drift_count:
+        repaired = db.execute(
+            update(Member)
+            .where(drifted)
+            .values(
+                amount_paid_cents=ledger,
+                payment_status=member_status_expression(now, amount_paid=ledger),
+                version_id=Member.version_id + 1,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+    db.commit()
+
+    return {
+        "ran_at": now.isoformat(),
+        "full": full,
+        "from_transaction_id": low,
+        "through_transaction_id": high,
+        "transactions_scanned": scanned,
+        "drifted_members": drift_count,
+        "drift_total": from_cents(drift_cents),
+        "drift": [
+            {
+                "member_id": r.id,
+                "name": r.name,
+                "amount_paid": from_cents(r.amount_paid_cents or 0),
+                "ledger_amount": from_cents(r.ledger_cents),
+            }
+            for r in sample
+        ],
+        "repaired": repaired,
+    }
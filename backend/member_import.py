@@ -0,0 +1,130 @@
+import csv
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, update
+
+from config import IMPORT_BATCH_SIZE
+from database import Member, MemberClass, member_status_expression, to_naive_utc
+from money import to_cents
+
+DEFAULT_DUES_CENTS = 18000
+IMPORT_COLUMNS = ["name", "email", "member_class", "phone", "dues_amount", "due_date"]
+
+
+def _clean_row(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep known columns and turn blank cells into None so optional fields validate."""
+    row = {}
+    for key in IMPORT_COLUMNS:
+        value = raw.get(key)
+        if isinstance(value, str):
+            value = value.strip() or None
+        row[key] = value
+    return row
+
+
+def _batches(reader: Iterable[Dict[str, Any]], size: int):
+    batch = []
+    # header is line 1, so the first data row is line 2
+    for line_no, raw in enumerate(reader, start=2):
+        batch.append((line_no, raw))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_members_csv(db, text_stream, row_model: Type[BaseModel], batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Validate and insert members from a CSV text stream.
+
+    Class dues are resolved with one lookup up front, existing emails are found with
+    one IN query per batch, and every batch is a bulk INSERT inside a single
+    transaction. Rows that fail validation or already exist are reported, not fatal.
+    Each batch's status is then derived by member_status_expression, so a row whose
+    due_date has already passed is stored as Overdue rather than Pending.
+    """
+    now = datetime.utcnow()
+    reader = csv.DictReader(text_stream)
+    if not reader.fieldnames or not {"name", "email"} <= {f.strip() for f in reader.fieldnames}:
+        raise ValueError("CSV header must include at least 'name' and 'email' columns")
+    reader.fieldnames = [f.strip() for f in reader.fieldnames]
+
+    class_dues = {
+        name: dues
+        for name, dues in db.query(MemberClass.name, MemberClass.dues_cents).filter(MemberClass.active == True)
+    }
+
+    total_rows = 0
+    inserted = 0
+    skipped_existing: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    seen_emails = set()
+
+    try:
+        for batch in _batches(reader, batch_size):
+            total_rows += len(batch)
+            valid = []
+            for line_no, raw in batch:
+                try:
+                    req = row_model(**_clean_row(raw))
+                except ValidationError as e:
+                    errors.append({
+                        "row": line_no,
+                        "email": (raw.get("email") or "").strip() or None,
+                        "errors": [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()],
+                    })
+                    continue
+                if req.email in seen_emails:
+                    errors.append({"row": line_no, "email": req.email, "errors": ["duplicate email within file"]})
+                    continue
+                seen_emails.add(req.email)
+                valid.append((line_no, req))
+
+            if not valid:
+                continue
+            existing = {
+                email for (email,) in db.query(Member.email).filter(Member.email.in_([req.email for _, req in valid]))
+            }
+            to_insert = []
+            for line_no, req in valid:
+                if req.email in existing:
+                    skipped_existing.append({"row": line_no, "email": req.email})
+                    continue
+                dues_cents = to_cents(req.dues_amount)
+                if dues_cents is None and req.member_class:
+                    dues_cents = class_dues.get(req.member_class)
+                if dues_cents is None:
+                    dues_cents = DEFAULT_DUES_CENTS
+                to_insert.append({
+                    "name": req.name,
+                    "email": req.email,
+                    "member_class": req.member_class,
+                    "phone": req.phone,
+                    "dues_cents": dues_cents,
+                    "amount_paid_cents": 0,
+                    "payment_status": "Pending",
+                    "role": "Member",
+                    "due_date": to_naive_utc(req.due_date),
+                })
+            if to_insert:
+                db.execute(insert(Member), to_insert)
+                db.execute(
+                    update(Member)
+                    .where(Member.email.in_([row["email"] for row in to_insert]))
+                    .values(payment_status=member_status_expression(now))
+                )
+                inserted += len(to_insert)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {
+        "total_rows": total_rows,
+        "inserted": inserted,
+        "skipped_existing": skipped_existing,
+        "errors": errors,
+    }
@@ -0,0 +1,20 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional, Union
+
+Number = Union[int, float, str, Decimal]
+
+CENT = Decimal("1")
+
+
+def to_cents(amount: Optional[Number]) -> Optional[int]:
+    """Dollars -> integer cents, rounding half-up on the decimal value (avoids 0.1 + 0.2 style drift)."""
+    if amount is None:
+        return None
+    return int((Decimal(str(amount)) * 100).quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: Optional[int]) -> Optional[float]:
+    """Integer cents -> dollars for API responses and display."""
+    if cents is None:
+        return None
+    return cents / 100
@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Opaque, URL-safe cursor holding the last row's sort key and id."""
+    if isinstance(sort_value, datetime):
+        payload = {"k": sort_value.isoformat(), "t": "dt", "id": row_id}
+    else:
+        payload = {"k": sort_value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["k"]
+        if payload.get("t") == "dt" and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_sort(sort: str, allowed) -> Tuple[str, bool]:
+    """Split 'name' / '-name' into (key, descending) and validate the key."""
+    descending = sort.startswith("-")
+    key = sort[1:] if descending else sort
+    if key not in allowed:
+        raise HTTPException(status_code=400, detail=f"Invalid sort key '{key}'. Allowed: {', '.join(sorted(allowed))}")
+    return key, descending
+
+
+def apply_keyset(query, sort_col, id_col, descending: bool, cursor: Optional[str], limit: int):
+    """
+    Order by (sort_col, id) and continue strictly after the cursor row.
+    Fetches limit + 1 rows so the caller can tell whether another page exists.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.filter(tuple_(sort_col, id_col) < tuple_(value, last_id))
+        else:
+            query = query.filter(tuple_(sort_col, id_col) > tuple_(value, last_id))
+    if descending:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+    return query.limit(limit + 1)
+
+
+def split_page(rows, limit: int, sort_key: str):
+    """Trim the look-ahead row and build the next cursor from the last row returned."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_key), last.id)
+    return rows, next_cursor
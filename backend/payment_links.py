@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import PAYMENT_LINK_PREGENERATE_CONCURRENCY
+from database import SessionLocal, Member, PaymentLink
+from money import from_cents
+from unpaid_members import outstanding_cents
+
+logger = logging.getLogger(__name__)
+
+# Namespace for the Square idempotency key of a link, derived from what it charges and its generation
+PAYMENT_LINK_KEY_NAMESPACE = uuid.UUID("0b7d4f8e-2c61-4a9b-b3e5-8f17c6a2d940")
+ERROR_REPORT_LIMIT = 20
+
+# (member_id, amount_cents, due_date): a cached link is reused only while all three match
+LinkKey = Tuple[int, int, Optional[datetime]]
+
+
+def link_key(member_id: int, amount_cents: int, due_date: Optional[datetime]) -> LinkKey:
+    return member_id, amount_cents, due_date
+
+
+def square_idempotency_key(key: LinkKey, generation: int) -> str:
+    """
+    Same key for the same member, amount, due date and link generation, so workers
+    racing to make one link get the same one back from Square. The generation
+    moves on with every new link, so a balance that returns to an earlier amount
+    gets a fresh link rather than the old (possibly already paid) one.
+    """
+    member_id, amount_cents, due_date = key
+    return str(uuid.uuid5(
+        PAYMENT_LINK_KEY_NAMESPACE,
+        f"{member_id}:{amount_cents}:{due_date.isoformat() if due_date else ''}:{generation}",
+    ))
+
+
+def _link_response(link: PaymentLink, cached: bool) -> Dict[str, Any]:
+    return {
+        "success": True,
+        "payment_link_url": link.url,
+        "payment_link_id": link.payment_link_id,
+        "order_id": link.order_id,
+        "amount": from_cents(link.amount_cents),
+        "cached": cached,
+        "message": "Payment link created successfully",
+    }
+
+
+def forget_payment_link(db, member_id: int):
+    """Drop a member's cached link (e.g. when the member is deleted). The caller owns the commit."""
+    db.execute(delete(PaymentLink).where(PaymentLink.member_id == member_id))
+
+
+class PaymentLinkCache:
+    """
+    Reuses each member's Square payment link until their outstanding balance or
+    due date changes.
+
+    A link is stored against the member with the amount and due date it was
+    created for. Any payment, dues change or due-date move alters that key, so
+    the next request makes a fresh link; no write path has to invalidate it.
+    Concurrent requests for the same key share one Square call, and the derived
+    idempotency key makes Square itself return the same link to other workers.
+    Links are written from the thread pool, each with its own session.
+    """
+
+    def __init__(self, gateway, db_session_factory: Callable[[], SessionLocal],
+                 pregenerate_concurrency: int = PAYMENT_LINK_PREGENERATE_CONCURRENCY):
+        self.gateway = gateway
+        self.db_session_factory = db_session_factory
+        self.pregenerate_concurrency = pregenerate_concurrency
+        self._inflight: Dict[LinkKey, asyncio.Future] = {}
+        self.pregenerating = False
+        self.last_pregeneration: Optional[Dict[str, Any]] = None
+
+    async def get_or_create(self, db, member: Member) -> Dict[str, Any]:
+        """Link for the member's current outstanding balance; service-style result dict."""
+        key = link_key(member.id, (member.dues_cents or 0) - (member.amount_paid_cents or 0), member.due_date)
+        link = db.get(PaymentLink, member.id)
+        if link is not None and link_key(link.member_id, link.amount_cents, link.due_date) == key:
+            return _link_response(link, cached=True)
+        return await self._create(key, link.generation + 1 if link else 1, member.name, member.email)
+
+    def _store(self, key: LinkKey, generation: int, result: Dict[str, Any]):
+        """Upsert the member's link in a session of its own (runs in the thread pool)."""
+        member_id, amount_cents, due_date = key
+        values = {"amount_cents": amount_cents, "due_date": due_date, "generation": generation,
+                  "url": result["payment_link_url"], "payment_link_id": result.get("payment_link_id"),
+                  "order_id": result.get("order_id"), "created_at": datetime.utcnow()}
+        db = self.db_session_factory()
+        try:
+            db.execute(
+                sqlite_insert(PaymentLink)
+                .values(member_id=member_id, **values)
+                .on_conflict_do_update(index_elements=[PaymentLink.member_id], set_=values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    async def _create(self, key: LinkKey, generation: int, name: str, email: str) -> Dict[str, Any]:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            member_id, amount_cents, due_date = key
+            result = await self.gateway.call(
+                "create_payment_link",
+                amount=from_cents(amount_cents),
+                member_name=name,
+                member_id=member_id,
+                member_email=email,
+                idempotency_key=square_idempotency_key(key, generation),
+            )
+            if result.get("success"):
+                await run_in_threadpool(self._store, key, generation, result)
+                result = dict(result, amount=from_cents(amount_cents), cached=False)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # nobody may be waiting on it; don't let asyncio log it as unretrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _links_to_generate(self) -> List[Any]:
+        """Members with a balance whose cached link is missing or stale (runs in the thread pool)."""
+        db = self.db_session_factory()
+        try:
+            balance = outstanding_cents()
+            return db.execute(
+                select(Member.id, Member.name, Member.email, Member.due_date, balance.label("amount_cents"),
+                       PaymentLink.generation)
+                .outerjoin(PaymentLink, PaymentLink.member_id == Member.id)
+                .where(
+                    balance > 0,
+                    or_(
+                        PaymentLink.member_id.is_(None),
+                        PaymentLink.amount_cents != balance,
+                        PaymentLink.due_date.is_not(Member.due_date),
+                    ),
+                )
+                .order_by(Member.due_date, Member.id)
+            ).all()
+        finally:
+            db.close()
+
+    async def pregenerate(self, concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Create links for every member with a balance whose cached link is missing or
+        stale, with at most `concurrency` Square calls in flight. Returns None if a
+        pre-generation is already running.
+        """
+        if self.pregenerating:
+            return None
+        self.pregenerating = True
+        concurrency = concurrency or self.pregenerate_concurrency
+        started = time.monotonic()
+        todo: List[Any] = []
+        outcomes: List[bool] = []
+        errors: List[Dict[str, Any]] = []
+        failure = None
+        try:
+            todo = await run_in_threadpool(self._links_to_generate)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def generate(row):
+                async with semaphore:
+                    result = await self._create(link_key(row.id, row.amount_cents, row.due_date),
+                                                (row.generation or 0) + 1, row.name, row.email)
+                if not result.get("success"):
+                    errors.append({"member_id": row.id, "message": result.get("message")})
+                return result.get("success", False)
+
+            outcomes = await asyncio.gather(*(generate(row) for row in todo))
+        except Exception as e:
+            failure = f"{type(e).__name__}: {e}"
+            logger.exception("Payment link pre-generation failed")
+        finally:
+            self.pregenerating = False
+
+        created = sum(1 for ok in outcomes if ok)
+        report = {
+            "ran_at": datetime.utcnow().isoformat(),
+            "members_needing_links": len(todo),
+            "created": created,
+            "failed": len(todo) - created,
+            "errors": errors[:ERROR_REPORT_LIMIT],
+            "error": failure,
+            "concurrency": concurrency,
+            "elapsed_seconds": round(time.monotonic() - started, 2),
+        }
+        if errors:
+            logger.warning("Payment link pre-generation: %d of %d failed", len(errors), len(todo))
+        self.last_pregeneration = report
+        return report
@@ -1,15 +1,78 @@
 # reminder_scheduler.py
 
-from datetime import datetime, timedelta
-from typing import Callable, List, Dict, Any
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Dict, Any, Optional
 
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
-from sqlalchemy import func
-
-from database import SessionLocal, Member  # uses your existing models :contentReference[oaicite:2]{index=2}
+from sqlalchemy import func, update
+
+from config import (
+    LEDGER_RECONCILE_INTERVAL_MINUTES,
+    LEDGER_AUTO_REPAIR,
+    IDEMPOTENCY_CLEANUP_INTERVAL_MINUTES,
+    SQUARE_ACCESS_TOKEN,
+    SQUARE_RECONCILE_INTERVAL_MINUTES,
+    SQUARE_RECONCILE_MAX_PAGES,
+    SCHEDULER_MISFIRE_GRACE_SECONDS,
+    SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES,
+)
+from database import engine, Base, SessionLocal, Member  # uses your existing models :contentReference[oaicite:2]{index=2}
+from stats_service import StatsService
+from ledger import reconcile_balances
+from idempotency import purge_expired
+from square_reconciliation import reconcile_square_payments
+from unpaid_members import UnpaidSummary, summarize_unpaid_members, unpaid_totals_by_class
+from job_history import JobRunRecorder, PhaseTimer
+from deadline_reminders import (
+    ClassDeadlineQueue,
+    DeadlineReminder,
+    class_due_date_rows,
+    claim_reminder,
+    release_reminder,
+    purge_reminder_log,
+)
+
+logger = logging.getLogger(__name__)
+
+OVERDUE_SWEEP_JOB_ID = "overdue_sweep"
+LEDGER_RECONCILE_JOB_ID = "ledger_reconcile"
+IDEMPOTENCY_CLEANUP_JOB_ID = "idempotency_cleanup"
+SQUARE_RECONCILE_JOB_ID = "square_reconcile"
+CLASS_DEADLINE_JOB_ID = "class_deadline_reminders"
+JOB_HISTORY_PRUNE_JOB_ID = "job_history_prune"
+
+# Reminder jobs (configured through the API) live in the app database; the overdue sweep and
+# the maintenance jobs are rebuilt from config on every start, so they stay in memory
+PERSISTENT_JOBSTORE = "default"
+VOLATILE_JOBSTORE = "volatile"
+SCHEDULER_JOBS_TABLE = "scheduler_jobs"
+
+# Built at import so its table joins Base.metadata and init_db() creates it with the schema
+persistent_job_store = SQLAlchemyJobStore(engine=engine, tablename=SCHEDULER_JOBS_TABLE, metadata=Base.metadata)
+
+_active_scheduler: Optional["ReminderScheduler"] = None
+
+
+def _delivered(result: Optional[Dict[str, Any]]) -> int:
+    """1 if a SlackMessagingService send succeeded, for the job's messages_sent."""
+    return 1 if result and result.get("success") else 0
+
+
+def run_reminder_job(job: str, *args, **kwargs):
+    """
+    Callable stored with persistent jobs. APScheduler can only persist a reference
+    to a module-level function, so jobs name the ReminderScheduler method to run.
+    """
+    if _active_scheduler is None:
+        raise RuntimeError(f"No ReminderScheduler to run job {job!r}")
+    return getattr(_active_scheduler, f"_job_{job}")(*args, **kwargs)
 
 
 class ReminderScheduler:
@@ -20,159 +83,424 @@ class ReminderScheduler:
     for various reminder types.
     """
 
-    def __init__(self, db_session_factory: Callable[[], SessionLocal], slack_service):
+    def __init__(self, db_session_factory: Callable[[], SessionLocal], slack_service,
+                 stats_service: Optional[StatsService] = None, square_service=None):
         self.db_session_factory = db_session_factory
         self.slack_service = slack_service
-        self.scheduler = BackgroundScheduler()
+        self.square_service = square_service
+        self.stats_service = stats_service or StatsService(db_session_factory)
+        self.scheduler = BackgroundScheduler(
+            jobstores={PERSISTENT_JOBSTORE: persistent_job_store, VOLATILE_JOBSTORE: MemoryJobStore()},
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": SCHEDULER_MISFIRE_GRACE_SECONDS,
+            },
+        )
+        self.job_history = JobRunRecorder(db_session_factory)
+        self.job_history.attach(self.scheduler)
         self.is_running = False
+        self.last_sweep: Optional[Dict[str, Any]] = None
+        self.last_reconciliation: Optional[Dict[str, Any]] = None
+        self.last_square_reconciliation: Optional[Dict[str, Any]] = None
+        self._sweep_lock = threading.Lock()
+        self._square_reconcile_lock = threading.Lock()
+        self.class_deadlines = ClassDeadlineQueue()
+        self._class_deadline_lock = threading.Lock()
+
+        global _active_scheduler
+        _active_scheduler = self
 
     # ---------- Lifecycle ----------
 
-    def start(self):
-        """Start the underlying scheduler."""
-        if not self.is_running:
-            self.scheduler.start()
+    def start(self, paused: bool = False):
+        """
+        Start the underlying scheduler. A paused scheduler accepts and lists jobs
+        but runs none until resume() (used on workers that aren't the leader).
+        """
+        if not self.scheduler.running:
+            self.scheduler.start(paused=paused)
+            self.is_running = not paused
+
+    def resume(self):
+        """Start running jobs (this process became the scheduler leader)."""
+        if self.scheduler.running:
+            self.scheduler.resume()
             self.is_running = True
 
+    def pause(self):
+        """Hold all jobs without dropping them (this process lost the leadership)."""
+        if self.scheduler.running:
+            self.scheduler.pause()
+            self.is_running = False
+
     def shutdown(self):
         """Stop the scheduler."""
-        if self.is_running:
+        if self.scheduler.running:
             self.scheduler.shutdown(wait=False)
             self.is_running = False
 
+    def wakeup(self):
+        """
+        Re-read the job stores now. Jobs another worker wrote to the shared store are
+        otherwise only noticed at this process's next scheduled wakeup.
+        """
+        if self.scheduler.running:
+            self.scheduler.wakeup()
+
+    def has_persistent_jobs(self) -> bool:
+        return bool(self.scheduler.get_jobs(jobstore=PERSISTENT_JOBSTORE))
+
     # ---------- Helpers ----------
 
-    def _get_unpaid_members(
-        self,
-        statuses: List[str],
-    ) -> List[Dict[str, Any]]:
+    def _get_unpaid_members(self, statuses: List[str]) -> UnpaidSummary:
+        """
+        Stream members whose payment_status is in `statuses` and who still owe
+        (see unpaid_members). Returns totals plus the first rows for
+        SlackMessagingService.send_bulk_reminder_summary.
+        """
+        db = self.db_session_factory()
+        try:
+            return summarize_unpaid_members(db, statuses)
+        finally:
+            db.close()
+
+    def _get_stats(self) -> Dict[str, Any]:
+        """Same stats as /api/stats for the weekly Slack summary (shared, cached service)."""
+        return self.stats_service.get_stats()
+
+    # ---------- Overdue sweep ----------
+
+    def sweep_overdue(self, now: Optional[datetime] = None) -> int:
         """
-        Query DB for members whose payment_status is in `statuses`.
-        Returns a list of dicts compatible with SlackMessagingService.send_bulk_reminder_summary.
+        Flip every unpaid Pending member whose due_date has passed to Overdue
+        with a single UPDATE. Returns the number of transitions; last_sweep also
+        records how many past-due Pending rows were scanned.
         """
+        now = now or datetime.utcnow()
         db = self.db_session_factory()
         try:
-            normalized_statuses = set(s.lower() for s in statuses)
-            members = (
-                db.query(Member)
-                .filter(
-                    func.lower(Member.payment_status).in_(normalized_statuses)
+            scanned = (
+                db.query(func.count(Member.id))
+                .filter(Member.payment_status == "Pending", Member.due_date.isnot(None), Member.due_date <= now)
+                .scalar()
+            )
+            result = db.execute(
+                update(Member)
+                .where(
+                    Member.payment_status == "Pending",
+                    Member.due_date.isnot(None),
+                    Member.due_date <= now,
+                    func.coalesce(Member.amount_paid_cents, 0) < func.coalesce(Member.dues_cents, 0),
                 )
-                .all()
+                .values(payment_status="Overdue", version_id=Member.version_id + 1)
+                .execution_options(synchronize_session=False)
             )
+            db.commit()
+            transitions = result.rowcount
+        finally:
+            db.close()
+        if transitions:
+            self.stats_service.invalidate()
 
-            unpaid_data = []
-            for m in members:
-                amount_due = (m.dues_amount or 0.0) - (m.amount_paid or 0.0)
-                if amount_due <= 0:
-                    continue
+        self.last_sweep = {"ran_at": now.isoformat(), "scanned": scanned, "transitions": transitions}
+        logger.info("Overdue sweep moved %d member(s) from Pending to Overdue", transitions)
+        return transitions
 
-                unpaid_data.append(
-                    {
-                        "name": m.name,
-                        "class": m.role,
-                        "amount_due": amount_due,
-                        "status": m.payment_status,
-                    }
-                )
-            return unpaid_data
+    def _next_pending_due_date(self, now: datetime) -> Optional[datetime]:
+        """Earliest future due_date among Pending members (served by ix_members_status_due_date)."""
+        db = self.db_session_factory()
+        try:
+            return (
+                db.query(func.min(Member.due_date))
+                .filter(Member.payment_status == "Pending", Member.due_date > now)
+                .scalar()
+            )
         finally:
             db.close()
 
-    def _get_stats(self) -> Dict[str, Any]:
+    def schedule_overdue_sweep(self) -> Optional[datetime]:
+        """
+        (Re)arm the one-shot sweep job for the next Pending due_date.
+        Call after any write that sets or moves a due date.
+        """
+        with self._sweep_lock:
+            next_due = self._next_pending_due_date(datetime.utcnow())
+            if next_due is None:
+                if self.scheduler.get_job(OVERDUE_SWEEP_JOB_ID):
+                    self.scheduler.remove_job(OVERDUE_SWEEP_JOB_ID)
+                return None
+            # due dates are stored as naive UTC
+            self.scheduler.add_job(
+                self._job_overdue_sweep,
+                trigger=DateTrigger(run_date=next_due.replace(tzinfo=timezone.utc)),
+                id=OVERDUE_SWEEP_JOB_ID,
+                jobstore=VOLATILE_JOBSTORE,
+                replace_existing=True,
+                name="Overdue status sweep",
+                misfire_grace_time=None,
+            )
+            return next_due
+
+    # ---------- Per-class deadline reminders ----------
+
+    def sync_class_deadlines(self, now: Optional[datetime] = None) -> Optional[datetime]:
+        """
+        Bring the deadline reminder queue in line with the ClassDueDate rows and
+        re-arm its single timer job. Call after creating or deleting a due date;
+        only the changed records' reminders are added or dropped.
+        """
+        now = now or datetime.utcnow()
+        with self._class_deadline_lock:
+            db = self.db_session_factory()
+            try:
+                removed, added = self.class_deadlines.sync(class_due_date_rows(db), now)
+                if removed:
+                    purge_reminder_log(db)
+                    db.commit()
+            finally:
+                db.close()
+            return self._arm_class_deadline_timer()
+
+    def _arm_class_deadline_timer(self) -> Optional[datetime]:
+        """Point the timer job at the queue head (caller holds _class_deadline_lock)."""
+        fire_at = self.class_deadlines.next_fire_at()
+        job = self.scheduler.get_job(CLASS_DEADLINE_JOB_ID)
+        if fire_at is None:
+            if job:
+                self.scheduler.remove_job(CLASS_DEADLINE_JOB_ID)
+            return None
+        run_date = fire_at.replace(tzinfo=timezone.utc)
+        if job is None or job.trigger.run_date != run_date:
+            self.scheduler.add_job(
+                self._job_class_deadline_reminders,
+                trigger=DateTrigger(run_date=run_date),
+                id=CLASS_DEADLINE_JOB_ID,
+                jobstore=VOLATILE_JOBSTORE,
+                replace_existing=True,
+                name="Class deadline reminders",
+                # the queue applies its own grace window to what it hands out
+                misfire_grace_time=None,
+            )
+        return fire_at
+
+    def send_class_deadline_reminders(self, reminders: List[DeadlineReminder],
+                                      timer: Optional[PhaseTimer] = None) -> int:
         """
-        Compute the same stats as /api/stats for weekly Slack summary.
-        Mirrors logic in app.get_statistics. :contentReference[oaicite:3]{index=3}
+        Post one Slack reminder per due date and offset, with per-class unpaid
+        counts from a single grouped query. A reminder with someone left to pay
+        is claimed in the log before posting, so only one worker sends it; if the
+        post fails the claim is dropped again and the reminder retried later
+        (ClassDeadlineQueue.retry). Returns the number sent; `timer` gets the
+        database and Slack phases.
         """
+        timer = timer or PhaseTimer()
+        with timer.phase("db"):
+            db = self.db_session_factory()
+            try:
+                totals = unpaid_totals_by_class(db, {name for reminder in reminders for name in reminder.class_names})
+                to_send = []
+                for reminder in reminders:
+                    classes = [totals[name] for name in reminder.class_names if name in totals]
+                    # nothing is claimed when everyone in these classes has paid
+                    if classes and claim_reminder(db, reminder):
+                        to_send.append((reminder, classes))
+                db.commit()
+            finally:
+                db.close()
+
+        sent = 0
+        failed = []
+        for reminder, classes in to_send:
+            try:
+                with timer.phase("slack"):
+                    result = self.slack_service.send_class_deadline_reminder(
+                        due_date=reminder.due_date,
+                        days_until_deadline=reminder.days_before,
+                        classes=classes,
+                    )
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            if result.get("success"):
+                sent += 1
+            else:
+                logger.warning("Class deadline reminder for %s (%d days before) failed: %s",
+                               reminder.due_date.date(), reminder.days_before, result.get("message"))
+                failed.append(reminder)
+
+        if failed:
+            with timer.phase("db"):
+                db = self.db_session_factory()
+                try:
+                    for reminder in failed:
+                        release_reminder(db, reminder)
+                    db.commit()
+                finally:
+                    db.close()
+            now = datetime.utcnow()
+            with self._class_deadline_lock:
+                for reminder in failed:
+                    self.class_deadlines.retry(reminder, now)
+        return sent
+
+    def class_deadline_status(self) -> Dict[str, Any]:
+        with self._class_deadline_lock:
+            return self.class_deadlines.status()
+
+    def reconcile_ledger(self, repair: bool = False, full: bool = False) -> Dict[str, Any]:
+        """Check member balances against the transaction ledger (see ledger.reconcile_balances)."""
         db = self.db_session_factory()
         try:
-            total_members = db.query(Member).count()
-            paid_members = db.query(Member).filter(Member.payment_status == "Paid").count()
-            pending_members = db.query(Member).filter(Member.payment_status == "Pending").count()
-            overdue_members = db.query(Member).filter(Member.payment_status == "Overdue").count()
-
-            total_expected = db.query(func.sum(Member.dues_amount)).scalar() or 0
-            total_collected = db.query(func.sum(Member.amount_paid)).scalar() or 0
-            outstanding = total_expected - total_collected
-            collection_rate = (total_collected / total_expected * 100) if total_expected > 0 else 0
-
-            return {
-                "total_members": total_members,
-                "paid_members": paid_members,
-                "pending_members": pending_members,
-                "overdue_members": overdue_members,
-                "total_expected": float(total_expected),
-                "total_collected": float(total_collected),
-                "outstanding_balance": float(outstanding),
-                "collection_rate": round(collection_rate, 2),
-            }
+            report = reconcile_balances(db, repair=repair, full=full)
         finally:
             db.close()
+        if report["drifted_members"]:
+            logger.warning(
+                "Ledger drift on %d member(s), %.2f total%s",
+                report["drifted_members"], report["drift_total"], " (repaired)" if report["repaired"] else "",
+            )
+        if report["repaired"]:
+            self.stats_service.invalidate()
+        self.last_reconciliation = report
+        return report
+
+    def reconcile_square(self, begin: Optional[datetime] = None, end: Optional[datetime] = None,
+                         max_pages: int = SQUARE_RECONCILE_MAX_PAGES) -> Optional[Dict[str, Any]]:
+        """
+        Diff Square's payments against local transactions (see
+        square_reconciliation.reconcile_square_payments). Returns None if a
+        reconciliation is already running in this process.
+        """
+        if not self._square_reconcile_lock.acquire(blocking=False):
+            return None
+        try:
+            db = self.db_session_factory()
+            try:
+                report = reconcile_square_payments(db, self.square_service, begin=begin, end=end, max_pages=max_pages)
+            finally:
+                db.close()
+        finally:
+            self._square_reconcile_lock.release()
+        if report["status"] == "failed":
+            logger.warning("Square reconciliation run %d stopped: %s", report["run_id"], report["error"])
+        elif report["complete"] and (report["missing_count"] or report["extra_count"] or report["mismatch_count"]):
+            logger.warning(
+                "Square reconciliation run %d: %d missing, %d extra, %d amount mismatch(es)",
+                report["run_id"], report["missing_count"], report["extra_count"], report["mismatch_count"],
+            )
+        self.last_square_reconciliation = report
+        return report
 
     # ---------- Job functions ----------
 
+    def _job_overdue_sweep(self):
+        """Apply the overdue transition, then wait for the next due date."""
+        transitions = self.sweep_overdue()
+        self.schedule_overdue_sweep()
+        return {"rows_scanned": self.last_sweep["scanned"], "rows_changed": transitions}
+
+    def _job_class_deadline_reminders(self):
+        """Send the reminders that came due, then wait for the next one."""
+        with self._class_deadline_lock:
+            due = self.class_deadlines.pop_due(datetime.utcnow())
+        timer = PhaseTimer()
+        sent = self.send_class_deadline_reminders(due, timer) if due else 0
+        with self._class_deadline_lock:
+            self._arm_class_deadline_timer()
+        return {"messages_sent": sent, **timer.metrics()}
+
+    def _job_ledger_reconcile(self, repair: bool = False):
+        report = self.reconcile_ledger(repair=repair)
+        return {"rows_scanned": report["transactions_scanned"]}
+
+    def _job_square_reconcile(self):
+        """Continue the open Square reconciliation run, or start one over the default window."""
+        report = self.reconcile_square()
+        return {"rows_scanned": report["payments_scanned"] if report else 0}
+
+    def _job_purge_idempotency_keys(self):
+        """Evict expired payment idempotency keys."""
+        db = self.db_session_factory()
+        try:
+            removed = purge_expired(db)
+        finally:
+            db.close()
+        if removed:
+            logger.info("Purged %d expired idempotency key(s)", removed)
+        return {"rows_changed": removed}
+
+    def _job_prune_job_history(self):
+        """Apply the job run history retention."""
+        removed = self.job_history.prune()
+        return {"rows_changed": removed}
+
+    def _send_unpaid_summary(self, statuses: List[str]) -> Dict[str, Any]:
+        """Post the bulk reminder for members in `statuses`, timing the query and the Slack call."""
+        timer = PhaseTimer()
+        with timer.phase("db"):
+            unpaid = self._get_unpaid_members(statuses)
+        sent = 0
+        if unpaid.count:
+            with timer.phase("slack"):
+                sent = _delivered(self.slack_service.send_bulk_reminder_summary(**unpaid.slack_args()))
+        return {"rows_scanned": unpaid.count, "messages_sent": sent, **timer.metrics()}
+
     def _job_daily_overdue(self):
         """Send Slack summary of all overdue members (called by APScheduler)."""
-        unpaid = self._get_unpaid_members(["Overdue", "overdue"])
-        if unpaid:
-            self.slack_service.send_bulk_reminder_summary(unpaid)
+        return self._send_unpaid_summary(["Overdue"])
 
     def _job_pending_reminder(self):
         """Send Slack summary of all pending members (for bi-weekly / weekly reminders)."""
-        unpaid = self._get_unpaid_members(["Pending", "pending"])
-        if unpaid:
-            self.slack_service.send_bulk_reminder_summary(unpaid)
+        return self._send_unpaid_summary(["Pending"])
 
     def _job_weekly_summary(self):
         """Send weekly high-level stats to Slack."""
-        stats = self._get_stats()
-        self.slack_service.send_weekly_summary(stats)
+        timer = PhaseTimer()
+        with timer.phase("db"):
+            stats = self._get_stats()
+        with timer.phase("slack"):
+            sent = _delivered(self.slack_service.send_weekly_summary(stats))
+        return {"messages_sent": sent, **timer.metrics()}
 
     def _job_deadline_reminder(self, deadline_date: datetime):
         """
         Send Slack reminder about an upcoming payment deadline.
         """
-        db = self.db_session_factory()
-        try:
-            total_members = db.query(Member).count()
-            amt_expected = db.query(func.sum(Member.dues_amount)).scalar() or 0
-            amt_collected = db.query(func.sum(Member.amount_paid)).scalar() or 0
-            outstanding = amt_expected - amt_collected
-
-            # Count members with any outstanding balance
-            members_unpaid = (
-                db.query(Member)
-                .filter((Member.dues_amount - Member.amount_paid) > 0)
-                .count()
-            )
-        finally:
-            db.close()
-
         days_until = (deadline_date.date() - datetime.now().date()).days
         if days_until < 0:
             return  # deadline already passed
 
-        self.slack_service.send_deadline_reminder(
-            days_until_deadline=days_until,
-            unpaid_count=members_unpaid,
-            total_outstanding=float(outstanding),
-        )
+        timer = PhaseTimer()
+        with timer.phase("db"):
+            stats = self._get_stats()
+
+        with timer.phase("slack"):
+            result = self.slack_service.send_deadline_reminder(
+                days_until_deadline=days_until,
+                unpaid_count=stats["unpaid_members"],
+                total_outstanding=stats["outstanding_balance"],
+            )
+        return {"messages_sent": _delivered(result), **timer.metrics()}
 
     # ---------- Public API used by app.py ----------
 
     def list_jobs(self) -> List[Dict[str, Any]]:
         """Return a serializable list of all scheduled jobs."""
         jobs_info = []
-        for job in self.scheduler.get_jobs():
-            jobs_info.append(
-                {
-                    "id": job.id,
-                    "name": job.name,
-                    "next_run_time": job.next_run_time.isoformat()
-                    if job.next_run_time
-                    else None,
-                }
-            )
+        for store in (PERSISTENT_JOBSTORE, VOLATILE_JOBSTORE):
+            for job in self.scheduler.get_jobs(jobstore=store):
+                jobs_info.append(
+                    {
+                        "id": job.id,
+                        "name": job.name,
+                        "next_run_time": job.next_run_time.isoformat()
+                        if job.next_run_time
+                        else None,
+                        "persistent": store == PERSISTENT_JOBSTORE,
+                        # this process's runs since start; history covers every worker
+                        "metrics": self.job_history.counters(job.id),
+                    }
+                )
         return jobs_info
 
     def add_daily_overdue_reminder(self, hour: int = 9, minute: int = 0):
@@ -182,13 +510,65 @@ class ReminderScheduler:
         """
         trigger = CronTrigger(hour=hour, minute=minute)  # every day
         self.scheduler.add_job(
-            self._job_daily_overdue,
+            run_reminder_job,
+            args=["daily_overdue"],
             trigger=trigger,
             id="daily_overdue_reminder",
             replace_existing=True,
             name="Daily overdue reminder",
         )
 
+    def add_ledger_reconciliation(self, interval_minutes: int = 60, repair: bool = False):
+        """
+        Schedule the incremental balance reconciliation every `interval_minutes`.
+        With `repair`, drifted balances are reset to the ledger total.
+        """
+        self.scheduler.add_job(
+            self._job_ledger_reconcile,
+            trigger=IntervalTrigger(minutes=interval_minutes),
+            kwargs={"repair": repair},
+            id=LEDGER_RECONCILE_JOB_ID,
+            jobstore=VOLATILE_JOBSTORE,
+            replace_existing=True,
+            name="Ledger balance reconciliation",
+        )
+
+    def add_idempotency_cleanup(self, interval_minutes: int = 30):
+        """Schedule eviction of expired idempotency keys every `interval_minutes`."""
+        self.scheduler.add_job(
+            self._job_purge_idempotency_keys,
+            trigger=IntervalTrigger(minutes=interval_minutes),
+            id=IDEMPOTENCY_CLEANUP_JOB_ID,
+            jobstore=VOLATILE_JOBSTORE,
+            replace_existing=True,
+            name="Idempotency key cleanup",
+        )
+
+    def add_square_reconciliation(self, interval_minutes: int = 360):
+        """
+        Schedule the Square payments reconciliation every `interval_minutes`. A run
+        that hits its page budget is picked up again by the next one.
+        """
+        self.scheduler.add_job(
+            self._job_square_reconcile,
+            trigger=IntervalTrigger(minutes=interval_minutes),
+            id=SQUARE_RECONCILE_JOB_ID,
+            jobstore=VOLATILE_JOBSTORE,
+            replace_existing=True,
+            name="Square payments reconciliation",
+        )
+
+    def add_job_history_pruning(self, interval_minutes: int = 60):
+        """Schedule the job run history retention every `interval_minutes`."""
+        self.scheduler.add_job(
+            self._job_prune_job_history,
+            trigger=IntervalTrigger(minutes=interval_minutes),
+            id=JOB_HISTORY_PRUNE_JOB_ID,
+            jobstore=VOLATILE_JOBSTORE,
+            replace_existing=True,
+            name="Job run history pruning",
+        )
+
     def add_weekly_summary(self, day_of_week: str = "mon", hour: int = 9, minute: int = 0):
         """
         Schedule a weekly summary (stats) Slack message.
@@ -200,7 +580,8 @@ class ReminderScheduler:
             minute=minute,
         )
         self.scheduler.add_job(
-            self._job_weekly_summary,
+            run_reminder_job,
+            args=["weekly_summary"],
             trigger=trigger,
             id="weekly_summary",
             replace_existing=True,
@@ -242,7 +623,8 @@ class ReminderScheduler:
         trigger = IntervalTrigger(weeks=2, start_date=first_run)
 
         self.scheduler.add_job(
-            self._job_pending_reminder,
+            run_reminder_job,
+            args=["pending_reminder"],
             trigger=trigger,
             id="biweekly_pending_reminder",
             replace_existing=True,
@@ -272,12 +654,12 @@ class ReminderScheduler:
             trigger = DateTrigger(run_date)
 
             self.scheduler.add_job(
-                self._job_deadline_reminder,
+                run_reminder_job,
                 trigger=trigger,
                 id=job_id,
                 replace_existing=True,
                 name=f"Deadline reminder ({days_before} days before)",
-                args=[deadline_date],
+                args=["deadline_reminder", deadline_date],
             )
 
     def pause_job(self, job_id: str):
@@ -295,12 +677,33 @@ class ReminderScheduler:
 def setup_default_reminders(reminder_scheduler: ReminderScheduler, payment_deadline: datetime):
     """
     Called from app.startup_event in app.py :contentReference[oaicite:4]{index=4}
-    to register some default jobs:
+    to register some default jobs. Every start (in memory, from config):
+    - ledger reconciliation every LEDGER_RECONCILE_INTERVAL_MINUTES
+    - expired idempotency key cleanup every IDEMPOTENCY_CLEANUP_INTERVAL_MINUTES
+    - job run history pruning every SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES
+    - Square payments reconciliation every SQUARE_RECONCILE_INTERVAL_MINUTES (when Square is configured)
+    Only while the persistent job store is empty (first start, or every reminder
+    was deleted); afterwards the stored jobs, including API changes, are kept:
     - daily overdue reminder at 9:00
     - weekly summary on Monday at 9:00
     - bi-weekly pending reminder on Wednesday at 9:00
     - deadline reminders 7, 3, 1 days before payment_deadline
     """
+    reminder_scheduler.add_ledger_reconciliation(
+        interval_minutes=LEDGER_RECONCILE_INTERVAL_MINUTES,
+        repair=LEDGER_AUTO_REPAIR,
+    )
+
+    reminder_scheduler.add_idempotency_cleanup(interval_minutes=IDEMPOTENCY_CLEANUP_INTERVAL_MINUTES)
+
+    reminder_scheduler.add_job_history_pruning(interval_minutes=SCHEDULER_HISTORY_PRUNE_INTERVAL_MINUTES)
+
+    if reminder_scheduler.square_service is not None and SQUARE_ACCESS_TOKEN:
+        reminder_scheduler.add_square_reconciliation(interval_minutes=SQUARE_RECONCILE_INTERVAL_MINUTES)
+
+    if reminder_scheduler.has_persistent_jobs():
+        return
+
     # Daily overdue at 9am
     reminder_scheduler.add_daily_overdue_reminder(hour=9, minute=0)
 
@@ -0,0 +1,140 @@
+"""
+Replay Square webhook payloads against a running backend.
+
+Sends recorded events (a JSON array, a single JSON object or one JSON object per
+line) or synthetic payment.updated events for existing members, each signed the
+way Square signs them, from concurrent clients; then reports throughput and
+the ingestion counters from /api/status.
+
+    python replay_webhooks.py --url http://localhost:8000 --file events.ndjson
+    python replay_webhooks.py --synthetic 5000 --members 1-200 --duplicates 0.2
+
+The signature key and notification URL default to SQUARE_WEBHOOK_SIGNATURE_KEY
+and SQUARE_WEBHOOK_NOTIFICATION_URL (else <url>/api/webhooks/square).
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from config import SQUARE_WEBHOOK_SIGNATURE_KEY, SQUARE_WEBHOOK_NOTIFICATION_URL
+from square_service import member_payment_note
+from square_webhooks import SIGNATURE_HEADER, compute_signature
+
+
+def load_events(path):
+    with open(path) as f:
+        text = f.read().strip()
+    if not text:
+        return []
+    if text[0] == "[":
+        return json.loads(text)
+    try:
+        return [json.loads(text)]
+    except ValueError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def synthetic_events(count, member_ids, duplicate_ratio, amount_cents):
+    events = []
+    for _ in range(count):
+        if events and random.random() < duplicate_ratio:
+            # redelivery of an earlier event, which must not be booked twice
+            events.append(dict(random.choice(events), event_id=str(uuid.uuid4())))
+            continue
+        events.append({
+            "merchant_id": "REPLAY",
+            "type": "payment.updated",
+            "event_id": str(uuid.uuid4()),
+            "created_at": datetime.utcnow().isoformat() + "Z",
+            "data": {
+                "type": "payment",
+                "id": uuid.uuid4().hex,
+                "object": {"payment": {
+                    "id": uuid.uuid4().hex,
+                    "status": "COMPLETED",
+                    "amount_money": {"amount": amount_cents, "currency": "USD"},
+                    "note": member_payment_note(random.choice(member_ids)),
+                    "created_at": datetime.utcnow().isoformat() + "Z",
+                }},
+            },
+        })
+    return events
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_members(spec):
+    if "-" in spec:
+        low, high = spec.split("-", 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(m) for m in spec.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--file", help="recorded payloads (JSON array, object or NDJSON)")
+    parser.add_argument("--synthetic", type=int, default=0, help="number of synthetic events to generate")
+    parser.add_argument("--members", default="1-10", help="member ids for synthetic events, e.g. 1-200 or 3,5,8")
+    parser.add_argument("--amount-cents", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of synthetic events that are redeliveries")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--signature-key", default=SQUARE_WEBHOOK_SIGNATURE_KEY)
+    parser.add_argument("--notification-url", default=SQUARE_WEBHOOK_NOTIFICATION_URL)
+    args = parser.parse_args()
+
+    if not args.signature_key:
+        parser.error("a signature key is required (--signature-key or SQUARE_WEBHOOK_SIGNATURE_KEY)")
+    events = load_events(args.file) if args.file else []
+    if args.synthetic:
+        events += synthetic_events(args.synthetic, parse_members(args.members), args.duplicates, args.amount_cents)
+    if not events:
+        parser.error("nothing to replay; pass --file and/or --synthetic")
+
+    endpoint = args.url.rstrip("/") + "/api/webhooks/square"
+    notification_url = args.notification_url or endpoint
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def send(event):
+        body = json.dumps(event).encode()
+        headers = {
+            "Content-Type": "application/json",
+            SIGNATURE_HEADER: compute_signature(args.signature_key, notification_url, body),
+        }
+        started = time.perf_counter()
+        response = session.post(endpoint, data=body, headers=headers, timeout=30)
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(send, events))
+    elapsed = time.perf_counter() - started
+
+    codes = {}
+    for code, _ in results:
+        codes[code] = codes.get(code, 0) + 1
+    latencies = sorted(ms for _, ms in results)
+    print(f"sent {len(events)} events in {elapsed:.2f}s ({len(events) / elapsed:.1f}/s) with {args.concurrency} clients")
+    print(f"status codes: {codes}")
+    print(f"ack latency p50={percentile(latencies, 50):.1f}ms  p99={percentile(latencies, 99):.1f}ms")
+
+    # let the worker drain, then show what it applied
+    time.sleep(1.0)
+    try:
+        status = session.get(args.url.rstrip("/") + "/api/status", timeout=10).json()
+        print("ingestion:", json.dumps(status.get("square_webhooks"), indent=2))
+    except (requests.RequestException, ValueError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
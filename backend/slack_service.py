@@ -138,12 +138,16 @@ class SlackMessagingService:
         text = f"{urgency}: {member_name} has ${amount_due:.2f} in dues {status.lower()}"
         return self.send_message(text, blocks)
     
-    def send_bulk_reminder_summary(self, unpaid_members: List[Dict]) -> Dict:
+    def send_bulk_reminder_summary(self, unpaid_members: List[Dict], total_count: Optional[int] = None,
+                                   total_outstanding: Optional[float] = None,
+                                   overdue_count: Optional[int] = None) -> Dict:
         """
         Send summary of all unpaid members
         
         Args:
             unpaid_members: List of dicts with member info (name, class, amount_due, status)
+            total_count, total_outstanding, overdue_count: Totals over the whole selection
+                when `unpaid_members` is only its first rows (computed from the list otherwise)
             
         Returns:
             Dict with send result
@@ -154,18 +158,22 @@ class SlackMessagingService:
                 "message": "No unpaid members to notify"
             }
         
-        total_outstanding = sum(m['amount_due'] for m in unpaid_members)
-        overdue_count = sum(1 for m in unpaid_members if m.get('status', '').lower() == 'overdue')
-        pending_count = len(unpaid_members) - overdue_count
+        if total_count is None:
+            total_count = len(unpaid_members)
+        if total_outstanding is None:
+            total_outstanding = sum(m['amount_due'] for m in unpaid_members)
+        if overdue_count is None:
+            overdue_count = sum(1 for m in unpaid_members if m.get('status', '').lower() == 'overdue')
+        pending_count = total_count - overdue_count
         
         # Create member list (limit to 20 to avoid message size issues)
         member_list = "\n".join([
-            f"• *{m['name']}* ({m.get('class', 'N/A')}): ${m['amount_due']:.2f} - _{m['status']}_" 
+            f"• *{m['name']}* ({m.get('class') or 'N/A'}): ${m['amount_due']:.2f} - _{m['status']}_" 
             for m in unpaid_members[:20]
         ])
         
-        if len(unpaid_members) > 20:
-            member_list += f"\n_...and {len(unpaid_members) - 20} more members_"
+        if total_count > 20:
+            member_list += f"\n_...and {total_count - 20} more members_"
         
         blocks = [
             {
@@ -180,7 +188,7 @@ class SlackMessagingService:
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": f"*Summary:* {len(unpaid_members)} members have outstanding dues totaling *${total_outstanding:.2f}*\n\n"
+                    "text": f"*Summary:* {total_count} members have outstanding dues totaling *${total_outstanding:.2f}*\n\n"
                             f"🔴 Overdue: {overdue_count} members\n"
                             f"⚠️ Pending: {pending_count} members"
                 }
@@ -206,7 +214,7 @@ class SlackMessagingService:
             }
         ]
         
-        text = f"Bulk Reminder: {len(unpaid_members)} members owe ${total_outstanding:.2f}"
+        text = f"Bulk Reminder: {total_count} members owe ${total_outstanding:.2f}"
         return self.send_message(text, blocks)
     
     def send_payment_confirmation(self, member_name: str, amount: float, 
@@ -482,6 +490,61 @@ class SlackMessagingService:
         text = f"{urgency}: {days_until_deadline} days until deadline - {unpaid_count} members unpaid"
         return self.send_message(text, blocks)
     
+    def send_class_deadline_reminder(self, due_date: datetime, days_until_deadline: int,
+                                     classes: List[Dict]) -> Dict:
+        """
+        Send reminder about an upcoming due date set for one or more classes
+        
+        Args:
+            due_date: The classes' due date
+            days_until_deadline: Number of days until the due date
+            classes: List of dicts per class (class, unpaid_count, total_outstanding)
+            
+        Returns:
+            Dict with send result
+        """
+        urgency = "🚨 URGENT" if days_until_deadline <= 3 else "⏰ REMINDER"
+        unpaid_count = sum(c['unpaid_count'] for c in classes)
+        total_outstanding = sum(c['total_outstanding'] for c in classes)
+
+        # Create class list (limit to 20 to avoid message size issues)
+        class_list = "\n".join([
+            f"• *{c['class']}*: {c['unpaid_count']} unpaid - ${c['total_outstanding']:.2f}"
+            for c in classes[:20]
+        ])
+        if len(classes) > 20:
+            class_list += f"\n_...and {len(classes) - 20} more classes_"
+
+        blocks = [
+            {
+                "type": "header",
+                "text": {
+                    "type": "plain_text",
+                    "text": f"{urgency}: Class Dues Deadline Approaching",
+                    "emoji": True
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*{days_until_deadline} days* until dues are due ({due_date.strftime('%B %d, %Y')})\n\n"
+                            f"*{unpaid_count} members* still need to pay\n"
+                            f"*${total_outstanding:.2f}* outstanding"
+                }
+            },
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": f"*By class:*\n{class_list}"
+                }
+            }
+        ]
+
+        text = f"{urgency}: {days_until_deadline} days until class dues deadline - {unpaid_count} members unpaid"
+        return self.send_message(text, blocks)
+    
     def test_connection(self) -> Dict:
         """
         Test the Slack webhook connection
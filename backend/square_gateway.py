@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from config import SQUARE_MAX_CONCURRENCY, SQUARE_MAX_QUEUE, SQUARE_CALL_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# HTTP status for gateway-level failures; Square's own errors keep the endpoint's default
+SQUARE_ERROR_STATUS = {"busy": 503, "timeout": 504}
+# Status for a failed call that may still have taken effect at Square (see "outcome_unknown")
+OUTCOME_UNKNOWN_STATUS = 504
+
+
+class SquareGateway:
+    """
+    Runs the blocking SquarePaymentService methods off the event loop.
+
+    Calls go to a dedicated thread pool of `max_concurrency` workers, so a slow
+    Square response only ties up one of those threads. At most `max_queue` calls
+    may wait for a worker; beyond that callers are turned away at once ("busy").
+    Every call is answered within `timeout_seconds` ("timeout"). A call that times
+    out while still queued is cancelled and never reaches Square. One that is
+    already running keeps going in its thread, and the SDK's HTTP timeout bounds
+    how long that takes; its result, which may be a completed charge, is passed
+    to the caller's `on_late_result` when it arrives.
+    Results use the service's {"success": ..., "message": ...} shape. A failure
+    that may still have reached Square carries "outcome_unknown": True; without
+    it (busy, cancelled while queued, or an error Square returned) the call
+    definitely had no effect.
+    """
+
+    def __init__(self, service, max_concurrency: int = SQUARE_MAX_CONCURRENCY,
+                 max_queue: int = SQUARE_MAX_QUEUE, timeout_seconds: float = SQUARE_CALL_TIMEOUT_SECONDS):
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="square")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._peak_queued = 0
+        self._counters = {"calls": 0, "completed": 0, "rejected": 0, "timeouts": 0, "errors": 0, "late_results": 0}
+        self._latency_total = 0.0
+
+    def _run(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._in_flight -= 1
+                self._counters["completed"] += 1
+                self._latency_total += elapsed
+
+    def _late_result(self, method: str, on_late_result: Optional[Callable[[Dict[str, Any]], None]], future):
+        """Done-callback of a call that outlived its deadline; runs on the worker thread."""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {"success": False, "outcome_unknown": True, "message": f"Error calling payment provider: {e}"}
+        with self._lock:
+            self._counters["late_results"] += 1
+        logger.warning("Square %s finished after its deadline (success=%s)", method, bool(result.get("success")))
+        if on_late_result is None:
+            return
+        try:
+            on_late_result(result)
+        except Exception:
+            logger.exception("Handling the late result of Square %s failed", method)
+
+    async def call(self, method: str, *args,
+                   on_late_result: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Invoke `service.<method>(*args, **kwargs)` on the Square pool, bounded by the deadline.
+
+        If the deadline passes while the call is running, `on_late_result(result)`
+        is called from the worker thread once it finishes.
+        """
+        fn = getattr(self.service, method)
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self._counters["rejected"] += 1
+                return {"success": False, "error": "busy",
+                        "message": "Payment provider is busy; please retry shortly"}
+            self._counters["calls"] += 1
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+
+        future = self._executor.submit(self._run, fn, args, kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timeouts"] += 1
+                cancelled = future.cancel()
+                if cancelled:
+                    # never started, so _run will not take it off the queue
+                    self._queued -= 1
+            if not cancelled:
+                future.add_done_callback(partial(self._late_result, method, on_late_result))
+            logger.warning("Square %s exceeded %.1fs deadline", method, self.timeout_seconds)
+            return {"success": False, "error": "timeout", "outcome_unknown": not cancelled,
+                    "message": f"Payment provider did not respond within {self.timeout_seconds:g}s"}
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            logger.exception("Square %s failed", method)
+            return {"success": False, "outcome_unknown": True, "message": f"Error calling payment provider: {e}"}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, in-flight calls and counters for /api/status."""
+        with self._lock:
+            completed = self._counters["completed"]
+            return {
+                "queue_depth": self._queued,
+                "peak_queue_depth": self._peak_queued,
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout_seconds,
+                **self._counters,
+                "avg_latency_ms": round(self._latency_total / completed * 1000, 1) if completed else None,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,221 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import SQUARE_RECONCILE_WINDOW_HOURS, SQUARE_RECONCILE_MAX_PAGES
+from database import Transaction, SquareReconciliationRun, SquareReconciliationItem
+from money import from_cents
+from square_service import parse_member_payment_note
+from square_webhooks import parse_square_time
+
+# Local rows booked from Square (card payments and payment-link webhooks)
+SQUARE_PAYMENT_METHODS = ("Square", "Square Link")
+DISCREPANCY_KINDS = ("missing", "extra", "mismatch")
+# Square's payment list is eventually consistent; leave the newest minutes to the next run
+SETTLE_LAG = timedelta(minutes=10)
+# We stamp transaction_date when booking, a little after Square's created_at, so rows
+# just outside the window may still match; only rows inside it are reported as extra
+MATCH_MARGIN = timedelta(minutes=15)
+PAGE_SIZE = 100
+REPORT_LIMIT = 100
+RUN_HISTORY = 20
+
+# transaction_id -> (amount_cents, member_id, inside the run's window)
+LocalIndex = Dict[str, Tuple[int, Optional[int], bool]]
+
+
+def _rfc3339(value: datetime) -> str:
+    return value.replace(tzinfo=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _local_index(db, run: SquareReconciliationRun) -> LocalIndex:
+    """
+    Hash index of the Square-booked transactions around the run's window (a range
+    scan on ix_transactions_txdate_id), minus the payments the run has already
+    handled, so a resumed run only has the remaining pages left to match.
+    """
+    rows = db.execute(
+        select(Transaction.transaction_id, Transaction.amount_cents, Transaction.member_id, Transaction.transaction_date)
+        .where(
+            Transaction.transaction_date >= run.begin_time - MATCH_MARGIN,
+            Transaction.transaction_date <= run.end_time + MATCH_MARGIN,
+            Transaction.payment_method.in_(SQUARE_PAYMENT_METHODS),
+            Transaction.transaction_id.isnot(None),
+        )
+    )
+    index: LocalIndex = {
+        row.transaction_id: (row.amount_cents, row.member_id, run.begin_time <= row.transaction_date <= run.end_time)
+        for row in rows
+    }
+    for payment_id in db.scalars(
+        select(SquareReconciliationItem.payment_id).where(SquareReconciliationItem.run_id == run.id)
+    ):
+        index.pop(payment_id, None)
+    return index
+
+
+def _diff_page(run_id: int, payments, index: LocalIndex):
+    """Match one page against the index (popping what it finds); returns the item rows to store."""
+    items = []
+    for payment in payments:
+        if payment["status"] != "COMPLETED":
+            # not money we should have booked; a local row for it stays behind as extra
+            continue
+        item = {
+            "run_id": run_id,
+            "payment_id": payment["payment_id"],
+            "square_amount_cents": payment["amount_cents"],
+            "local_amount_cents": None,
+            "member_id": parse_member_payment_note(payment.get("note")),
+            "square_created_at": parse_square_time(payment.get("created_at")),
+        }
+        local = index.pop(payment["payment_id"], None)
+        if local is None:
+            item["kind"] = "missing"
+        else:
+            local_cents, member_id, _ = local
+            item["local_amount_cents"] = local_cents
+            item["member_id"] = member_id
+            item["kind"] = "matched" if local_cents == payment["amount_cents"] else "mismatch"
+        items.append(item)
+    return items
+
+
+def _finish_run(db, run: SquareReconciliationRun, index: LocalIndex, now: datetime):
+    """Whatever is left in the index never showed up at Square: record it as extra and close the run."""
+    extras = [
+        {"run_id": run.id, "payment_id": payment_id, "kind": "extra",
+         "local_amount_cents": cents, "member_id": member_id}
+        for payment_id, (cents, member_id, in_window) in index.items()
+        if in_window
+    ]
+    if extras:
+        db.execute(sqlite_insert(SquareReconciliationItem).on_conflict_do_nothing(), extras)
+    run.extra_count = len(extras)
+    # matched rows were only kept so an interrupted run could resume
+    db.execute(delete(SquareReconciliationItem).where(
+        SquareReconciliationItem.run_id == run.id, SquareReconciliationItem.kind == "matched"
+    ))
+    run.status = "completed"
+    run.cursor = None
+    run.finished_at = now
+
+    stale = select(SquareReconciliationRun.id).order_by(SquareReconciliationRun.id.desc()).offset(RUN_HISTORY)
+    stale_ids = list(db.scalars(stale))
+    if stale_ids:
+        db.execute(delete(SquareReconciliationItem).where(SquareReconciliationItem.run_id.in_(stale_ids)))
+        db.execute(delete(SquareReconciliationRun).where(SquareReconciliationRun.id.in_(stale_ids)))
+
+
+def reconcile_square_payments(db, square_service, begin: Optional[datetime] = None, end: Optional[datetime] = None,
+                              max_pages: int = SQUARE_RECONCILE_MAX_PAGES, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Diff Square's payments against local transactions for a created_at window.
+
+    Local Square transactions are loaded into a hash index once; each page from
+    list-payments is then matched against it in a single pass, so a run is linear
+    in the number of payments. Completed Square payments with no local row are
+    "missing", ones whose amount differs are "mismatch", and local rows left over
+    once the last page is in are "extra".
+
+    Every page commits its discrepancies, the payments it matched and the next
+    cursor together. When `max_pages` is reached or Square fails, the run stays
+    open and the next call (without `begin`/`end`) resumes from that cursor.
+    Passing a window abandons any open run and starts a new one. Returns run_report().
+    """
+    now = now or datetime.utcnow()
+    run = None
+    if begin is None and end is None:
+        run = db.scalars(
+            select(SquareReconciliationRun)
+            .where(SquareReconciliationRun.status.in_(("running", "failed")))
+            .order_by(SquareReconciliationRun.id.desc())
+            .limit(1)
+        ).first()
+    if run is None:
+        db.execute(
+            update(SquareReconciliationRun)
+            .where(SquareReconciliationRun.status.in_(("running", "failed")))
+            .values(status="abandoned", updated_at=now)
+        )
+        end = end or now - SETTLE_LAG
+        begin = begin or end - timedelta(hours=SQUARE_RECONCILE_WINDOW_HOURS)
+        run = SquareReconciliationRun(begin_time=begin, end_time=end, status="running", started_at=now, updated_at=now)
+        db.add(run)
+        db.commit()
+    run.status = "running"
+    run.error = None
+
+    index = _local_index(db, run)
+    begin_time, end_time = _rfc3339(run.begin_time), _rfc3339(run.end_time)
+    for _ in range(max_pages):
+        page = square_service.list_payments(begin_time=begin_time, end_time=end_time,
+                                            cursor=run.cursor, limit=PAGE_SIZE)
+        if not page.get("success"):
+            run.status = "failed"
+            run.error = page.get("message")
+            run.updated_at = datetime.utcnow()
+            db.commit()
+            break
+        items = _diff_page(run.id, page["payments"], index)
+        if items:
+            db.execute(sqlite_insert(SquareReconciliationItem).on_conflict_do_nothing(), items)
+        run.pages += 1
+        run.payments_scanned += len(page["payments"])
+        run.missing_count += sum(1 for item in items if item["kind"] == "missing")
+        run.mismatch_count += sum(1 for item in items if item["kind"] == "mismatch")
+        run.cursor = page.get("cursor")
+        run.updated_at = datetime.utcnow()
+        if not run.cursor:
+            _finish_run(db, run, index, run.updated_at)
+        db.commit()
+        if run.status == "completed":
+            break
+    return run_report(db, run)
+
+
+def _item_dict(item: SquareReconciliationItem) -> Dict[str, Any]:
+    return {
+        "payment_id": item.payment_id,
+        "member_id": item.member_id,
+        "square_amount": from_cents(item.square_amount_cents) if item.square_amount_cents is not None else None,
+        "local_amount": from_cents(item.local_amount_cents) if item.local_amount_cents is not None else None,
+        "square_created_at": item.square_created_at.isoformat() if item.square_created_at else None,
+    }
+
+
+def run_report(db, run: SquareReconciliationRun, limit: int = REPORT_LIMIT, offset: int = 0) -> Dict[str, Any]:
+    """Run summary plus up to `limit` items of each discrepancy kind."""
+    report = {
+        "run_id": run.id,
+        "status": run.status,
+        "complete": run.status == "completed",
+        "begin_time": run.begin_time.isoformat(),
+        "end_time": run.end_time.isoformat(),
+        "pages": run.pages,
+        "payments_scanned": run.payments_scanned,
+        "missing_count": run.missing_count,
+        "extra_count": run.extra_count,
+        "mismatch_count": run.mismatch_count,
+        "error": run.error,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "finished_at": run.finished_at.isoformat() if run.finished_at else None,
+    }
+    for kind in DISCREPANCY_KINDS:
+        items = db.scalars(
+            select(SquareReconciliationItem)
+            .where(SquareReconciliationItem.run_id == run.id, SquareReconciliationItem.kind == kind)
+            .order_by(SquareReconciliationItem.payment_id)
+            .offset(offset)
+            .limit(limit)
+        )
+        report[kind] = [_item_dict(item) for item in items]
+    return report
+
+
+def latest_run(db) -> Optional[SquareReconciliationRun]:
+    return db.scalars(
+        select(SquareReconciliationRun).order_by(SquareReconciliationRun.id.desc()).limit(1)
+    ).first()
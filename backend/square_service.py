@@ -1,119 +1,199 @@
 import uuid
-from typing import Dict
+from typing import Dict, Optional
+import httpx
 from square.client import Square, SquareEnvironment
+from square.core.api_error import ApiError
 import os
 
+from config import SQUARE_BASE_URL, SQUARE_HTTP_TIMEOUT_SECONDS
+from money import to_cents, from_cents
+
+MEMBER_NOTE_PREFIX = "member:"
+# Square-Version sent by the plain HTTP client; the API version of the squareup release pinned in requirements.txt
+SQUARE_API_VERSION = "2026-09-16"
+
+
+def member_payment_note(member_id: int) -> str:
+    """Payment note Square copies onto payments made through a member's link."""
+    return f"{MEMBER_NOTE_PREFIX}{member_id}"
+
+
+def parse_member_payment_note(note: Optional[str]) -> Optional[int]:
+    """Member id from a member_payment_note(), or None for payments we didn't tag."""
+    if not note or not note.startswith(MEMBER_NOTE_PREFIX):
+        return None
+    try:
+        return int(note[len(MEMBER_NOTE_PREFIX):].split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def _api_errors(error: ApiError):
+    """The `errors` list of a Square error response, or the raw body if it has none."""
+    body = error.body
+    if isinstance(body, dict) and body.get("errors"):
+        return body["errors"]
+    return body
+
 
 class SquarePaymentService:
-    def __init__(self):
-        from square.client import SquareEnvironment
-    
+    def __init__(self, base_url: Optional[str] = SQUARE_BASE_URL):
         env = os.getenv('SQUARE_ENVIRONMENT', 'sandbox')
+        token = os.getenv('SQUARE_ACCESS_TOKEN')
+        environment = SquareEnvironment.SANDBOX if env == 'sandbox' else SquareEnvironment.PRODUCTION
         self.client = Square(
-            token=os.getenv('SQUARE_ACCESS_TOKEN'),
-            environment=SquareEnvironment.SANDBOX if env == 'sandbox' else SquareEnvironment.PRODUCTION
+            token=token,
+            environment=environment,
+            base_url=base_url,
+            # Bound each HTTP request so a hung Square call frees its worker thread
+            timeout=SQUARE_HTTP_TIMEOUT_SECONDS,
+        )
+        # Plain JSON client for bulk reads: building the SDK's Payment models costs
+        # ~0.2s per 100-payment page, far more than the HTTP call
+        self.http = httpx.Client(
+            base_url=base_url or environment.value,
+            headers={"Square-Version": SQUARE_API_VERSION, **({"Authorization": f"Bearer {token}"} if token else {})},
+            timeout=SQUARE_HTTP_TIMEOUT_SECONDS,
         )
         self.location_id = os.getenv('SQUARE_LOCATION_ID')
 
     def create_payment(self, amount: float, source_id: str, 
-                       member_email: str, member_name: str) -> Dict:
-        """Create a payment using Square API"""
+                       member_email: str, member_name: str,
+                       idempotency_key: Optional[str] = None) -> Dict:
+        """Create a payment using Square API (Square dedupes retries that reuse idempotency_key)"""
         try:
-            result = self.client.payments.create_payment(
-                body={
-                    "source_id": source_id,
-                    "idempotency_key": str(uuid.uuid4()),
-                    "amount_money": {
-                        "amount": int(amount * 100),  # Convert to cents
-                        "currency": "USD"
-                    },
-                    "location_id": self.location_id,
-                    "buyer_email_address": member_email,
-                    "note": f"Payment from {member_name}"
-                }
-            )
-            
-            if result.is_success():
-                payment = result.result['payment']
-                return {
-                    "success": True,
-                    "transaction_id": payment['id'],
-                    "status": payment['status'],
-                    "amount": payment['amount_money']['amount'] / 100,
-                    "receipt_url": payment.get('receipt_url'),
-                    "receipt_number": payment.get('receipt_number'),
-                    "created_at": payment['created_at'],
-                    "message": "Payment successful"
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Payment failed: {result.errors}"
-                }
+            payment = self.client.payments.create(
+                source_id=source_id,
+                idempotency_key=idempotency_key or str(uuid.uuid4()),
+                amount_money={
+                    "amount": to_cents(amount),  # Convert to cents
+                    "currency": "USD"
+                },
+                location_id=self.location_id,
+                buyer_email_address=member_email,
+                note=f"Payment from {member_name}"
+            ).payment
+            return {
+                "success": True,
+                "transaction_id": payment.id,
+                "status": payment.status,
+                "amount": from_cents(payment.amount_money.amount),
+                "receipt_url": payment.receipt_url,
+                "receipt_number": payment.receipt_number,
+                "created_at": payment.created_at,
+                "message": "Payment successful"
+            }
+        except ApiError as e:
+            return {
+                "success": False,
+                # Square rejected a 4xx request outright; after a 5xx the charge may still have gone through
+                "outcome_unknown": e.status_code is None or e.status_code >= 500,
+                "message": f"Payment failed: {_api_errors(e)}"
+            }
         except Exception as e:
+            # e.g. an HTTP timeout: the request may have reached Square
             return {
                 "success": False,
+                "outcome_unknown": True,
                 "message": f"Error processing payment: {str(e)}"
             }
 
     def create_payment_link(self, amount: float, member_name: str,
-                           member_id: int, member_email: str) -> Dict:
-        """Create a Square payment link"""
+                           member_id: int, member_email: str,
+                           idempotency_key: Optional[str] = None) -> Dict:
+        """Create a Square payment link (Square returns the same link for a repeated idempotency_key)"""
         try:
-            result = self.client.checkout.create_payment_link(
-                body={
-                    "quick_pay": {
-                        "name": f"TAMID Dues - {member_name}",
-                        "price_money": {
-                            "amount": int(amount * 100),
-                            "currency": "USD"
-                        },
-                        "description": f"Dues payment for {member_name}",
-                    }
-                }
-            )
+            payment_link = self.client.checkout.payment_links.create(
+                idempotency_key=idempotency_key or str(uuid.uuid4()),
+                quick_pay={
+                    "name": f"TAMID Dues - {member_name}",
+                    "price_money": {
+                        "amount": to_cents(amount),
+                        "currency": "USD"
+                    },
+                    "location_id": self.location_id,
+                },
+                description=f"Dues payment for {member_name}",
+                # lets the webhook pipeline attribute the resulting payment
+                payment_note=member_payment_note(member_id),
+            ).payment_link
+            return {
+                "success": True,
+                "payment_link_url": payment_link.url,
+                "payment_link_id": payment_link.id,
+                "order_id": payment_link.order_id,
+                "message": "Payment link created successfully"
+            }
+        except ApiError as e:
+            return {
+                "success": False,
+                "message": f"Failed to create payment link: {_api_errors(e)}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error creating payment link: {str(e)}"
+            }
 
-            if result.is_success():
-                payment_link = result.result['payment_link']
-                return {
-                    "success": True,
-                    "payment_link_url": payment_link['url'],
-                    "payment_link_id": payment_link['id'],
-                    "message": "Payment link created successfully"
-                }
-            else:
+    def list_payments(self, begin_time: Optional[str] = None, end_time: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = 100) -> Dict:
+        """One page of payments created in [begin_time, end_time] (RFC 3339), oldest first"""
+        params = {
+            "begin_time": begin_time,
+            "end_time": end_time,
+            "sort_order": "ASC",
+            "cursor": cursor,
+            "location_id": self.location_id,
+            "limit": limit,
+        }
+        try:
+            # GET /v2/payments (ListPayments), read as plain JSON
+            response = self.http.get("/v2/payments", params={k: v for k, v in params.items() if v is not None})
+            body = response.json()
+            if not 200 <= response.status_code < 300:
                 return {
                     "success": False,
-                    "message": f"Failed to create payment link: {result.errors}"
+                    "message": f"Failed to list payments: {body.get('errors')}"
                 }
+            return {
+                "success": True,
+                "payments": [
+                    {
+                        "payment_id": p["id"],
+                        "status": p.get("status"),
+                        "amount_cents": (p.get("amount_money") or {}).get("amount"),
+                        "note": p.get("note"),
+                        "created_at": p.get("created_at"),
+                    }
+                    for p in body.get("payments", [])
+                ],
+                "cursor": body.get("cursor"),
+            }
         except Exception as e:
             return {
                 "success": False,
-                "message": f"Error creating payment link: {str(e)}"
+                "message": f"Error listing payments: {str(e)}"
             }
 
     def get_payment(self, payment_id: str) -> Dict:
         """Get payment details from Square"""
         try:
-            result = self.client.payments.get_payment(payment_id)
-            
-            if result.is_success():
-                payment = result.result['payment']
-                return {
-                    "success": True,
-                    "payment_id": payment['id'],
-                    "status": payment['status'],
-                    "amount": payment['amount_money']['amount'] / 100,
-                    "currency": payment['amount_money']['currency'],
-                    "created_at": payment['created_at'],
-                    "updated_at": payment['updated_at'],
-                    "receipt_url": payment.get('receipt_url')
-                }
-            else:
-                return {
-                    "success": False,
-                    "message": f"Payment not found: {result.errors}"
-                }
+            payment = self.client.payments.get(payment_id).payment
+            return {
+                "success": True,
+                "payment_id": payment.id,
+                "status": payment.status,
+                "amount": from_cents(payment.amount_money.amount),
+                "currency": payment.amount_money.currency,
+                "created_at": payment.created_at,
+                "updated_at": payment.updated_at,
+                "receipt_url": payment.receipt_url
+            }
+        except ApiError as e:
+            return {
+                "success": False,
+                "message": f"Payment not found: {_api_errors(e)}"
+            }
         except Exception as e:
             return {
                 "success": False,
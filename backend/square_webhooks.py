@@ -0,0 +1,345 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import (
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_BATCH_SIZE,
+    WEBHOOK_BATCH_WAIT_MS,
+    WEBHOOK_RETRY_ATTEMPTS,
+    WEBHOOK_RETRY_BASE_MS,
+    WEBHOOK_RETRY_MAX_MS,
+)
+from database import SessionLocal, Member, Transaction, SquareWebhookDeadLetter
+from ledger import apply_member_payment
+from square_service import parse_member_payment_note
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_EVENT_TYPES = {"payment.created", "payment.updated"}
+SIGNATURE_HEADER = "x-square-hmacsha256-signature"
+ERROR_MAX_LENGTH = 500
+
+
+def compute_signature(signature_key: str, notification_url: str, body: bytes) -> str:
+    """Square's webhook signature: base64(HMAC-SHA256(key, notification_url + raw body))."""
+    digest = hmac.new(signature_key.encode(), notification_url.encode() + body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_signature(signature_key: str, notification_url: str, body: bytes, signature: Optional[str]) -> bool:
+    if not signature_key or not signature:
+        return False
+    return hmac.compare_digest(compute_signature(signature_key, notification_url, body), signature)
+
+
+def parse_square_time(value: Optional[str]) -> Optional[datetime]:
+    """Square RFC 3339 timestamp as naive UTC (how we store datetimes); None if absent or malformed."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def extract_payment(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The completed payment carried by a payment.* event, or None if the event
+    is not one we record (other types, not yet COMPLETED, or not from a member link).
+    """
+    if event.get("type") not in PAYMENT_EVENT_TYPES:
+        return None
+    payment = ((event.get("data") or {}).get("object") or {}).get("payment") or {}
+    if payment.get("status") != "COMPLETED" or not payment.get("id"):
+        return None
+    member_id = parse_member_payment_note(payment.get("note"))
+    if member_id is None:
+        # Card payments from /api/payments/process are booked by that endpoint
+        return None
+    amount = (payment.get("amount_money") or {}).get("amount")
+    if amount is None:
+        return None
+    return {
+        "payment_id": payment["id"],
+        "member_id": member_id,
+        "amount_cents": int(amount),
+        "status": payment["status"],
+        "paid_at": parse_square_time(payment.get("created_at")),
+    }
+
+
+class WebhookIngestor:
+    """
+    Background worker that turns queued Square webhook events into Transactions.
+
+    The HTTP handler only verifies and enqueues; this thread drains the queue in
+    batches (up to `batch_size` events or `batch_wait_ms`), inserts the
+    transactions with ON CONFLICT DO NOTHING on the unique payment id and applies
+    one balance delta per member for the rows actually inserted, all in a single
+    commit per batch.
+
+    Events are acknowledged before they are applied, so a batch that fails is
+    retried with exponential backoff (`retry_attempts` tries in all). Events that
+    still fail on their own are stored as SquareWebhookDeadLetter rows and
+    replayed when the worker next starts.
+    """
+
+    def __init__(self, db_session_factory: Callable[[], SessionLocal], on_batch: Optional[Callable[[], None]] = None,
+                 queue_size: int = WEBHOOK_QUEUE_SIZE, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 batch_wait_ms: int = WEBHOOK_BATCH_WAIT_MS, retry_attempts: int = WEBHOOK_RETRY_ATTEMPTS,
+                 retry_base_ms: int = WEBHOOK_RETRY_BASE_MS, retry_max_ms: int = WEBHOOK_RETRY_MAX_MS):
+        self.db_session_factory = db_session_factory
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_base = retry_base_ms / 1000
+        self.retry_max = retry_max_ms / 1000
+        self.queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._counters = {
+            "received": 0, "rejected": 0, "recorded": 0, "duplicates": 0,
+            "ignored": 0, "unknown_member": 0, "batches": 0, "failed_batches": 0,
+            "retries": 0, "dead_lettered": 0, "dead_letters_replayed": 0, "lost": 0,
+        }
+        self.last_batch: Optional[Dict[str, Any]] = None
+
+    # ---------- Lifecycle ----------
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="square-webhooks", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Flush what is queued, then stop the worker (a batch being retried goes to the dead letters)."""
+        if self._thread and self._thread.is_alive():
+            self._stopping.set()
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+    # ---------- Producer side ----------
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Enqueue an event without blocking; False when the queue is full (caller should 503)."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("received")
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "worker_alive": bool(self._thread and self._thread.is_alive()),
+                **self._counters,
+                "last_batch": self.last_batch,
+            }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] += n
+
+    # ---------- Worker ----------
+
+    def _next_batch(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Block for the first event, then gather more until the batch is full or the wait expires."""
+        first = self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if event is None:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    def _run(self):
+        self.replay_dead_letters()
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._apply_with_retry(batch)
+
+    def _apply_with_retry(self, batch: List[Dict[str, Any]]):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.process_batch(batch)
+                return
+            except Exception:
+                self._count("failed_batches")
+                if attempt >= self.retry_attempts or self._stopping.is_set():
+                    logger.exception("Failed to apply a batch of %d Square webhook events (attempt %d)",
+                                     len(batch), attempt)
+                    break
+                delay = min(self.retry_base * 2 ** (attempt - 1), self.retry_max)
+                logger.warning("Failed to apply a batch of %d Square webhook events (attempt %d/%d); retrying in %.1fs",
+                               len(batch), attempt, self.retry_attempts, delay, exc_info=True)
+                self._count("retries")
+                if self._stopping.wait(delay):
+                    break
+
+        # One bad event must not take the rest of the batch with it
+        failed = []
+        for event in batch:
+            try:
+                self.process_batch([event])
+            except Exception as e:
+                failed.append((event, f"{type(e).__name__}: {e}"[:ERROR_MAX_LENGTH]))
+        if failed:
+            self._dead_letter(failed, attempt + 1)
+
+    def _dead_letter(self, failed: List[Tuple[Dict[str, Any], str]], attempts: int):
+        db = self.db_session_factory()
+        try:
+            db.add_all([
+                SquareWebhookDeadLetter(event=json.dumps(event), error=error, attempts=attempts)
+                for event, error in failed
+            ])
+            db.commit()
+            self._count("dead_lettered", len(failed))
+            logger.error("Stored %d Square webhook events as dead letters", len(failed))
+        except Exception:
+            # Last resort: the events are in the log, so they can still be replayed by hand
+            self._count("lost", len(failed))
+            logger.exception("Could not store Square webhook dead letters: %s", json.dumps([e for e, _ in failed]))
+        finally:
+            db.close()
+
+    def replay_dead_letters(self) -> int:
+        """Re-apply stored dead letters, oldest first, deleting each that now succeeds. Returns how many did."""
+        db = self.db_session_factory()
+        replayed = 0
+        try:
+            for letter in db.scalars(select(SquareWebhookDeadLetter).order_by(SquareWebhookDeadLetter.id)).all():
+                try:
+                    self.process_batch([json.loads(letter.event)])
+                except Exception as e:
+                    letter.attempts += 1
+                    letter.error = f"{type(e).__name__}: {e}"[:ERROR_MAX_LENGTH]
+                    letter.failed_at = datetime.utcnow()
+                else:
+                    db.delete(letter)
+                    replayed += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Could not replay Square webhook dead letters")
+        finally:
+            db.close()
+        if replayed:
+            self._count("dead_letters_replayed", replayed)
+            logger.info("Replayed %d Square webhook dead letters", replayed)
+        return replayed
+
+    def process_batch(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Apply one batch of raw webhook events. Safe to call directly (e.g. from a replay)."""
+        started = time.monotonic()
+        payments: Dict[str, Dict[str, Any]] = {}
+        ignored = 0
+        for event in events:
+            payment = extract_payment(event)
+            if payment is None:
+                ignored += 1
+            else:
+                # Square redelivers and sends created+updated for one payment; keep one per id
+                payments[payment["payment_id"]] = payment
+
+        recorded = duplicates = unknown = 0
+        if payments:
+            db = self.db_session_factory()
+            try:
+                members = {
+                    m.id: m for m in db.execute(
+                        select(Member.id, Member.name, Member.due_date)
+                        .where(Member.id.in_({p["member_id"] for p in payments.values()}))
+                    )
+                }
+                rows = []
+                for p in payments.values():
+                    member = members.get(p["member_id"])
+                    rows.append({
+                        "member_id": member.id if member else None,
+                        "amount_cents": p["amount_cents"],
+                        "payment_method": "Square Link",
+                        "transaction_id": p["payment_id"],
+                        "status": p["status"],
+                        "payer_name": member.name if member else None,
+                        "dues_due_date": member.due_date if member else None,
+                        "display_label": (f"{member.name} dues {member.due_date.date() if member.due_date else ''}"
+                                          if member else f"Unmatched Square payment (member {p['member_id']})"),
+                        "transaction_date": p["paid_at"] or datetime.utcnow(),
+                    })
+                # Already-recorded payment ids (redeliveries, a concurrent worker) hit the unique index and are skipped
+                inserted = set(db.scalars(
+                    sqlite_insert(Transaction)
+                    .values(rows)
+                    .on_conflict_do_nothing(index_elements=[Transaction.transaction_id],
+                                            index_where=Transaction.transaction_id.isnot(None))
+                    .returning(Transaction.transaction_id)
+                ))
+                deltas: Dict[int, int] = defaultdict(int)
+                for payment_id in inserted:
+                    p = payments[payment_id]
+                    if p["member_id"] in members:
+                        deltas[p["member_id"]] += p["amount_cents"]
+                    else:
+                        unknown += 1
+                for member_id, cents in deltas.items():
+                    apply_member_payment(db, member_id, cents)
+                db.commit()
+                recorded = len(inserted)
+                duplicates = len(payments) - recorded
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["recorded"] += recorded
+            self._counters["duplicates"] += duplicates + (len(events) - ignored - len(payments))
+            self._counters["ignored"] += ignored
+            self._counters["unknown_member"] += unknown
+            self.last_batch = {
+                "events": len(events),
+                "recorded": recorded,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+                "at": datetime.utcnow().isoformat(),
+            }
+        if recorded and self.on_batch:
+            self.on_batch()
+        return self.last_batch
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+
+from sqlalchemy import select, func, case
+
+from config import STATS_CACHE_TTL_SECONDS
+from database import SessionLocal, Member, Expense
+from money import from_cents
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def stats_query():
+    """All dashboard KPIs as one conditional-aggregate SELECT over members (+ expenses subquery).
+
+    Money totals are summed in integer cents so they are exact.
+    """
+    total_expenses = select(func.coalesce(func.sum(Expense.amount_cents), 0)).scalar_subquery()
+    return select(
+        func.count(Member.id).label("total_members"),
+        _count_where(Member.payment_status == "Paid").label("paid_members"),
+        _count_where(Member.payment_status == "Pending").label("pending_members"),
+        _count_where(Member.payment_status == "Overdue").label("overdue_members"),
+        _count_where((Member.dues_cents - Member.amount_paid_cents) > 0).label("unpaid_members"),
+        func.coalesce(func.sum(Member.dues_cents), 0).label("total_expected_cents"),
+        func.coalesce(func.sum(Member.amount_paid_cents), 0).label("total_collected_cents"),
+        total_expenses.label("total_expenses_cents"),
+    )
+
+
+def format_stats(row) -> Dict[str, Any]:
+    """Shape a stats_query() row into the /api/stats payload."""
+    expected_cents = int(row.total_expected_cents)
+    collected_cents = int(row.total_collected_cents)
+    expenses_cents = int(row.total_expenses_cents)
+    total_expected = from_cents(expected_cents)
+    total_collected = from_cents(collected_cents)
+    total_expenses = from_cents(expenses_cents)
+    outstanding = from_cents(expected_cents - collected_cents)
+    net_income = from_cents(collected_cents - expenses_cents)
+    budget_target = float(os.getenv("ANNUAL_BUDGET", 12000))
+    budget_remaining = budget_target - total_expenses
+    collection_rate = (collected_cents / expected_cents * 100) if expected_cents > 0 else 0
+
+    return {
+        "total_members": row.total_members,
+        "paid_members": row.paid_members,
+        "pending_members": row.pending_members,
+        "overdue_members": row.overdue_members,
+        "unpaid_members": row.unpaid_members,
+        "total_expected": total_expected,
+        "total_collected": total_collected,
+        "outstanding_balance": outstanding,
+        "collection_rate": round(collection_rate, 2),
+        "total_expenses": round(total_expenses, 2),
+        "net_income": round(net_income, 2),
+        "budget_target": round(budget_target, 2),
+        "budget_remaining": round(budget_remaining, 2),
+    }
+
+
+class StatsService:
+    """
+    Computes dashboard statistics in a single query and caches them in-process.
+
+    Write paths that change money or status call invalidate(); the TTL bounds
+    staleness for writes made by other worker processes.
+    """
+
+    def __init__(self, db_session_factory: Callable[[], SessionLocal], ttl_seconds: float = STATS_CACHE_TTL_SECONDS):
+        self.db_session_factory = db_session_factory
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+        self._generation = 0
+
+    def invalidate(self):
+        """Drop the cached stats; the next read recomputes them."""
+        with self._lock:
+            self._generation += 1
+            self._cached = None
+
+    def _lookup(self):
+        """(fresh cached stats or None, generation to store a recomputed result under)."""
+        with self._lock:
+            if self._cached is not None and time.monotonic() - self._cached_at < self.ttl_seconds:
+                return dict(self._cached), self._generation
+            return None, self._generation
+
+    def _store(self, generation: int, stats: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            # Don't cache a result that raced with an invalidation
+            if generation == self._generation:
+                self._cached = stats
+                self._cached_at = time.monotonic()
+        return dict(stats)
+
+    def get_stats(self, db=None) -> Dict[str, Any]:
+        """Return cached stats, recomputing them if invalidated or older than the TTL."""
+        cached, generation = self._lookup()
+        if cached is not None:
+            return cached
+        return self._store(generation, self.compute(db))
+
+    async def get_stats_async(self, db) -> Dict[str, Any]:
+        """get_stats() for an AsyncSession: a cache miss awaits the query instead of blocking."""
+        cached, generation = self._lookup()
+        if cached is not None:
+            return cached
+        result = await db.execute(stats_query())
+        return self._store(generation, format_stats(result.one()))
+
+    def compute(self, db=None) -> Dict[str, Any]:
+        """Run the aggregate query, bypassing the cache."""
+        if db is not None:
+            return format_stats(db.execute(stats_query()).one())
+        db = self.db_session_factory()
+        try:
+            return format_stats(db.execute(stats_query()).one())
+        finally:
+            db.close()
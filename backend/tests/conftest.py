@@ -0,0 +1,151 @@
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+# config reads the environment at import time, so point the app at a scratch database first
+_tmp = tempfile.mkdtemp(prefix="dues-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ.setdefault("SLACK_WEBHOOK_URL", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import reminder_scheduler  # noqa: E402,F401  (its job store adds scheduler_jobs to Base.metadata)
+
+database.init_db()
+
+
+@pytest.fixture
+def db():
+    """A session on the scratch database; every table is emptied afterwards."""
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+        with database.engine.begin() as conn:
+            for table in reversed(database.Base.metadata.sorted_tables):
+                if table.name != database.SchemaVersion.__tablename__:
+                    conn.execute(table.delete())
+
+
+@pytest.fixture
+def member(db):
+    """A Pending member owing 180.00 with nothing paid."""
+    member = database.Member(name="Dues Payer", email="dues-payer@example.com", dues_cents=18000,
+                             amount_paid_cents=0, payment_status="Pending")
+    db.add(member)
+    db.commit()
+    return member
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient on the app; server errors come back as 500 responses rather than raising in the test."""
+    import app
+    return TestClient(app.app, raise_server_exceptions=False)
+
+
+class FakeSquare:
+    """
+    Square API stand-in on localhost, for SquarePaymentService(base_url=...).
+
+    Every request waits at `gate` (open by default) before it is answered, so a
+    test can hold calls in flight; `in_flight` and `peak_in_flight` count the
+    requests being held. Answers come from `handlers`, keyed by (method, path):
+    handler(query, body) -> (status, json body). `requests` records
+    (method, path, query, body) in arrival order.
+    """
+
+    GATE_TIMEOUT = 10
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.requests = []
+        self.last_headers = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.handlers = {("POST", "/v2/payments"): self.create_payment}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def create_payment(self, query, body):
+        return 200, {"payment": {
+            "id": f"pay-{next(self._ids)}",
+            "status": "COMPLETED",
+            "amount_money": body["amount_money"],
+            "note": body.get("note"),
+            "receipt_url": "https://squareup.test/receipt",
+            "created_at": "2026-01-01T00:00:00Z",
+        }}
+
+    def _answer(self, method, raw_path, headers, raw_body):
+        parts = urlsplit(raw_path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        body = json.loads(raw_body) if raw_body else None
+        with self._lock:
+            self.requests.append((method, parts.path, query, body))
+            self.last_headers = dict(headers)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            self.gate.wait(self.GATE_TIMEOUT)
+            handler = self.handlers.get((method, parts.path))
+            if handler is None:
+                return 404, {"errors": [{"category": "INVALID_REQUEST_ERROR", "code": "NOT_FOUND"}]}
+            return handler(query, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                status_code, payload = fake._answer(self.command, self.path, self.headers, self.rfile.read(length))
+                data = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.gate.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def square_server():
+    """A FakeSquare listening on a free local port."""
+    server = FakeSquare()
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
@@ -0,0 +1,96 @@
+"""Per-class deadline reminders are only recorded as sent once Slack accepted the post."""
+from datetime import datetime, timedelta
+
+import pytest
+from apscheduler.events import EVENT_JOB_EXECUTED, JobExecutionEvent
+
+import database
+import reminder_scheduler
+from database import ClassDeadlineReminderLog, ClassDueDate, Member
+from deadline_reminders import class_due_date_rows
+from job_history import PhaseTimer
+
+
+class FakeSlack:
+    def __init__(self, results):
+        self.results = list(results)
+        self.posts = []
+
+    def send_class_deadline_reminder(self, **kwargs):
+        self.posts.append(kwargs)
+        return self.results.pop(0)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    # constructing one makes it the module's active scheduler; put the app's back afterwards
+    monkeypatch.setattr(reminder_scheduler, "_active_scheduler", reminder_scheduler._active_scheduler)
+
+    def make(*results):
+        return reminder_scheduler.ReminderScheduler(database.SessionLocal, FakeSlack(results))
+
+    return make
+
+
+@pytest.fixture
+def due_reminder(db):
+    now = datetime.utcnow()
+    db.add(Member(name="Alpha Member", email="alpha@example.com", member_class="Alpha", dues_cents=18000,
+                  amount_paid_cents=0, payment_status="Pending", due_date=now + timedelta(days=3)))
+    due = ClassDueDate(due_date=now + timedelta(days=3), classes_text="Alpha")
+    db.add(due)
+    db.commit()
+    return now, due
+
+
+def pop_due(sched, db, now):
+    sched.class_deadlines.sync(class_due_date_rows(db), now - timedelta(days=1))
+    return sched.class_deadlines.pop_due(now)
+
+
+def logged(db):
+    db.expire_all()
+    return db.query(ClassDeadlineReminderLog).count()
+
+
+def test_failed_post_is_released_and_retried(db, scheduler, due_reminder):
+    now, _ = due_reminder
+    sched = scheduler({"success": False, "message": "Slack returned 500"}, {"success": True})
+    due = pop_due(sched, db, now)
+    assert [r.days_before for r in due] == [3]
+
+    assert sched.send_class_deadline_reminders(due) == 0
+    assert logged(db) == 0
+    retry_at = sched.class_deadlines.next_fire_at()
+    assert retry_at is not None and retry_at > now
+
+    assert sched.send_class_deadline_reminders(sched.class_deadlines.pop_due(retry_at)) == 1
+    assert logged(db) == 1 and len(sched.slack_service.posts) == 2
+    # claimed now, so a second worker (or a replay) does not post it again
+    assert sched.send_class_deadline_reminders(due) == 0 and len(sched.slack_service.posts) == 2
+
+
+def test_nothing_is_claimed_when_everyone_paid(db, scheduler, due_reminder):
+    now, _ = due_reminder
+    db.query(Member).filter(Member.member_class == "Alpha").update({"amount_paid_cents": 18000})
+    db.commit()
+    sched = scheduler()
+    assert sched.send_class_deadline_reminders(pop_due(sched, db, now)) == 0
+    assert logged(db) == 0 and not sched.slack_service.posts
+
+
+def test_database_and_slack_time_are_recorded_per_run(db, scheduler, due_reminder):
+    now, _ = due_reminder
+    sched = scheduler({"success": True})
+    timer = PhaseTimer()
+    assert sched.send_class_deadline_reminders(pop_due(sched, db, now), timer) == 1
+    metrics = dict(messages_sent=1, **timer.metrics())
+    assert set(metrics) == {"messages_sent", "db_ms", "slack_ms"}
+
+    sched.job_history._on_event(JobExecutionEvent(EVENT_JOB_EXECUTED, "class_deadline_reminders", "volatile",
+                                                  now, retval=metrics))
+    run = sched.job_history.recent_runs(db, job_id="class_deadline_reminders")[0]
+    assert {key: run[key] for key in metrics} == metrics
+    assert run["rows_changed"] == 0
+    counters = sched.job_history.counters("class_deadline_reminders")
+    assert counters["db_ms"] == metrics["db_ms"] and counters["slack_ms"] == metrics["slack_ms"]
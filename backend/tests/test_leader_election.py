@@ -0,0 +1,107 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEASE_SECONDS = 2.0
+RENEW_SECONDS = 0.3
+
+# Each worker runs one LeaderElector against the shared database and appends
+# every round in which it believes it leads to the event log.
+WORKER = """
+import json, os, sys, time
+import database
+from leader_election import LeaderElector
+
+database.init_db()
+log, lease, renew = sys.argv[1], float(sys.argv[2]), float(sys.argv[3])
+
+def record(event, term):
+    with open(log, "a") as f:
+        f.write(json.dumps({"t": time.time(), "pid": os.getpid(), "event": event, "term": term}) + "\\n")
+
+elector = LeaderElector(lambda: database.SessionLocal(), holder_id=f"worker-{os.getpid()}",
+                        lease_seconds=lease, renew_seconds=renew)
+elector.on_elected = lambda: record("elected", elector.term)
+elector.on_heartbeat = lambda: record("lead", elector.term)
+elector.on_demoted = lambda: record("demoted", elector.term)
+elector.start()
+while True:
+    time.sleep(1)
+"""
+
+
+def read_log(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def wait_for_leader(path, exclude, timeout):
+    """First worker (not in `exclude`) elected after the log's current length."""
+    seen = len(read_log(path))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for entry in read_log(path)[seen:]:
+            if entry["event"] == "elected" and entry["pid"] not in exclude:
+                return entry
+        time.sleep(0.05)
+    return None
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Three worker processes on one scratch database; yields (pids -> Popen, event log path)."""
+    log = str(tmp_path / "events.ndjson")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'leader.db'}")
+    command = [sys.executable, "-c", WORKER, log, str(LEASE_SECONDS), str(RENEW_SECONDS)]
+    procs = {}
+    try:
+        for _ in range(3):
+            proc = subprocess.Popen(command, cwd=BACKEND, env=env)
+            procs[proc.pid] = proc
+        yield procs, log
+    finally:
+        for proc in procs.values():
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+
+
+def test_killed_leader_is_replaced_by_exactly_one_worker(workers):
+    procs, log = workers
+    first = wait_for_leader(log, set(), timeout=15)
+    assert first is not None, "no leader elected"
+
+    killed_at = time.time()
+    procs[first["pid"]].send_signal(signal.SIGKILL)
+    procs[first["pid"]].wait()
+
+    second = wait_for_leader(log, {first["pid"]}, timeout=3 * LEASE_SECONDS)
+    assert second is not None, "no takeover after the leader was killed"
+    # the lease was last renewed before the kill, so it runs out within one TTL
+    assert second["t"] - killed_at <= LEASE_SECONDS + RENEW_SECONDS
+    assert second["term"] == first["term"] + 1
+
+    # let the new leader renew a few times, then check the whole history
+    time.sleep(LEASE_SECONDS)
+    entries = sorted(read_log(log), key=lambda e: e["t"])
+    elected = [e for e in entries if e["event"] == "elected"]
+    assert [e["pid"] for e in elected] == [first["pid"], second["pid"]]
+
+    holders, highest = {}, 0
+    for entry in entries:
+        if entry["event"] not in ("elected", "lead"):
+            continue
+        term = entry["term"]
+        # one holder per term, and nobody still leads an older term once a newer one began
+        assert holders.setdefault(term, entry["pid"]) == entry["pid"]
+        assert term >= highest
+        highest = term
+    assert highest == second["term"]
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+from database import Member, Transaction
+from ledger import apply_member_payment, record_member_transaction
+
+THREADS = 8
+PAYMENTS_PER_THREAD = 25
+PAYMENT_CENTS = 137
+
+
+def pay_concurrently(pay):
+    """Run `pay(session, n)` PAYMENTS_PER_THREAD times on each of THREADS threads, one session per thread."""
+    def worker(thread):
+        session = database.SessionLocal()
+        try:
+            for i in range(PAYMENTS_PER_THREAD):
+                pay(session, thread * PAYMENTS_PER_THREAD + i)
+                session.commit()
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        for future in [pool.submit(worker, thread) for thread in range(THREADS)]:
+            future.result()
+
+
+def assert_no_lost_updates(db, member_id, version_before):
+    payments = THREADS * PAYMENTS_PER_THREAD
+    db.expire_all()
+    member = db.get(Member, member_id)
+    assert member.amount_paid_cents == payments * PAYMENT_CENTS
+    assert member.version_id == version_before + payments
+
+
+def test_concurrent_payments_are_all_applied(db, member):
+    member_id, version = member.id, member.version_id
+    pay_concurrently(lambda session, n: apply_member_payment(session, member_id, PAYMENT_CENTS))
+    assert_no_lost_updates(db, member_id, version)
+
+
+def test_concurrent_transactions_are_all_applied(db, member):
+    member_id, version = member.id, member.version_id
+    pay_concurrently(lambda session, n: record_member_transaction(session, Transaction(
+        member_id=member_id, amount_cents=PAYMENT_CENTS, payment_method="Manual", transaction_id=f"busy-{n}",
+    )))
+    assert_no_lost_updates(db, member_id, version)
+    assert db.query(Transaction).filter(Transaction.member_id == member_id).count() == THREADS * PAYMENTS_PER_THREAD
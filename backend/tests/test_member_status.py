@@ -0,0 +1,79 @@
+"""Stored payment_status must agree with the status derived at read time."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database import Member
+
+
+def list_statuses(client, status):
+    """name -> status of the listed test members (the app seeds an admin of its own)."""
+    response = client.get("/api/members", params={"payment_status": status, "search": "Pending",
+                                                  "fields": "name,payment_status"})
+    assert response.status_code == 200
+    return {item["name"]: item["payment_status"] for item in response.json()["items"]}
+
+
+def test_status_filter_matches_derived_status(db, client):
+    past = datetime.utcnow() - timedelta(days=2)
+    # stored Pending, but the due date passed before any sweep ran
+    db.add(Member(name="Stale Pending", email="stale@example.com", dues_cents=18000, amount_paid_cents=0,
+                  payment_status="Pending", due_date=past))
+    db.add(Member(name="Still Pending", email="pending@example.com", dues_cents=18000, amount_paid_cents=0,
+                  payment_status="Pending", due_date=datetime.utcnow() + timedelta(days=2)))
+    db.commit()
+
+    assert list_statuses(client, "overdue") == {"Stale Pending": "Overdue"}
+    assert list_statuses(client, "pending") == {"Still Pending": "Pending"}
+
+
+@pytest.fixture
+def admin_headers(db):
+    import app
+    admin = Member(name="Test Admin", email="admin@example.com", role="Admin", dues_cents=0, amount_paid_cents=0)
+    db.add(admin)
+    db.commit()
+    return {"Authorization": f"Bearer {app.create_access_token({'sub': str(admin.id), 'role': admin.role})}"}
+
+
+def test_new_members_past_due_are_stored_overdue(db, client, admin_headers):
+    past = (datetime.utcnow() - timedelta(days=3)).isoformat()
+    future = (datetime.utcnow() + timedelta(days=3)).isoformat()
+    response = client.post("/api/auth/add-member", headers=admin_headers,
+                           json={"name": "Added Late", "email": "late@example.com", "due_date": past})
+    assert response.status_code == 200
+    assert response.json()["payment_status"] == "Overdue"
+
+    csv_body = ("name,email,due_date\n"
+                f"Imported Late,imported-late@example.com,{past}\n"
+                f"Imported Early,imported-early@example.com,{future}\n")
+    response = client.post("/api/members/import", headers={**admin_headers, "Content-Type": "text/csv"},
+                           content=csv_body)
+    assert response.status_code == 200 and response.json()["inserted"] == 2
+
+    stored = dict(db.query(Member.email, Member.payment_status).filter(Member.email.like("%late@%")
+                                                                       | Member.email.like("%early@%")))
+    assert stored == {
+        "late@example.com": "Overdue",
+        "imported-late@example.com": "Overdue",
+        "imported-early@example.com": "Pending",
+    }
+
+
+def test_import_stores_offset_aware_due_dates_as_utc(db, client, admin_headers):
+    eastern = timezone(timedelta(hours=-4))
+    # two hours from now in UTC, but still in the past on an Eastern wall clock
+    soon = (datetime.now(timezone.utc) + timedelta(hours=2)).astimezone(eastern).replace(microsecond=0)
+    csv_body = ("name,email,due_date\n"
+                "Eastern Past,eastern-past@example.com,2025-09-01T00:00:00-04:00\n"
+                f"Eastern Soon,eastern-soon@example.com,{soon.isoformat()}\n")
+    response = client.post("/api/members/import", headers={**admin_headers, "Content-Type": "text/csv"},
+                           content=csv_body)
+    assert response.status_code == 200 and response.json()["inserted"] == 2
+
+    stored = {m.email: (m.due_date, m.payment_status)
+              for m in db.query(Member).filter(Member.email.like("eastern-%"))}
+    assert stored == {
+        "eastern-past@example.com": (datetime(2025, 9, 1, 4, 0), "Overdue"),
+        "eastern-soon@example.com": (soon.astimezone(timezone.utc).replace(tzinfo=None), "Pending"),
+    }
@@ -0,0 +1,82 @@
+"""POST /api/payments/process keeps the idempotency key while Square may have charged, and frees it otherwise."""
+import time
+
+import pytest
+
+from database import IdempotencyKey, Member, Transaction
+from square_gateway import SquareGateway
+from square_service import SquarePaymentService
+
+
+@pytest.fixture
+def gateway(square_server, monkeypatch):
+    import app
+    gateway = SquareGateway(SquarePaymentService(base_url=square_server.url), timeout_seconds=0.5)
+    monkeypatch.setattr(app, "square_gateway", gateway)
+    yield gateway
+    square_server.gate.set()
+    gateway.shutdown()
+
+
+def pay(client, member, key, source_id="cnon:card-ok"):
+    return client.post("/api/payments/process", headers={"Idempotency-Key": key},
+                       json={"member_id": member.id, "source_id": source_id, "amount": 180.0})
+
+
+def key_status(db, key):
+    db.expire_all()
+    row = db.get(IdempotencyKey, ("payments.process", key))
+    return row.status if row else None
+
+
+def charges(square_server):
+    return [r for r in square_server.requests if r[:2] == ("POST", "/v2/payments")]
+
+
+def test_charge_finishing_after_deadline_is_booked_and_replayed(db, member, gateway, square_server, client):
+    square_server.gate.clear()
+    assert pay(client, member, "late-charge").status_code == 504
+    assert key_status(db, "late-charge") == "held"
+    # Square may have charged, so a retry (with a fresh card token) must not reach it
+    assert pay(client, member, "late-charge", source_id="cnon:card-again").status_code == 409
+
+    square_server.gate.set()
+    deadline = time.monotonic() + 5
+    while key_status(db, "late-charge") != "completed":
+        assert time.monotonic() < deadline, "late charge was not booked"
+        time.sleep(0.02)
+
+    replay = pay(client, member, "late-charge", source_id="cnon:card-again")
+    assert replay.status_code == 200 and replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["transaction_id"] == "pay-1"
+    assert db.query(Transaction).filter(Transaction.member_id == member.id).count() == 1
+    assert db.get(Member, member.id).amount_paid_cents == 18000
+    assert len(charges(square_server)) == 1
+
+
+def test_declined_charge_releases_key(db, member, gateway, square_server, client):
+    create_payment = square_server.handlers[("POST", "/v2/payments")]
+
+    def decline_first_card(query, body):
+        if body["source_id"] == "cnon:declined":
+            return 400, {"errors": [{"category": "PAYMENT_METHOD_ERROR", "code": "CARD_DECLINED"}]}
+        return create_payment(query, body)
+
+    square_server.handlers[("POST", "/v2/payments")] = decline_first_card
+    assert pay(client, member, "declined", source_id="cnon:declined").status_code == 400
+    assert key_status(db, "declined") is None
+    assert pay(client, member, "declined").status_code == 200
+    assert key_status(db, "declined") == "completed"
+
+
+def test_unbooked_charge_holds_key(db, member, gateway, square_server, client, monkeypatch):
+    import app
+
+    def fail_booking(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(app, "record_square_payment", fail_booking)
+    assert pay(client, member, "unbooked").status_code == 500
+    assert key_status(db, "unbooked") == "held"
+    assert pay(client, member, "unbooked", source_id="cnon:card-again").status_code == 409
+    assert len(charges(square_server)) == 1
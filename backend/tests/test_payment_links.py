@@ -0,0 +1,73 @@
+"""Payment link cache: per-link generation in the Square key, pre-generation and its status endpoint."""
+import asyncio
+import itertools
+
+import pytest
+
+import database
+from database import Member, PaymentLink
+from payment_links import PaymentLinkCache
+from square_gateway import SquareGateway
+from square_service import SquarePaymentService
+
+LINKS_PATH = ("POST", "/v2/online-checkout/payment-links")
+
+
+@pytest.fixture
+def cache(square_server):
+    ids = itertools.count(1)
+
+    def create_link(query, body):
+        n = next(ids)
+        return 200, {"payment_link": {"id": f"link-{n}", "version": 1, "order_id": f"order-{n}",
+                                      "url": f"https://square.link/u/{n}"}}
+
+    square_server.handlers[LINKS_PATH] = create_link
+    gateway = SquareGateway(SquarePaymentService(base_url=square_server.url))
+    yield PaymentLinkCache(gateway, database.SessionLocal)
+    gateway.shutdown()
+
+
+def link_keys(square_server):
+    return [body["idempotency_key"] for method, path, _, body in square_server.requests if (method, path) == LINKS_PATH]
+
+
+def get_link(cache, db, member, paid_cents):
+    member.amount_paid_cents = paid_cents
+    db.commit()
+    db.expire_all()
+    return asyncio.run(cache.get_or_create(db, db.get(Member, member.id)))
+
+
+def test_balance_returning_to_an_earlier_amount_gets_a_new_link(db, member, cache, square_server):
+    first = get_link(cache, db, member, 0)
+    assert get_link(cache, db, member, 0)["cached"]
+    get_link(cache, db, member, 9000)
+    again = get_link(cache, db, member, 0)
+
+    keys = link_keys(square_server)
+    assert len(keys) == len(set(keys)) == 3
+    assert again["payment_link_url"] != first["payment_link_url"] and not again["cached"]
+    db.expire_all()
+    assert db.get(PaymentLink, member.id).generation == 3
+
+
+def test_pregenerate_creates_missing_links(db, member, cache, square_server):
+    report = asyncio.run(cache.pregenerate())
+    assert (report["members_needing_links"], report["created"], report["failed"], report["error"]) == (1, 1, 0, None)
+    assert db.get(PaymentLink, member.id).generation == 1
+    assert asyncio.run(cache.pregenerate())["members_needing_links"] == 0
+
+
+def test_pregenerate_reports_selection_failure(cache, monkeypatch):
+    def broken():
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(cache, "_links_to_generate", broken)
+    report = asyncio.run(cache.pregenerate())
+    assert report["error"] == "RuntimeError: database is locked" and report["created"] == 0
+    assert not cache.pregenerating
+
+
+def test_pregeneration_status_requires_admin(client):
+    assert client.get("/api/payments/links/pregenerate").status_code == 401
@@ -0,0 +1,122 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot queries: each must reach its rows through
+an index. A plan step that scans a table row by row (a bare "SCAN <table>")
+fails the test, so a dropped index or a rewritten filter shows up here first.
+"""
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+import database
+from database import Member, MemberClass, Transaction, Expense
+
+FULL_SCAN = re.compile(r"SCAN (\w+)(?: AS \w+)?")
+
+
+@contextmanager
+def captured_statements(engine=database.engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def query_plan(statement, parameters=()):
+    with database.engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def assert_indexed(statements):
+    assert statements, "no statements were captured"
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        scans = [step for step in plan if FULL_SCAN.fullmatch(step)]
+        assert not scans, f"full scan {scans} in plan {plan} for:\n{statement}"
+
+
+def compiled(stmt):
+    compiled_stmt = stmt.compile(database.engine)
+    return [(str(compiled_stmt), tuple(compiled_stmt.params[name] for name in compiled_stmt.positiontup))]
+
+
+@pytest.fixture
+def roster(db):
+    now = datetime.utcnow()
+    db.add_all([MemberClass(name="Alpha", dues_cents=18000), MemberClass(name="Beta", dues_cents=20000)])
+    members = [
+        Member(name=f"Member {i}", email=f"member{i}@example.com", member_class="Alpha" if i % 2 else "Beta",
+               dues_cents=18000, amount_paid_cents=9000 * (i % 3), payment_status="Pending",
+               due_date=now + timedelta(days=i - 5))
+        for i in range(10)
+    ]
+    db.add_all(members)
+    db.flush()
+    db.add_all([Transaction(member_id=m.id, amount_cents=9000, payment_method="Square", status="Completed",
+                            created_at=now - timedelta(days=20), transaction_date=now - timedelta(days=20))
+                for m in members])
+    db.add(Expense(category="Events", amount_cents=5000, created_at=now - timedelta(days=10)))
+    db.commit()
+    return members
+
+
+def test_stats_aggregate_reads_covering_index(roster):
+    from stats_service import stats_query
+    assert_indexed(compiled(stats_query()))
+
+
+def test_monthly_stats(roster, client):
+    with captured_statements() as statements:
+        assert client.get("/api/stats/monthly").status_code == 200
+    assert_indexed(statements)
+
+
+def test_member_transactions(roster, client):
+    with captured_statements() as statements:
+        response = client.get(f"/api/transactions/member/{roster[0].id}")
+    assert response.status_code == 200 and response.json()
+    assert_indexed(statements)
+
+
+def test_unpaid_member_selection(roster):
+    import app
+    with captured_statements() as statements:
+        summary = app.reminder_scheduler._get_unpaid_members(["Pending", "Overdue"])
+    assert summary.count
+    assert_indexed(statements)
+
+
+def test_unpaid_totals_by_class(roster, db):
+    from unpaid_members import unpaid_totals_by_class
+    with captured_statements() as statements:
+        totals = unpaid_totals_by_class(db, ["Alpha", "Beta"])
+    assert totals
+    assert_indexed(statements)
+
+
+def test_class_due_date_updates(roster, db):
+    import app
+    due = datetime.utcnow() + timedelta(days=30)
+    with captured_statements() as statements:
+        db.query(MemberClass).filter(MemberClass.name.in_(["Alpha"]), MemberClass.active == True).all()  # noqa: E712
+        assert app.set_class_due_date(db, ["Alpha"], due) == 5
+        assert app.set_class_due_date(db, ["Alpha"], None, only_if_due_date=due) == 5
+        db.commit()
+    assert_indexed(statements)
+
+
+def test_overdue_sweep(roster):
+    import app
+    with captured_statements() as statements:
+        app.reminder_scheduler.sweep_overdue()
+        app.reminder_scheduler._next_pending_due_date(datetime.utcnow())
+    assert_indexed(statements)
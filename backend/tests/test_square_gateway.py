@@ -0,0 +1,112 @@
+"""SquareGateway against a local fake Square API: deadline, concurrency cap, queue limit and late results."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from square_gateway import SquareGateway
+from square_service import SquarePaymentService
+
+
+@pytest.fixture
+def make_gateway(square_server):
+    gateways = []
+
+    def make(**kwargs):
+        gateway = SquareGateway(SquarePaymentService(base_url=square_server.url), **kwargs)
+        gateways.append(gateway)
+        return gateway
+
+    yield make
+    square_server.gate.set()
+    for gateway in gateways:
+        gateway.shutdown()
+
+
+def charge(gateway, **kwargs):
+    return gateway.call("create_payment", amount=180.0, source_id="cnon:card-ok", member_email="payer@example.com",
+                        member_name="Payer", **kwargs)
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_charge_reaches_square(square_server, make_gateway):
+    result = asyncio.run(charge(make_gateway()))
+    assert result["success"] and result["transaction_id"] == "pay-1" and result["amount"] == 180.0
+    method, path, _, body = square_server.requests[0]
+    assert (method, path, body["amount_money"]) == ("POST", "/v2/payments", {"amount": 18000, "currency": "USD"})
+
+
+def test_deadline_and_late_result(square_server, make_gateway):
+    gateway = make_gateway(max_concurrency=1, timeout_seconds=0.2)
+    late = []
+    finished = threading.Event()
+
+    def on_late_result(result):
+        late.append(result)
+        finished.set()
+
+    async def scenario():
+        square_server.gate.clear()
+        running = asyncio.create_task(charge(gateway, on_late_result=on_late_result))
+        queued = asyncio.create_task(charge(gateway))
+        return await asyncio.gather(running, queued)
+
+    started = time.monotonic()
+    results = asyncio.run(scenario())
+    assert time.monotonic() - started < 1.5
+    assert [r.get("error") for r in results] == ["timeout", "timeout"]
+
+    square_server.gate.set()
+    assert finished.wait(5)
+    assert late[0]["success"] and late[0]["transaction_id"] == "pay-1"
+    metrics = gateway.metrics()
+    assert metrics["timeouts"] == 2 and metrics["late_results"] == 1 and metrics["queue_depth"] == 0
+    # the queued call was cancelled before it reached Square
+    assert len(square_server.requests) == 1
+
+
+def test_concurrency_cap_and_queue_depth(square_server, make_gateway):
+    gateway = make_gateway(max_concurrency=2, max_queue=8, timeout_seconds=5)
+
+    async def scenario():
+        square_server.gate.clear()
+        calls = [asyncio.create_task(charge(gateway)) for _ in range(5)]
+        await wait_until(lambda: square_server.in_flight == 2)
+        held = gateway.metrics()
+        square_server.gate.set()
+        return held, await asyncio.gather(*calls)
+
+    held, results = asyncio.run(scenario())
+    assert (held["in_flight"], held["queue_depth"]) == (2, 3)
+    assert all(result["success"] for result in results)
+    assert square_server.peak_in_flight == 2
+    metrics = gateway.metrics()
+    assert (metrics["queue_depth"], metrics["peak_queue_depth"], metrics["completed"]) == (0, 3, 5)
+
+
+def test_full_queue_is_rejected(square_server, make_gateway):
+    gateway = make_gateway(max_concurrency=1, max_queue=1, timeout_seconds=5)
+
+    async def scenario():
+        square_server.gate.clear()
+        running = asyncio.create_task(charge(gateway))
+        await wait_until(lambda: square_server.in_flight == 1)
+        queued = asyncio.create_task(charge(gateway))
+        await wait_until(lambda: gateway.metrics()["queue_depth"] == 1)
+        rejected = await charge(gateway)
+        square_server.gate.set()
+        return rejected, await asyncio.gather(running, queued)
+
+    rejected, accepted = asyncio.run(scenario())
+    assert rejected["error"] == "busy"
+    assert all(result["success"] for result in accepted)
+    assert gateway.metrics()["rejected"] == 1
+    assert len(square_server.requests) == 2
+
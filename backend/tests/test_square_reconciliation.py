@@ -0,0 +1,102 @@
+"""Square reconciliation against a fake list-payments API: discrepancy sets and cursor resume."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Member, SquareReconciliationRun, Transaction
+from square_reconciliation import reconcile_square_payments
+from square_service import SQUARE_API_VERSION, SquarePaymentService
+
+
+def square_payment(payment_id, cents, status="COMPLETED", member_id=None):
+    return {"id": payment_id, "status": status, "amount_money": {"amount": cents, "currency": "USD"},
+            "note": f"member:{member_id}" if member_id else None, "created_at": "2026-01-01T00:00:00Z"}
+
+
+@pytest.fixture
+def window():
+    end = datetime.utcnow().replace(microsecond=0)
+    return end - timedelta(days=1), end
+
+
+@pytest.fixture
+def ledger(db, window):
+    member = Member(name="Recon Member", email="recon@example.com", dues_cents=18000, amount_paid_cents=0)
+    db.add(member)
+    db.flush()
+    booked_at = window[1] - timedelta(hours=2)
+    db.add_all([
+        Transaction(member_id=member.id, amount_cents=18000, payment_method="Square", transaction_id="sq-matched",
+                    transaction_date=booked_at),
+        Transaction(member_id=member.id, amount_cents=18000, payment_method="Square Link",
+                    transaction_id="sq-mismatch", transaction_date=booked_at),
+        Transaction(member_id=member.id, amount_cents=5000, payment_method="Square", transaction_id="sq-extra",
+                    transaction_date=booked_at),
+        # not booked from Square, so never compared
+        Transaction(member_id=member.id, amount_cents=1000, payment_method="Manual", transaction_id="manual-1",
+                    transaction_date=booked_at),
+    ])
+    db.commit()
+    return member
+
+
+@pytest.fixture
+def square_pages(square_server, ledger):
+    pages = {
+        None: ([square_payment("sq-matched", 18000), square_payment("sq-mismatch", 9000)], "page-2"),
+        "page-2": ([square_payment("sq-missing", 7000, member_id=ledger.id),
+                    square_payment("sq-pending", 3000, status="APPROVED")], None),
+    }
+
+    def list_payments(query, body):
+        payments, cursor = pages[query.get("cursor")]
+        return 200, {"payments": payments, **({"cursor": cursor} if cursor else {})}
+
+    square_server.handlers[("GET", "/v2/payments")] = list_payments
+    return pages
+
+
+def ids(report, kind):
+    return {item["payment_id"] for item in report[kind]}
+
+
+def test_discrepancy_sets_and_cursor_resume(db, ledger, square_server, square_pages, window, monkeypatch):
+    monkeypatch.setenv("SQUARE_ACCESS_TOKEN", "test-token")
+    monkeypatch.setenv("SQUARE_LOCATION_ID", "LOC1")
+    service = SquarePaymentService(base_url=square_server.url)
+
+    first = reconcile_square_payments(db, service, *window, max_pages=1)
+    assert (first["status"], first["pages"], first["complete"]) == ("running", 1, False)
+    assert ids(first, "mismatch") == {"sq-mismatch"} and not first["missing"] and not first["extra"]
+    assert db.get(SquareReconciliationRun, first["run_id"]).cursor == "page-2"
+
+    # no window: resumes the open run from its stored cursor
+    report = reconcile_square_payments(db, service)
+    assert report["run_id"] == first["run_id"] and report["complete"] and report["pages"] == 2
+    assert ids(report, "missing") == {"sq-missing"}
+    assert ids(report, "mismatch") == {"sq-mismatch"}
+    assert ids(report, "extra") == {"sq-extra"}
+    assert (report["missing_count"], report["mismatch_count"], report["extra_count"]) == (1, 1, 1)
+    assert report["missing"][0]["member_id"] == ledger.id
+
+    queries = [query for method, path, query, _ in square_server.requests if (method, path) == ("GET", "/v2/payments")]
+    assert [q.get("cursor") for q in queries] == [None, "page-2"]
+    assert queries[0]["location_id"] == "LOC1" and queries[0]["sort_order"] == "ASC"
+    assert square_server.last_headers["Authorization"] == "Bearer test-token"
+    assert square_server.last_headers["Square-Version"] == SQUARE_API_VERSION
+
+
+def test_failed_page_leaves_run_resumable(db, square_server, square_pages, window):
+    service = SquarePaymentService(base_url=square_server.url)
+    list_payments = square_server.handlers[("GET", "/v2/payments")]
+    square_server.handlers[("GET", "/v2/payments")] = (
+        lambda query, body: (500, {"errors": [{"code": "INTERNAL_SERVER_ERROR"}]}) if query.get("cursor")
+        else list_payments(query, body))
+
+    failed = reconcile_square_payments(db, service, *window)
+    assert failed["status"] == "failed" and failed["pages"] == 1 and "INTERNAL_SERVER_ERROR" in failed["error"]
+
+    square_server.handlers[("GET", "/v2/payments")] = list_payments
+    report = reconcile_square_payments(db, service)
+    assert report["run_id"] == failed["run_id"] and report["complete"]
+    assert ids(report, "missing") == {"sq-missing"} and ids(report, "extra") == {"sq-extra"}
@@ -0,0 +1,114 @@
+"""Webhook ingestion: exactly-once booking per payment id, retries and dead letters."""
+import time
+
+import pytest
+
+import database
+import square_webhooks
+from database import Member, SquareWebhookDeadLetter, Transaction
+from square_webhooks import WebhookIngestor
+
+
+def payment_event(payment_id, member_id, cents=18000):
+    return {"type": "payment.updated", "data": {"object": {"payment": {
+        "id": payment_id,
+        "status": "COMPLETED",
+        "note": f"member:{member_id}",
+        "amount_money": {"amount": cents, "currency": "USD"},
+        "created_at": "2026-01-01T00:00:00Z",
+    }}}}
+
+
+@pytest.fixture
+def members(db):
+    members = [Member(name=f"Link Payer {i}", email=f"link{i}@example.com", dues_cents=18000, amount_paid_cents=0,
+                      payment_status="Pending") for i in range(2)]
+    db.add_all(members)
+    db.commit()
+    return members
+
+
+def ingestor(**kwargs):
+    return WebhookIngestor(database.SessionLocal, batch_wait_ms=10, retry_base_ms=1, retry_max_ms=5, **kwargs)
+
+
+def drain(worker, condition, timeout=5.0):
+    """Wait for the running worker to reach `condition(metrics)`, then stop it."""
+    deadline = time.monotonic() + timeout
+    while not condition(worker.metrics()):
+        assert time.monotonic() < deadline, worker.metrics()
+        time.sleep(0.01)
+    worker.stop()
+
+
+def paid_cents(db, member):
+    db.expire_all()
+    return db.get(Member, member.id).amount_paid_cents
+
+
+def test_redelivered_payment_is_booked_once(db, members):
+    worker = ingestor()
+    first = worker.process_batch([payment_event("pay-a", members[0].id), payment_event("pay-a", members[0].id)])
+    again = worker.process_batch([payment_event("pay-a", members[0].id), payment_event("pay-b", members[1].id)])
+
+    assert (first["recorded"], again["recorded"]) == (1, 1)
+    assert db.query(Transaction).filter(Transaction.transaction_id == "pay-a").count() == 1
+    assert (paid_cents(db, members[0]), paid_cents(db, members[1])) == (18000, 18000)
+    assert worker.metrics()["duplicates"] == 2
+
+
+def test_payment_booked_elsewhere_adds_no_balance(db, members):
+    db.add(Transaction(member_id=members[0].id, amount_cents=18000, payment_method="Square", transaction_id="pay-c"))
+    db.commit()
+    assert ingestor().process_batch([payment_event("pay-c", members[0].id)])["recorded"] == 0
+    assert paid_cents(db, members[0]) == 0
+
+
+def test_failed_batch_is_retried(db, members, monkeypatch):
+    calls = {"n": 0}
+    apply = square_webhooks.apply_member_payment
+
+    def flaky_apply(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            raise RuntimeError("database is locked")
+        return apply(*args, **kwargs)
+
+    monkeypatch.setattr(square_webhooks, "apply_member_payment", flaky_apply)
+    worker = ingestor()
+    worker.start()
+    worker.submit(payment_event("pay-d", members[0].id))
+    drain(worker, lambda m: m["recorded"] == 1)
+
+    assert paid_cents(db, members[0]) == 18000
+    metrics = worker.metrics()
+    assert (metrics["failed_batches"], metrics["retries"], metrics["dead_lettered"]) == (2, 2, 0)
+
+
+def test_failing_event_is_dead_lettered_and_replayed(db, members, monkeypatch):
+    apply = square_webhooks.apply_member_payment
+    broken = {members[1].id}
+
+    def apply_unless_broken(session, member_id, cents, *args, **kwargs):
+        if member_id in broken:
+            raise RuntimeError("constraint failed")
+        return apply(session, member_id, cents, *args, **kwargs)
+
+    monkeypatch.setattr(square_webhooks, "apply_member_payment", apply_unless_broken)
+    worker = ingestor(retry_attempts=2)
+    worker.start()
+    worker.submit(payment_event("pay-e", members[0].id))
+    worker.submit(payment_event("pay-f", members[1].id))
+    drain(worker, lambda m: m["dead_lettered"] == 1)
+
+    # the healthy event is applied on its own; only the failing one is kept
+    assert (paid_cents(db, members[0]), paid_cents(db, members[1])) == (18000, 0)
+    letters = db.query(SquareWebhookDeadLetter).all()
+    assert len(letters) == 1 and '"pay-f"' in letters[0].event and letters[0].attempts == 3
+    assert worker.metrics()["dead_lettered"] == 1
+
+    broken.clear()
+    assert worker.replay_dead_letters() == 1
+    assert paid_cents(db, members[1]) == 18000
+    db.expire_all()
+    assert db.query(SquareWebhookDeadLetter).count() == 0
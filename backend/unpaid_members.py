@@ -0,0 +1,108 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from config import REMINDER_BATCH_SIZE
+from database import Member
+from money import from_cents
+
+UNPAID_STATUSES = ("Pending", "Overdue")
+SUMMARY_PREVIEW_LIMIT = 20  # members listed by name in the Slack summary
+
+
+def outstanding_cents():
+    return func.coalesce(Member.dues_cents, 0) - func.coalesce(Member.amount_paid_cents, 0)
+
+
+def canonical_statuses(statuses: Iterable[str]) -> List[str]:
+    """Statuses as stored (Paid/Pending/Overdue), so the filter can use ix_members_status_due_date."""
+    return sorted({s.strip().capitalize() for s in statuses})
+
+
+def unpaid_members_query(statuses: Iterable[str] = UNPAID_STATUSES, member_ids: Optional[List[int]] = None):
+    """
+    Members in `statuses` with a positive balance, projected to the columns a
+    reminder needs. Ordered along the status/due-date index, so no sort step.
+    """
+    balance = outstanding_cents()
+    stmt = (
+        select(Member.id, Member.name, Member.member_class, Member.payment_status, balance.label("amount_due_cents"))
+        .where(Member.payment_status.in_(canonical_statuses(statuses)), balance > 0)
+        .order_by(Member.payment_status, Member.due_date)
+    )
+    if member_ids is not None:
+        stmt = stmt.where(Member.id.in_(member_ids))
+    return stmt
+
+
+def iter_unpaid_members(db, statuses: Iterable[str] = UNPAID_STATUSES, member_ids: Optional[List[int]] = None,
+                        batch_size: int = REMINDER_BATCH_SIZE) -> Iterator[Any]:
+    """Stream unpaid_members_query() rows, `batch_size` at a time."""
+    yield from db.execute(unpaid_members_query(statuses, member_ids).execution_options(yield_per=batch_size))
+
+
+def unpaid_totals_by_class(db, class_names: Iterable[str],
+                           statuses: Iterable[str] = UNPAID_STATUSES) -> Dict[str, Dict[str, Any]]:
+    """Unpaid member count and outstanding total for each of `class_names`, from one grouped query."""
+    balance = outstanding_cents()
+    rows = db.execute(
+        select(Member.member_class, func.count(), func.sum(balance))
+        .where(
+            Member.member_class.in_(list(class_names)),
+            Member.payment_status.in_(canonical_statuses(statuses)),
+            balance > 0,
+        )
+        .group_by(Member.member_class)
+    ).all()
+    return {
+        name: {"class": name, "unpaid_count": count, "total_outstanding": from_cents(total)}
+        for name, count, total in rows
+    }
+
+
+class UnpaidSummary:
+    """
+    Totals over a stream of unpaid member rows. Only the first `preview_limit`
+    members (and, with `keep_names`, every name) are held, so summarizing the
+    whole roster takes the same memory as a single batch.
+    """
+
+    def __init__(self, preview_limit: int = SUMMARY_PREVIEW_LIMIT, keep_names: bool = False):
+        self.preview_limit = preview_limit
+        self.count = 0
+        self.overdue_count = 0
+        self.total_cents = 0
+        self.preview: List[Dict[str, Any]] = []
+        self.names: Optional[List[str]] = [] if keep_names else None
+
+    def add(self, row):
+        self.count += 1
+        self.total_cents += row.amount_due_cents
+        if row.payment_status == "Overdue":
+            self.overdue_count += 1
+        if len(self.preview) < self.preview_limit:
+            self.preview.append({
+                "name": row.name,
+                "class": row.member_class,
+                "amount_due": from_cents(row.amount_due_cents),
+                "status": row.payment_status,
+            })
+        if self.names is not None:
+            self.names.append(row.name)
+
+    def slack_args(self) -> Dict[str, Any]:
+        """Keyword arguments for SlackMessagingService.send_bulk_reminder_summary."""
+        return {
+            "unpaid_members": self.preview,
+            "total_count": self.count,
+            "total_outstanding": from_cents(self.total_cents),
+            "overdue_count": self.overdue_count,
+        }
+
+
+def summarize_unpaid_members(db, statuses: Iterable[str] = UNPAID_STATUSES, member_ids: Optional[List[int]] = None,
+                             keep_names: bool = False) -> UnpaidSummary:
+    summary = UnpaidSummary(keep_names=keep_names)
+    for row in iter_unpaid_members(db, statuses, member_ids):
+        summary.add(row)
+    return summary
@@ -5,15 +5,19 @@ import '../styles.css';
 import TransactionsList from './TransactionsList';
 
 const API_URL = 'http://localhost:8000';
+// Only the columns the member list renders
+const MEMBER_FIELDS = 'id,name,role,member_class,amount_paid,dues_amount,payment_status,due_date';
 
 export default function AdminDashboard() {
     // Core data state
     const [members, setMembers] = useState([]);
+    const [membersCursor, setMembersCursor] = useState(null);
     const [classes, setClasses] = useState([]);
     const [dueDateRecords, setDueDateRecords] = useState([]);
     const [stats, setStats] = useState({ totalMembers: 0, paidMembers: 0, unpaidMembers: 0 });
     const [financialData, setFinancialData] = useState({ totalIncome: 0, totalExpenses: 0, netIncome: 0, budgetRemaining: 0, monthlyData: [] });
     const [loading, setLoading] = useState(true);
+    const [membersLoading, setMembersLoading] = useState(false);
     const [error, setError] = useState(null);
     const [activeTab, setActiveTab] = useState('member'); // member | class | dueDate
     const [searchTerm, setSearchTerm] = useState('');
@@ -44,24 +48,34 @@ export default function AdminDashboard() {
     const authHeaders = () => ({ 'Content-Type': 'application/json', 'Authorization': `Bearer ${authToken()}` });
 
     useEffect(() => {
-        fetchMembers();
         fetchStats();
         fetchClasses();
         fetchMonthly();
         loadDueDates();
     }, []);
 
+    // Server-side search (debounced); also performs the initial member load
+    useEffect(() => {
+        const t = setTimeout(() => fetchMembers(), 300);
+        return () => clearTimeout(t);
+    }, [searchTerm]);
+
     // Fetchers
-    const fetchMembers = async () => {
+    const fetchMembers = async (cursor = null) => {
         try {
-            setLoading(true);
-            const r = await fetch(`${API_URL}/api/members`);
+            setMembersLoading(true);
+            const params = new URLSearchParams({ fields: MEMBER_FIELDS, limit: '100' });
+            if (searchTerm) params.set('search', searchTerm);
+            if (cursor) params.set('cursor', cursor);
+            const r = await fetch(`${API_URL}/api/members?${params}`);
             if (!r.ok) throw new Error('Failed members fetch');
-            setMembers(await r.json());
+            const page = await r.json();
+            setMembers(prev => cursor ? [...prev, ...page.items] : page.items);
+            setMembersCursor(page.next_cursor);
             setError(null);
         } catch (e) {
             setError('Failed to load members – is backend running?');
-        } finally { setLoading(false); }
+        } finally { setMembersLoading(false); setLoading(false); }
     };
 
     const fetchStats = async () => {
@@ -187,8 +201,6 @@ export default function AdminDashboard() {
         } catch (e) { alert(e.message); }
     };
 
-    const filteredMembers = members.filter(m => m.name.toLowerCase().includes(searchTerm.toLowerCase()));
-
     // Styling helper for status badge
     const getStatusBadge = (s) => {
         switch ((s||'').toLowerCase()) {
@@ -266,10 +278,10 @@ export default function AdminDashboard() {
                 <div className="bg-white rounded-xl shadow-lg p-6">
                     {activeTab==='member' && (
                         <div>
-                            <h3 className='font-bold text-lg mb-3'>Members ({members.length})</h3>
+                            <h3 className='font-bold text-lg mb-3'>Members ({members.length}{membersCursor ? '+' : ''})</h3>
                             <input type="text" placeholder="Search members..." value={searchTerm} onChange={(e)=>setSearchTerm(e.target.value)} className="px-3 py-2 border rounded w-full mb-3" />
                             <div className="max-h-72 overflow-y-auto divide-y text-sm">
-                                {filteredMembers.map(m => (
+                                {members.map(m => (
                                     <div key={m.id} className="py-2 flex items-center justify-between">
                                         <div className="flex flex-col">
                                             <span className="font-medium">{m.name} <span className="text-xs text-gray-400">({m.role}{m.member_class?` • ${m.member_class}`:''})</span></span>
@@ -286,7 +298,8 @@ export default function AdminDashboard() {
                                         </div>
                                     </div>
                                 ))}
-                                {filteredMembers.length===0 && <p className="text-gray-500 text-xs py-2">No matches.</p>}
+                                {members.length===0 && <p className="text-gray-500 text-xs py-2">No matches.</p>}
+                                {membersCursor && <button onClick={()=>fetchMembers(membersCursor)} disabled={membersLoading} className="w-full py-2 text-xs text-blue-600 hover:bg-gray-50 disabled:opacity-50">{membersLoading ? 'Loading...' : 'Load more'}</button>}
                             </div>
                         </div>
                     )}
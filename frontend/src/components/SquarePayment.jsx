@@ -1,12 +1,21 @@
 import React, { useState, useEffect } from 'react';
 import { CreditCard, CheckCircle, AlertCircle } from 'lucide-react';
 
+// Responses after which the charge may still have gone through; anything else is a definite failure
+const OUTCOME_UNKNOWN_STATUSES = [409, 500, 502, 504];
+
+const newIdempotencyKey = () => crypto.randomUUID();
+
 export default function SquarePayment({ memberId, amount, memberName, onSuccess }) {
     const [isLoading, setIsLoading] = useState(true);
     const [error, setError] = useState(null);
     const [success, setSuccess] = useState(false);
     const [card, setCard] = useState(null);
     const [config, setConfig] = useState(null);
+    // One key per payment attempt: a retry after an unknown outcome (timeout, network error) reuses it
+    // and replays instead of charging twice. Square binds the key to the first card token, so after a
+    // definite failure the next attempt, which tokenizes the card again, needs a new key.
+    const [idempotencyKey, setIdempotencyKey] = useState(newIdempotencyKey);
 
     useEffect(() => {
         initializeSquare();
@@ -50,6 +59,7 @@ export default function SquarePayment({ memberId, amount, memberName, onSuccess
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
+                        'Idempotency-Key': idempotencyKey,
                     },
                     body: JSON.stringify({
                         member_id: memberId,
@@ -65,8 +75,11 @@ export default function SquarePayment({ memberId, amount, memberName, onSuccess
                     if (onSuccess) {
                         onSuccess(data);
                     }
+                } else if (OUTCOME_UNKNOWN_STATUSES.includes(response.status)) {
+                    setError('We could not confirm your payment yet. Please wait a moment before trying again.');
                 } else {
-                    setError(data.message || 'Payment failed. Please try again.');
+                    setIdempotencyKey(newIdempotencyKey());
+                    setError(data.detail || data.message || 'Payment failed. Please try again.');
                 }
             } else {
                 setError('Invalid card information. Please check and try again.');
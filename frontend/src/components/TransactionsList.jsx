@@ -4,6 +4,8 @@ const API_URL = 'http://localhost:8000';
 
 export default function TransactionsList() {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [totalEstimate, setTotalEstimate] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [search, setSearch] = useState('');
@@ -11,24 +13,29 @@ export default function TransactionsList() {
   const authToken = () => localStorage.getItem('auth_token');
   const headers = () => ({ 'Content-Type': 'application/json', 'Authorization': `Bearer ${authToken()}` });
 
-  const fetchTransactions = async () => {
-    setLoading(true); setError(null);
+  const fetchTransactions = async (cursor = null) => {
+    if (!cursor) setLoading(true);
+    setError(null);
     try {
-      const resp = await fetch(`${API_URL}/api/transactions`);
+      const params = new URLSearchParams({ limit: '100' });
+      if (search) params.set('search', search);
+      if (cursor) params.set('cursor', cursor);
+      const resp = await fetch(`${API_URL}/api/transactions?${params}`);
       if (!resp.ok) throw new Error('Failed to load transactions');
-      const data = await resp.json();
-      setTransactions(Array.isArray(data) ? data : []);
+      const page = await resp.json();
+      setTransactions(prev => cursor ? [...prev, ...page.items] : page.items);
+      setNextCursor(page.next_cursor);
+      setTotalEstimate(page.total_is_exact ? `${page.total_estimate}` : `~${page.total_estimate}`);
     } catch (e) {
       setError(e.message);
     } finally { setLoading(false); }
   };
 
-  useEffect(() => { fetchTransactions(); }, []);
-
-  const filtered = transactions.filter(tx => {
-    const label = tx.display_label || `${tx.payer_name || 'Unknown'} dues ${tx.dues_due_date ? new Date(tx.dues_due_date).toLocaleDateString() : ''}`.trim();
-    return label.toLowerCase().includes(search.toLowerCase()) || (tx.payer_name || '').toLowerCase().includes(search.toLowerCase());
-  });
+  // Server-side search (debounced); also performs the initial load
+  useEffect(() => {
+    const t = setTimeout(() => fetchTransactions(), 300);
+    return () => clearTimeout(t);
+  }, [search]);
 
   const formatDate = (d) => {
     if (!d) return '—';
@@ -40,7 +47,7 @@ export default function TransactionsList() {
   return (
     <div className="bg-white rounded-xl shadow-lg p-6 mt-8">
       <div className="flex items-center justify-between mb-4">
-        <h3 className="font-bold text-xl">Transactions</h3>
+        <h3 className="font-bold text-xl">Transactions{totalEstimate !== null && <span className="text-sm font-normal text-gray-500"> ({transactions.length} of {totalEstimate})</span>}</h3>
         <div className="flex items-center gap-2">
           <input
             type="text"
@@ -58,8 +65,8 @@ export default function TransactionsList() {
       </div>
       {loading && <p className="text-gray-500 text-sm">Loading...</p>}
       {error && <p className="text-red-600 text-sm">{error}</p>}
-      {!loading && !error && filtered.length === 0 && <p className="text-gray-500 text-sm">No transactions found.</p>}
-      {!loading && !error && filtered.length > 0 && (
+      {!loading && !error && transactions.length === 0 && <p className="text-gray-500 text-sm">No transactions found.</p>}
+      {!loading && !error && transactions.length > 0 && (
         <div className="overflow-x-auto">
           <table className="w-full">
             <thead className="bg-gray-50 border-b border-gray-200">
@@ -75,7 +82,7 @@ export default function TransactionsList() {
               </tr>
             </thead>
             <tbody className="divide-y divide-gray-200">
-              {filtered.map(tx => {
+              {transactions.map(tx => {
                 const label = tx.display_label || `${tx.payer_name || 'Unknown'} dues ${tx.dues_due_date ? new Date(tx.dues_due_date).toLocaleDateString() : ''}`.trim();
                 return (
                   <tr key={tx.id} className="hover:bg-gray-50">
@@ -114,6 +121,9 @@ export default function TransactionsList() {
               })}
             </tbody>
           </table>
+          {nextCursor && (
+            <button onClick={() => fetchTransactions(nextCursor)} className="w-full mt-2 py-2 text-sm text-blue-600 hover:bg-gray-50">Load more</button>
+          )}
         </div>
       )}
       <p className="text-xs text-gray-500 mt-3">Transactions persist even after member deletion (member_id detached).</p>